@@ -12,26 +12,63 @@ Version: 1.0
 
 Usage:
     python MH6804_Graded_Group_Project_code_Group1.py
+    python MH6804_Graded_Group_Project_code_Group1.py [--data CSV] <stage> [--plot-dir DIR]
+
+    The second form runs a single stage headless (see STAGES, or --help).
 
 Dependencies:
     List any external dependencies or libraries.
 """
 
+import functools
+import hashlib
 import importlib
+import json
+import os
+import platform
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import shutil
 import sys
 import subprocess
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 import numpy as np
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 from tqdm import tqdm
-from imblearn.pipeline import Pipeline
-from imblearn.over_sampling import SMOTE, BorderlineSMOTE
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import confusion_matrix, classification_report, cohen_kappa_score, roc_auc_score
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
+
+
+class _LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    pandas, seaborn and matplotlib take seconds to import; batch and scoring runs
+    that never touch a DataFrame or a plot should not pay for them. The sklearn
+    and imblearn classes are imported inside the functions that use them.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+pd = _LazyModule("pandas")
+sns = _LazyModule("seaborn")
+plt = _LazyModule("matplotlib.pyplot")
+
+# When set, show_figure() saves figures here instead of opening a window (see set_headless()).
+PLOT_DIR = None
 
 
 
@@ -65,28 +102,215 @@ def install_required_packages():
     else:
         print("All required packages are already installed.\n")
 
-install_required_packages()
 
+DATA_URL = ('https://media.githubusercontent.com/media/dirceudn/MH6804GradedGroupProjectTeam1/refs/heads/main/'
+            'creditcard.csv')
+
+# Parsed copies of the CSV live here as per-column .npy files, one directory per content hash.
+CACHE_DIR = os.environ.get("MH6804_CACHE_DIR",
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+CACHE_INDEX_FILE = "index.json"
+SCHEMA_FILE = "schema.json"
+
+# Versioned model artifacts (see save_model()); one directory per model name, one subdirectory per version.
+MODEL_STORE_DIR = os.environ.get("MH6804_MODEL_DIR",
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"))
+MANIFEST_FILE = "manifest.json"
+SAVE_MODELS = os.environ.get("MH6804_SAVE_MODELS") == "1"
+
+# The model features, by name. Identical to the positional slice iloc[:, 2:30] on the
+# original CSV (V2 - V28 plus Amount), but still correct when columns are dropped on load.
+FEATURE_COLUMNS = [f"V{i}" for i in range(2, 29)] + ["Amount"]
+LABEL_COLUMN = "Class"
+
+# Explicit dtypes for load_data_typed(): only the columns the models need, in float32/int8.
+TYPED_SCHEMA = {**{f"V{i}": "float32" for i in range(1, 29)}, "Amount": "float32", "Class": "int8"}
 
-def load_data(file_path):
+
+def _is_url(file_path):
+    return str(file_path).startswith(("http://", "https://"))
+
+
+def _source_key(file_path):
     """
-        Load CSV data from the given file path.
+    Key used to find the content hash of a source without reading it again.
+    URLs are keyed by themselves; local files also by size and modification time,
+    so an edited file is hashed (and converted) again.
+    """
+    if _is_url(file_path):
+        return str(file_path)
+    stat = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
 
-        Parameters
-        ----------
-        file_path : str
-            The path (or URL) to the CSV file to be loaded.
 
-        Returns
-        -------
-        pd.DataFrame
-            A DataFrame containing the loaded data.
+def _file_sha256(file_path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fetch_to_file(url, dest_path, block_size=1 << 20):
+    """
+    Download `url` to `dest_path`, hashing the bytes as they arrive.
+
+    Returns
+    -------
+    str
+        The SHA-256 hex digest of the downloaded content.
+    """
+    digest = hashlib.sha256()
+    with urllib.request.urlopen(url) as response, open(dest_path, "wb") as out:
+        total = int(response.headers.get("Content-Length") or 0) or None
+        with tqdm(total=total, desc="Downloading data", ncols=80, unit="B", unit_scale=True) as pbar:
+            for block in iter(lambda: response.read(block_size), b""):
+                digest.update(block)
+                out.write(block)
+                pbar.update(len(block))
+    return digest.hexdigest()
+
+
+def _read_cache_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, CACHE_INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache_index(cache_dir, index):
+    tmp_path = os.path.join(cache_dir, CACHE_INDEX_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, os.path.join(cache_dir, CACHE_INDEX_FILE))
+
+
+def write_columnar_store(df, store_path, content_hash=None, source=None):
+    """
+    Write a DataFrame as a columnar store: one .npy file per column plus a
+    schema.json sidecar holding column names, dtypes and the row count.
+
+    The store is written to a temporary directory and renamed into place, so a
+    crash half-way never leaves a store that looks complete. Columns of Python
+    objects (e.g. strings) cannot be memory-mapped back and raise ValueError;
+    see is_storable().
+    """
+    if not is_storable(df):
+        raise ValueError("columns of Python objects cannot be written to a columnar store")
+    parent = os.path.dirname(os.path.abspath(store_path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=".store-", dir=parent)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        values = np.ascontiguousarray(df[name].to_numpy())
+        file_name = f"col_{i:03d}.npy"
+        np.save(os.path.join(tmp_path, file_name), values)
+        columns.append({"name": str(name), "dtype": values.dtype.str, "file": file_name})
+
+    schema = {"n_rows": int(len(df)), "columns": columns,
+              "content_hash": content_hash, "source": source}
+    with open(os.path.join(tmp_path, SCHEMA_FILE), "w") as f:
+        json.dump(schema, f, indent=2)
+
+    if os.path.isdir(store_path):
+        shutil.rmtree(tmp_path)  # another process finished the same store first
+    else:
+        os.replace(tmp_path, store_path)
+
+
+def is_storable(df):
+    """True if no column of `df` holds Python objects, so every .npy file of its store can be memory-mapped."""
+    return not any(df[name].to_numpy().dtype.hasobject for name in df.columns)
+
+
+def is_columnar_store(path):
+    """True if `path` is a directory written by write_columnar_store() or generate_synthetic_data()."""
+    return not _is_url(path) and os.path.isfile(os.path.join(path, SCHEMA_FILE))
+
+
+def read_store_schema(store_path):
+    with open(os.path.join(store_path, SCHEMA_FILE)) as f:
+        return json.load(f)
+
+
+def read_columnar_store(store_path):
+    """
+    Open a columnar store written by write_columnar_store().
+
+    Every column is memory-mapped read-only, so opening the store costs a few
+    milliseconds regardless of its size; pages are read from disk on first use.
+
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame backed by the memory-mapped columns. The content hash of the
+        source file is kept in ``df.attrs['content_hash']``.
+    """
+    schema = read_store_schema(store_path)
+    data = {col["name"]: np.load(os.path.join(store_path, col["file"]), mmap_mode="r")
+            for col in schema["columns"]}
+    df = pd.DataFrame(data, copy=False)
+    df.attrs["content_hash"] = schema.get("content_hash")
+    return df
+
+
+def _cached_store_path(file_path, cache_dir, schema=None):
+    """Path of the columnar store already built for `file_path`, or None."""
+    if cache_dir is None:
+        return None
+    content_hash = _read_cache_index(cache_dir).get(_source_key(file_path))
+    if not content_hash:
+        return None
+    suffix = "" if schema is None else "-" + _schema_key(schema)
+    store_path = os.path.join(cache_dir, content_hash + suffix)
+    return store_path if os.path.isdir(store_path) else None
+
+
+def iter_chunks(file_path, chunksize=100000, schema=None, cache_dir=CACHE_DIR):
     """
+    Yield the data as DataFrames of at most `chunksize` rows.
+
+    If the source is a columnar store, or is already in the columnar cache, the
+    chunks are slices of the memory-mapped store; otherwise the CSV is streamed with pd.read_csv(chunksize=...).
+    Either way only one chunk is materialized at a time.
+
+    Parameters
+    ----------
+    file_path : str
+        The path (or URL) to the CSV file.
+    chunksize : int
+        Rows per chunk.
+    schema : dict, optional
+        Column name -> dtype; restricts and casts the columns as in load_data_typed().
+    cache_dir : str or None
+        Columnar cache to look in first.
+    """
+    if is_columnar_store(file_path):
+        store_path = file_path
+    else:
+        store_path = _cached_store_path(file_path, cache_dir, schema) or _cached_store_path(file_path, cache_dir)
+    if store_path is not None:
+        df = read_columnar_store(store_path)
+        if schema is not None:
+            df = df[list(schema)]
+        for start in range(0, len(df), chunksize):
+            chunk = df.iloc[start:start + chunksize]
+            yield chunk if schema is None else chunk.astype(schema)
+        return
+
+    usecols = None if schema is None else list(schema)
+    yield from pd.read_csv(file_path, chunksize=chunksize, usecols=usecols, dtype=schema)
+
+
+def _read_csv_chunked(file_path):
     pbar_desc = "Loading data (chunked)"
     pbar = tqdm(desc=pbar_desc, ncols=80, unit=" chunks", dynamic_ncols=False)
 
     chunks = []
-    for chunk in pd.read_csv(file_path, chunksize=100000):
+    for chunk in iter_chunks(file_path, chunksize=100000, cache_dir=None):
         chunks.append(chunk)
         pbar.update(1)
 
@@ -95,450 +319,4617 @@ def load_data(file_path):
     return df
 
 
+def _peak_rss_bytes():
+    """Peak resident set size of this process so far, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB on Linux
+
+
+def _schema_key(schema):
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _estimate_rows(file_path, sample_bytes=1 << 20):
+    """Estimate the number of data rows of a local CSV from the line length of its first MiB."""
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        sample = f.read(sample_bytes)
+    lines = sample.count(b"\n")
+    if lines <= 1 or len(sample) >= size:
+        return max(lines, 1)
+    return int(size / (len(sample) / lines) * 1.02) + 1
+
+
+def load_data_typed(file_path, schema=None, chunksize=100000, n_rows=None, summary=None):
+    """
+        Load only the columns listed in `schema`, with the given dtypes, in a single pass.
+
+        Chunks from pd.read_csv are copied straight into arrays allocated up front
+        (one 2-D block for the float columns, one array per other column), so there
+        is no list of chunks and no pd.concat: peak memory is the final frame plus
+        one chunk. The row count is taken from `n_rows` or estimated from the file
+        size; if the estimate is short the arrays grow geometrically.
+
+        Parameters
+        ----------
+        file_path : str
+            The path (or URL) to the CSV file, or a columnar store, to be loaded.
+        schema : dict
+            Column name -> numpy dtype. Defaults to TYPED_SCHEMA.
+        chunksize : int
+            Rows per parsed chunk.
+        n_rows : int, optional
+            Number of data rows, when known, so the arrays are allocated exactly once.
+        summary : SummaryAccumulator, optional
+            Updated with every chunk, to profile the columns in the same pass.
+
+        Returns
+        -------
+        pd.DataFrame
+            The loaded columns in schema order. Throughput and peak RSS are printed
+            and kept in ``df.attrs['load_stats']``.
+    """
+    schema = dict(TYPED_SCHEMA if schema is None else schema)
+    dtypes = {name: np.dtype(dtype) for name, dtype in schema.items()}
+    float_cols = [name for name, dtype in dtypes.items() if dtype == np.float32]
+    other_cols = [name for name in dtypes if name not in float_cols]
+
+    if is_columnar_store(file_path):
+        store_schema = read_store_schema(file_path)
+        source_bytes = sum(os.path.getsize(os.path.join(file_path, col["file"]))
+                           for col in store_schema["columns"] if col["name"] in dtypes)
+        n_rows = store_schema["n_rows"] if n_rows is None else n_rows
+    else:
+        source_bytes = None if _is_url(file_path) else os.path.getsize(file_path)
+    if n_rows is None:
+        n_rows = chunksize if source_bytes is None else _estimate_rows(file_path)
+
+    block = np.empty((n_rows, len(float_cols)), dtype=np.float32)
+    others = {name: np.empty(n_rows, dtype=dtypes[name]) for name in other_cols}
+
+    start = time.perf_counter()
+    pos = 0
+    with tqdm(desc="Loading data (typed)", ncols=80, unit=" chunks") as pbar:
+        for chunk in iter_chunks(file_path, chunksize, schema=dtypes, cache_dir=None):
+            end = pos + len(chunk)
+            if end > len(block):
+                capacity = max(end, int(len(block) * 1.5))
+                block = np.resize(block, (capacity, len(float_cols)))
+                others = {name: np.resize(values, capacity) for name, values in others.items()}
+            block[pos:end] = chunk[float_cols].to_numpy()
+            for name in other_cols:
+                others[name][pos:end] = chunk[name].to_numpy()
+            if summary is not None:
+                summary.update(chunk[summary.columns].to_numpy(dtype=np.float64))
+            pos = end
+            pbar.update(1)
+    elapsed = time.perf_counter() - start
+
+    df = pd.DataFrame(block[:pos], columns=float_cols, copy=False)
+    for name in other_cols:
+        df[name] = others[name][:pos]
+    df = df[list(dtypes)]
+
+    stats = {
+        "rows": pos,
+        "seconds": elapsed,
+        "rows_per_sec": pos / elapsed if elapsed else None,
+        "bytes_per_sec": source_bytes / elapsed if source_bytes and elapsed else None,
+        "frame_bytes": int(df.memory_usage(index=False).sum()),
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+    df.attrs["load_stats"] = stats
+    throughput = f"{stats['bytes_per_sec'] / 2**20:.1f} MiB/s, " if stats["bytes_per_sec"] else ""
+    peak = f"{stats['peak_rss_bytes'] / 2**20:.0f} MiB" if stats["peak_rss_bytes"] else "n/a"
+    print(f"Loaded {pos} rows in {elapsed:.2f}s ({throughput}{stats['rows_per_sec']:.0f} rows/s), "
+          f"frame {stats['frame_bytes'] / 2**20:.1f} MiB, peak RSS {peak}")
+    return df
+
+
+def _index_store(cache_dir, key, content_hash, store_path):
+    """Open the store, and only once that worked record it in the cache index under `key`."""
+    df = read_columnar_store(store_path)
+    index = _read_cache_index(cache_dir)
+    index[key] = content_hash
+    _write_cache_index(cache_dir, index)
+    return df
+
+
+def load_data(file_path, cache_dir=CACHE_DIR, schema=None):
+    """
+        Load CSV data from the given file path.
+
+        The first load parses the CSV once and converts it into a columnar store
+        under `cache_dir`, keyed by the SHA-256 of the file content. Later loads of
+        the same source memory-map that store and never parse or download the CSV
+        again. A CSV with non-numeric columns is not cached: the parsed frame is
+        returned and the next load parses it again.
+
+        Parameters
+        ----------
+        file_path : str
+            The path (or URL) to the CSV file to be loaded, or a columnar store
+            directory (e.g. from generate_synthetic_data()), which is opened directly.
+        cache_dir : str or None
+            Directory holding the columnar cache. Pass None to always parse the CSV.
+        schema : dict, optional
+            Column name -> dtype. When given, only these columns are loaded, through
+            load_data_typed(), and cached separately from the full-precision store.
+
+        Returns
+        -------
+        pd.DataFrame
+            A DataFrame containing the loaded data.
+    """
+    if is_columnar_store(file_path):
+        df = read_columnar_store(file_path)
+        return df if schema is None else df[list(schema)].astype(schema)
+
+    parse = _read_csv_chunked if schema is None else (lambda path: load_data_typed(path, schema))
+    if cache_dir is None:
+        return parse(file_path)
+
+    store_path = _cached_store_path(file_path, cache_dir, schema)
+    if store_path is not None:
+        try:
+            return read_columnar_store(store_path)
+        except (OSError, ValueError):
+            # Unreadable, e.g. pickled object columns from an older version: rebuilt below.
+            shutil.rmtree(store_path, ignore_errors=True)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    key = _source_key(file_path)
+    suffix = "" if schema is None else "-" + _schema_key(schema)
+
+    download_path = None
+    df = None
+    try:
+        if _is_url(file_path):
+            fd, download_path = tempfile.mkstemp(suffix=".csv", dir=cache_dir)
+            os.close(fd)
+            content_hash = _fetch_to_file(file_path, download_path)
+            csv_path = download_path
+        else:
+            content_hash = _file_sha256(file_path)
+            csv_path = file_path
+
+        store_path = os.path.join(cache_dir, content_hash + suffix)
+        if os.path.isdir(store_path):
+            try:
+                return _index_store(cache_dir, key, content_hash, store_path)
+            except (OSError, ValueError):
+                shutil.rmtree(store_path, ignore_errors=True)
+        df = parse(csv_path)
+        if not is_storable(df):
+            return df
+        write_columnar_store(df, store_path, content_hash=content_hash, source=str(file_path))
+    finally:
+        if download_path is not None and os.path.exists(download_path):
+            os.remove(download_path)
+
+    try:
+        return _index_store(cache_dir, key, content_hash, store_path)
+    except (OSError, ValueError):
+        shutil.rmtree(store_path, ignore_errors=True)
+        return df
+
+
 def data_frame():
     """
         This function returns a data frame (DataFrame)
         when loading a CSV data file.
     """
-    return load_data(
-        'https://media.githubusercontent.com/media/dirceudn/MH6804GradedGroupProjectTeam1/refs/heads/main/creditcard.csv')
+    return load_data(DATA_URL)
 
 
-def prep_data(df: pd.DataFrame) -> (np.ndarray, np.ndarray):
+# ---------------------------------- Instrumentation ----------------------------------------------------------------
+#
+# Stage functions report their steps through StageProgress (a tqdm bar that also measures each step) and library
+# functions through @instrumented / instrument(). Nothing is measured unless instrumentation is enabled, either with
+# enable_instrumentation() or by setting MH6804_METRICS_FILE; records then go to that file as JSON lines, or as a
+# Prometheus text-format file when the name ends in .prom.
+
+_INSTRUMENTATION = {"enabled": False, "path": None, "format": "jsonl"}
+_METRIC_RECORDS = []
+
+
+def enable_instrumentation(path=None, fmt=None):
     """
-        Convert the DataFrame into two variables:
-        X: data columns (V1 - V28)
-        y: label column
+    Start recording per-step metrics.
+
+    Parameters
+    ----------
+    path : str, optional
+        File to export to after every step; records are only kept in memory
+        (see metric_records()) when omitted.
+    fmt : {'jsonl', 'prometheus'}, optional
+        Export format; inferred from the file name (.prom -> prometheus) by default.
     """
-    with tqdm(total=2, desc="Preprocessing data", ncols=80, unit=" steps") as pbar:
-        X = df.iloc[:, 2:30].values
-        pbar.update(1)
+    fmt = fmt or ("prometheus" if path and path.endswith(".prom") else "jsonl")
+    if fmt not in ("jsonl", "prometheus"):
+        raise ValueError(f"Unknown metrics format {fmt!r}; expected 'jsonl' or 'prometheus'")
+    _INSTRUMENTATION.update(enabled=True, path=path, format=fmt)
 
-        y = df.Class.values
-        pbar.update(1)
 
-    return X, y
+def disable_instrumentation():
+    _INSTRUMENTATION.update(enabled=False, path=None)
 
 
-def show_head_info():
+def metric_records():
+    """The step records collected since instrumentation was enabled."""
+    return list(_METRIC_RECORDS)
+
+
+def _current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _array_sizes(arrays):
+    return {name: {"shape": list(np.shape(a)), "bytes": int(getattr(a, "nbytes", 0))} for name, a in arrays.items()}
+
+
+def _record_step(stage, step, wall, cpu, arrays):
+    record = {"timestamp": time.time(), "stage": stage, "step": step, "wall_seconds": wall, "cpu_seconds": cpu,
+              "rss_bytes": _current_rss_bytes(), "peak_rss_bytes": _peak_rss_bytes(),
+              "arrays": _array_sizes(arrays)}
+    _METRIC_RECORDS.append(record)
+    path = _INSTRUMENTATION["path"]
+    if path is None:
+        return
+    if _INSTRUMENTATION["format"] == "jsonl":
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    else:
+        export_prometheus(path)
+
+
+def export_prometheus(path, records=None):
     """
-    This function provides a quick snapshot of the dataset:
-    1. Loads the raw data into a DataFrame.
-    2. Displays the first few rows with df.head() to show the initial structure of the data.
-    3. Runs df.info() to print out column types and the presence of null values.
-    4. Prints df.describe() to summarize the numerical distributions of key features.
+    Write step totals in the Prometheus text format (e.g. for node_exporter's textfile collector).
 
-    Using these simple steps, you can quickly understand the shape, data types, and basic
-    statistics of the dataset before moving forward with any analysis or modeling.
+    Wall and CPU seconds and run counts are summed per (stage, step); peak RSS and
+    array bytes are the largest seen.
     """
-    with tqdm(total=4, desc="Show dataset info", ncols=80, unit=" steps") as pbar:
-        df = data_frame()
-        pbar.update(1)
+    totals = {}
+    for r in _METRIC_RECORDS if records is None else records:
+        t = totals.setdefault((r["stage"], r["step"]), {"runs": 0, "wall": 0.0, "cpu": 0.0, "rss": 0, "bytes": 0})
+        t["runs"] += 1
+        t["wall"] += r["wall_seconds"]
+        t["cpu"] += r["cpu_seconds"]
+        t["rss"] = max(t["rss"], r["peak_rss_bytes"] or 0)
+        t["bytes"] = max(t["bytes"], sum(a["bytes"] for a in r["arrays"].values()))
+
+    metrics = [("runs_total", "counter", "runs", "Completed runs of a pipeline step."),
+               ("wall_seconds_total", "counter", "wall", "Wall-clock seconds spent in a pipeline step."),
+               ("cpu_seconds_total", "counter", "cpu", "CPU seconds spent in a pipeline step."),
+               ("peak_rss_bytes", "gauge", "rss", "Process peak RSS at the end of a pipeline step."),
+               ("array_bytes", "gauge", "bytes", "Largest total size of the arrays reported by a pipeline step.")]
+    lines = []
+    for suffix, kind, field, help_text in metrics:
+        lines += [f"# HELP mh6804_step_{suffix} {help_text}", f"# TYPE mh6804_step_{suffix} {kind}"]
+        for (stage, step), t in sorted(totals.items()):
+            stage_label = stage.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'mh6804_step_{suffix}{{stage="{stage_label}",step="{step}"}} {t[field]}')
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def instrument(step, stage="", **arrays):
+    """
+    Measure the enclosed block as one step.
 
-        df.head()  # Not printed, but you could print it
-        pbar.update(1)
+    Yields a dict; put output arrays in it to have their sizes recorded. When
+    instrumentation is disabled nothing is measured.
+    """
+    if not _INSTRUMENTATION["enabled"]:
+        yield {}
+        return
+    outputs = dict(arrays)
+    wall, cpu = time.perf_counter(), time.process_time()
+    yield outputs
+    _record_step(stage, step, time.perf_counter() - wall, time.process_time() - cpu, outputs)
+
+
+def instrumented(step):
+    """Decorator form of instrument(): records every call of the function as `step`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _INSTRUMENTATION["enabled"]:
+                return func(*args, **kwargs)
+            with instrument(step, stage=func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class StageProgress:
+    """
+    Progress bar of a stage function that also measures its steps.
 
-        df.info()
-        pbar.update(1)
+    Used like tqdm, but update() names the step that just finished:
+    ``pbar.update(1, "resample", X_resampled=X_res)`` records the wall and CPU
+    time since the previous update, the RSS and the given array sizes. The whole
+    stage is recorded as step "total" when the bar closes.
+    """
 
-        print(df.describe())
-        pbar.update(1)
+    def __init__(self, total=None, desc=None, **tqdm_kwargs):
+        self.desc = desc
+        self._bar = tqdm(total=total, desc=desc, **tqdm_kwargs)
+        self._enabled = _INSTRUMENTATION["enabled"]
+        if self._enabled:
+            self._start = self._mark = (time.perf_counter(), time.process_time())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._bar.close()
+        if self._enabled and exc_info[0] is None:
+            _record_step(self.desc, "total", time.perf_counter() - self._start[0],
+                         time.process_time() - self._start[1], {})
+
+    def update(self, n=1, step=None, **arrays):
+        self._bar.update(n)
+        if self._enabled:
+            now = (time.perf_counter(), time.process_time())
+            _record_step(self.desc, step or f"step_{self._bar.n}", now[0] - self._mark[0],
+                         now[1] - self._mark[1], arrays)
+            self._mark = now
+
+
+if os.environ.get("MH6804_METRICS_FILE"):
+    enable_instrumentation(os.environ["MH6804_METRICS_FILE"])
+
+
+# ---------------------------------- Synthetic data -----------------------------------------------------------------
+
+# Per-component standard deviations of V1 - V28 in creditcard.csv (PCA components, so decreasing).
+_SYNTHETIC_V_STD = np.array([1.96, 1.65, 1.52, 1.42, 1.38, 1.33, 1.24, 1.19, 1.10, 1.09, 1.02, 1.00, 1.00, 0.96,
+                             0.92, 0.88, 0.85, 0.84, 0.81, 0.77, 0.73, 0.73, 0.62, 0.61, 0.52, 0.48, 0.40, 0.33])
+
+# Mean shift of the fraud rows, in the direction of the class means in creditcard.csv.
+_SYNTHETIC_FRAUD_SHIFT = np.zeros(28)
+_SYNTHETIC_FRAUD_SHIFT[[0, 1, 2, 3, 4, 6, 9, 10, 11, 13, 15, 16, 17]] = \
+    [-4.8, 3.6, -7.0, 4.5, -3.2, -5.6, -5.7, 3.8, -6.3, -7.0, -4.1, -6.7, -2.2]
+
+SYNTHETIC_COLUMNS = ["Time"] + [f"V{i}" for i in range(1, 29)] + ["Amount", "Class"]
+
+
+def _synthetic_chunk(rng, n_rows, fraud_rate, time_start, seconds_per_row, dtype):
+    """One chunk of synthetic transactions, in SYNTHETIC_COLUMNS order."""
+    y = (rng.random(n_rows) < fraud_rate).astype(np.int64)
+    n_fraud = int(y.sum())
 
+    V = rng.standard_normal((n_rows, 28)) * _SYNTHETIC_V_STD
+    if n_fraud:
+        # Fraud rows get a shift of random strength and twice the spread, so the classes overlap.
+        strength = rng.uniform(0.1, 1.0, size=(n_fraud, 1))
+        V[y == 1] = V[y == 1] * 2 + strength * _SYNTHETIC_FRAUD_SHIFT
 
-def plot_data(x, y):
+    amount = np.where(y == 1, rng.lognormal(2.5, 2.0, n_rows), rng.lognormal(3.0, 1.5, n_rows))
+    amount = np.round(np.minimum(amount, 25691.16), 2)
+    times = np.floor(time_start + np.cumsum(rng.exponential(seconds_per_row, n_rows)))
+
+    data = {"Time": times.astype(dtype)}
+    data.update({f"V{i + 1}": V[:, i].astype(dtype) for i in range(28)})
+    data["Amount"] = amount.astype(dtype)
+    data["Class"] = y
+    return data
+
+
+def generate_synthetic_data(path, n_rows, fraud_rate=0.00172, fmt="csv", chunk_rows=1000000, seed=0,
+                            dtype=np.float64):
     """
-    Plot a 2D scatter diagram of data points categorized into two classes.
+    Write a synthetic dataset with the creditcard.csv schema (Time, V1 - V28, Amount, Class).
 
-    This function takes a set of data points `x` and their corresponding class labels `y`,
-    then plots the points for Class #0 in one color and Class #1 in another. Each class is
-    visually distinguished by a different color and a legend entry, making it easy to
-    interpret and compare the data distribution of the two classes.
+    The V columns are independent normals with the per-component spread of the
+    real data; fraud rows are shifted towards the real fraud class means (with
+    random strength, so the classes overlap). Amounts are log-normal and Time
+    increases with exponential inter-arrival gaps at the real data's rate
+    (284,807 transactions in 172,792 seconds).
+
+    Rows are generated and written `chunk_rows` at a time, so memory does not
+    depend on `n_rows`. Output is either a CSV (read by load_data() and
+    iter_chunks() like creditcard.csv) or a columnar store directory, filled
+    through memory-mapped .npy files, which load_data() and iter_chunks() open
+    directly. Text formatting makes the CSV output orders of magnitude slower,
+    so use fmt='columnar' for the 10M+ row sizes.
 
     Parameters
     ----------
-    x : array-like, shape (n_samples, 2)
-        The input data points to be plotted. Each row of `x` should represent a single
-        data point with two coordinates, e.g., (x_coordinate, y_coordinate).
-    y : array-like, shape (n_samples,)
-        The class labels corresponding to the data points in `x`. This array should
-        contain 0s and 1s, indicating the class to which each point belongs.
+    path : str
+        Output CSV file, or directory for fmt='columnar'.
+    n_rows : int
+        Number of transactions, e.g. 1_000_000, 10_000_000 or 100_000_000.
+    fraud_rate : float
+        Expected share of Class == 1 rows (creditcard.csv: 0.00172).
+    fmt : {'csv', 'columnar'}
+        Output format.
+    chunk_rows : int
+        Rows generated per step.
+    seed : int
+        Seed of the generator; the same seed and chunk_rows give the same data.
+    dtype : numpy dtype
+        Float dtype of the columnar store (the CSV is text either way).
 
     Returns
     -------
-    None
-        The function does not return any value. It displays a matplotlib plot with
-        two scatter plots overlaid and a legend distinguishing the classes.
+    str
+        `path`.
     """
-    with tqdm(total=1, desc="Plotting data", ncols=80, unit=" steps") as pbar:
-        plt.scatter(x[y == 0, 0], x[y == 0, 1], label="Class #0", alpha=0.5, linewidth=0.15)
-        plt.scatter(x[y == 1, 0], x[y == 1, 1], label="Class #1", alpha=0.5, linewidth=0.15, c='r')
-        plt.legend()
-        pbar.update(1)
+    if fmt not in ("csv", "columnar"):
+        raise ValueError(f"Unknown format {fmt!r}; expected 'csv' or 'columnar'")
+
+    rng = np.random.default_rng(seed)
+    seconds_per_row = 172792 / 284807
+    time_start = 0.0
+
+    if fmt == "columnar":
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=".store-", dir=parent)
+        columns = [np.lib.format.open_memmap(os.path.join(tmp_path, f"col_{i:03d}.npy"), mode="w+",
+                                             dtype=np.int64 if name == "Class" else dtype, shape=(n_rows,))
+                   for i, name in enumerate(SYNTHETIC_COLUMNS)]
+    else:
+        out = open(path, "w", newline="")
+
+    try:
+        with tqdm(total=n_rows, desc="Generating data", ncols=80, unit=" rows", unit_scale=True) as pbar:
+            for start in range(0, n_rows, chunk_rows):
+                size = min(chunk_rows, n_rows - start)
+                data = _synthetic_chunk(rng, size, fraud_rate, time_start, seconds_per_row, dtype)
+                time_start = float(data["Time"][-1])
+                if fmt == "columnar":
+                    for column, name in zip(columns, SYNTHETIC_COLUMNS):
+                        column[start:start + size] = data[name]
+                else:
+                    pd.DataFrame(data).to_csv(out, header=start == 0, index=False, float_format="%.10g")
+                pbar.update(size)
+    finally:
+        if fmt == "csv":
+            out.close()
+
+    if fmt == "columnar":
+        for column in columns:
+            column.flush()
+        schema = {"n_rows": int(n_rows), "source": f"synthetic(seed={seed}, fraud_rate={fraud_rate})",
+                  "content_hash": _stage_key("synthetic", n_rows, fraud_rate, chunk_rows, seed, np.dtype(dtype).str),
+                  "columns": [{"name": name, "dtype": column.dtype.str, "file": f"col_{i:03d}.npy"}
+                              for i, (name, column) in enumerate(zip(SYNTHETIC_COLUMNS, columns))]}
+        del columns
+        with open(os.path.join(tmp_path, SCHEMA_FILE), "w") as f:
+            json.dump(schema, f, indent=2)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+    return path
+
+
+def prep_data(df: "pd.DataFrame") -> (np.ndarray, np.ndarray):
+    """
+        Convert the DataFrame into two variables:
+        X: data columns (FEATURE_COLUMNS: V2 - V28 and Amount)
+        y: label column
+    """
+    with StageProgress(total=2, desc="Preprocessing data", ncols=80, unit=" steps") as pbar:
+        X = df[FEATURE_COLUMNS].values
+        pbar.update(1, "features")
+
+        y = df.Class.values
+        pbar.update(1, "labels")
+
+    return X, y
 
-    plt.show()
 
+# ---------------------------------- Borderline-SMOTE engine ---------------------------------------------------------
+#
+# BorderlineSMOTE only looks at neighbourhoods of the minority rows: the m nearest neighbours of each fraud row
+# among all rows (to find the rows "in danger") and its k nearest neighbours among the fraud rows (to interpolate).
+# imblearn runs a generic k-NN for that; here the distances are computed from the minority rows only, in blocks,
+# and the sorted neighbour lists are kept as an index so different k/m/ratios reuse one search.
 
-def plot_fraud_cases():
+def _sq_norms(X):
+    return np.einsum("ij,ij->i", X, X)
+
+
+def _exact_knn(queries, data, n_neighbors, candidates=None, max_elements=1 << 22):
     """
-    Retrieve a DataFrame of transaction data, preprocess it for modeling,
-    and generate a visual representation of fraudulent vs. non-fraudulent cases.
+    Exact float64 k-NN of `queries` in `data`, ordered by (distance, index).
 
-    This function:
-    1. Calls data_frame() to load or create a DataFrame containing transaction data.
-    2. Uses prep_data() to extract features (X) and labels (y) suitable for modeling.
-    3. Uses plot_data(X, y) to produce a visual plot distinguishing fraud cases from non-fraud cases.
+    With `candidates` (one row of data indices per query) only those rows are
+    compared; otherwise every row of `data`, in blocks of about `max_elements`
+    differences at a time.
     """
-    with tqdm(total=3, desc="Plot fraud cases", ncols=80, unit=" steps") as pbar:
-        df = data_frame()
-        pbar.update(1)
+    queries = np.asarray(queries, dtype=np.float64)
+    if candidates is not None:
+        diffs = np.asarray(data[candidates.ravel()], dtype=np.float64).reshape(
+            candidates.shape + (data.shape[1],)) - queries[:, None, :]
+        dist = np.einsum("qcd,qcd->qc", diffs, diffs)
+        order = np.lexsort((candidates, dist), axis=-1)[:, :n_neighbors]
+        rows = np.arange(len(queries))[:, None]
+        return candidates[rows, order], dist[rows, order]
+
+    best_idx = np.empty((len(queries), 0), dtype=np.int64)
+    best_dist = np.empty((len(queries), 0))
+    block_size = max(1, max_elements // (len(queries) * data.shape[1]))
+    for start in range(0, len(data), block_size):
+        block = np.asarray(data[start:start + block_size], dtype=np.float64)
+        diffs = block[None, :, :] - queries[:, None, :]
+        dist = np.concatenate([best_dist, np.einsum("qcd,qcd->qc", diffs, diffs)], axis=1)
+        idx = np.concatenate([best_idx, np.broadcast_to(
+            np.arange(start, start + len(block)), (len(queries), len(block)))], axis=1)
+        order = np.lexsort((idx, dist), axis=-1)[:, :n_neighbors]
+        rows = np.arange(len(queries))[:, None]
+        best_idx, best_dist = idx[rows, order], dist[rows, order]
+    return best_idx, best_dist
+
+
+def _merge_candidates(best_idx, best_dist, rows, cols, dist, n_keep):
+    """Merge new (row, col, dist) hits into the per-row best lists, keeping the n_keep smallest per row."""
+    n_rows = len(best_idx)
+    row = np.concatenate([np.repeat(np.arange(n_rows), best_idx.shape[1]), rows])
+    idx = np.concatenate([best_idx.ravel(), cols])
+    dst = np.concatenate([best_dist.ravel(), dist])
+    order = np.lexsort((dst, row))
+    row, idx, dst = row[order], idx[order], dst[order]
+    rank = np.arange(len(row)) - np.searchsorted(row, np.arange(n_rows))[row]
+    keep = rank < n_keep
+    return idx[keep].reshape(n_rows, n_keep), dst[keep].reshape(n_rows, n_keep)
+
+
+def blocked_knn(queries, data, n_neighbors, dtype=np.float32, margin=8, query_block=1024, data_block=16384):
+    """
+    k nearest rows of `data` for every row of `queries`, by Euclidean distance.
+
+    Squared distances are screened in `dtype` with the ||x||^2 - 2 q.x expansion
+    (||q||^2 is constant per query), `query_block` x `data_block` at a time,
+    keeping the best `n_neighbors + margin` candidates per query; after the first
+    block only entries below a query's current cutoff are merged. Candidates are
+    then re-ranked with exact float64 distances. A query whose float64 k-th
+    distance plus the rounding bound of the screen is beyond its screening cutoff
+    may have lost a neighbour, so it is recomputed exactly; the result is
+    therefore the exact k-NN (ties broken by row index), with the float32 pass
+    doing almost all of the work.
 
-        X, y = prep_data(df)
-        pbar.update(1)
+    Returns
+    -------
+    np.ndarray of shape (n_queries, n_neighbors)
+        Row indices into `data`, nearest first.
+    """
+    n_neighbors = min(n_neighbors, len(data))
+    n_candidates = min(n_neighbors + margin, len(data))
+    center = np.asarray(data, dtype=np.float64).mean(axis=0)
+    gamma = 4 * (data.shape[1] + 2) * np.finfo(dtype).eps
+    data_norms = None
+
+    result = np.empty((len(queries), n_neighbors), dtype=np.int64)
+    for q_start in range(0, len(queries), query_block):
+        q64 = np.asarray(queries[q_start:q_start + query_block], dtype=np.float64)
+        q = (q64 - center).astype(dtype)
+        q_norms = _sq_norms(q)
+        q_scaled = -2 * q
+        best_idx = np.empty((len(q), 0), dtype=np.int64)
+        best_dist = np.empty((len(q), 0), dtype=dtype)
+        norms = np.empty(len(data), dtype=dtype) if data_norms is None else data_norms
+
+        for start in range(0, len(data), data_block):
+            block = (np.asarray(data[start:start + data_block], dtype=np.float64) - center).astype(dtype)
+            if data_norms is None:
+                norms[start:start + len(block)] = _sq_norms(block)
+            dist = q_scaled @ block.T
+            dist += norms[start:start + len(block)]
+
+            if best_idx.shape[1] < n_candidates:
+                idx = np.concatenate([best_idx, np.broadcast_to(
+                    np.arange(start, start + len(block)), dist.shape)], axis=1)
+                dst = np.concatenate([best_dist, dist], axis=1)
+                if idx.shape[1] > n_candidates:
+                    part = np.argpartition(dst, n_candidates - 1, axis=1)[:, :n_candidates]
+                    rows = np.arange(len(q))[:, None]
+                    idx, dst = idx[rows, part], dst[rows, part]
+                best_idx, best_dist = idx, dst
+                continue
+
+            hits = np.flatnonzero(dist < best_dist.max(axis=1)[:, None])  # 2-D np.nonzero is much slower
+            if len(hits):
+                rows, cols = np.divmod(hits, len(block))
+                best_idx, best_dist = _merge_candidates(best_idx, best_dist, rows, cols + start,
+                                                        dist[rows, cols], n_candidates)
+        data_norms = norms
+
+        idx, exact = _exact_knn(q64, data, n_neighbors, candidates=best_idx)
+        result[q_start:q_start + len(q)] = idx
+
+        if n_candidates < len(data):
+            # A true neighbour x satisfies ||x - c|| <= ||q - c|| + d_k, which bounds its screening error.
+            cutoff = best_dist.max(axis=1).astype(np.float64) + q_norms
+            reach = 2 * np.sqrt(np.maximum(q_norms, 0)) + np.sqrt(exact[:, -1])
+            unsure = np.flatnonzero(exact[:, -1] + gamma * reach ** 2 > cutoff)
+            if len(unsure):
+                result[q_start + unsure] = _exact_knn(q64[unsure], data, n_neighbors)[0]
+    return result
+
+
+@instrumented("neighbour_index")
+def build_neighbour_index(X, y, m_neighbors=10, k_neighbors=5, dtype=np.float32):
+    """
+    Neighbour graph of the minority class of a binary problem, for fast_borderline_smote().
 
-        plot_data(X, y)
-        pbar.update(1)
+    Parameters
+    ----------
+    X : np.ndarray of shape (n_samples, n_features)
+        Training features.
+    y : np.ndarray of shape (n_samples,)
+        Binary labels.
+    m_neighbors, k_neighbors : int
+        Largest neighbourhood sizes the index should serve.
+    dtype : numpy dtype
+        Precision of the blocked distance screen (see blocked_knn()).
+
+    Returns
+    -------
+    dict
+        ``minority_class``, ``minority_indices`` (rows of X), ``nn_all`` (the
+        m_neighbors + 1 nearest rows of X for each minority row, itself
+        included) and ``nn_minority`` (the k_neighbors + 1 nearest minority rows,
+        as positions in minority_indices).
+    """
+    classes, counts = np.unique(y, return_counts=True)
+    if len(classes) != 2:
+        raise ValueError(f"fast_borderline_smote() supports binary targets only, got classes {classes}")
+    minority_class = classes[np.argmin(counts)]
+    minority_indices = np.flatnonzero(y == minority_class)
+    X_class = X[minority_indices]
+
+    return {
+        "minority_class": minority_class,
+        "minority_indices": minority_indices,
+        "nn_all": blocked_knn(X_class, X, m_neighbors + 1, dtype=dtype),
+        "nn_minority": blocked_knn(X_class, X_class, k_neighbors + 1, dtype=dtype),
+    }
 
 
-def compare_plot(X, y, X_resampled, y_resampled, method):
+@instrumented("resample")
+def fast_borderline_smote(X, y, k_neighbors=5, m_neighbors=10, sampling_strategy='auto', random_state=0,
+                          index=None):
     """
-    Plot original data side by side with resampled data, illustrating the
-    effect of the given resampling method.
+    Borderline-SMOTE (kind='borderline-1') using a precomputed minority neighbour index.
+
+    Produces the same X_resampled, y_resampled as
+    ``BorderlineSMOTE(kind='borderline-1', k_neighbors=k_neighbors, m_neighbors=m_neighbors,
+    sampling_strategy=sampling_strategy, random_state=random_state).fit_resample(X, y)``
+    for binary targets, up to the order of equidistant neighbours: blocked_knn breaks
+    distance ties by row index, which sklearn does not guarantee. Otherwise the same
+    rows are found in danger, the same neighbours are drawn with the same random
+    stream, and the samples are interpolated with the same arithmetic.
 
     Parameters
     ----------
-    X : np.ndarray
-        Original feature set.
-    y : np.ndarray
-        Original class labels.
-    X_resampled : np.ndarray
-        Resampled feature set.
-    y_resampled : np.ndarray
-        Resampled class labels.
-    method : str
-        Name or description of the resampling method.
+    X, y : np.ndarray
+        Training data.
+    k_neighbors, m_neighbors : int
+        As in BorderlineSMOTE.
+    sampling_strategy : 'auto' or float
+        'auto' balances the classes; a float is the desired minority/majority ratio.
+    random_state : int, RandomState or None
+        Seed of the sample generation.
+    index : dict, optional
+        Result of build_neighbour_index() for the same X, y. Reused as long as it
+        covers `k_neighbors` and `m_neighbors`; built here otherwise.
+    """
+    from sklearn.utils import check_random_state
+
+    if (index is None or index["nn_all"].shape[1] < m_neighbors + 1
+            or index["nn_minority"].shape[1] < k_neighbors + 1):
+        index = build_neighbour_index(X, y, m_neighbors=m_neighbors, k_neighbors=k_neighbors)
+
+    minority_class = index["minority_class"]
+    minority_indices = index["minority_indices"]
+    n_minority = len(minority_indices)
+    n_majority = len(y) - n_minority
+    if sampling_strategy == 'auto':
+        n_samples = n_majority - n_minority
+    else:
+        n_samples = int(n_majority * sampling_strategy - n_minority)
+        if n_samples < 0:
+            raise ValueError(f"sampling_strategy={sampling_strategy} would remove minority samples")
+    if n_samples == 0:
+        return X.copy(), y.copy()
+
+    # Rows in danger: at least half, but not all, of their m nearest neighbours (self excluded) are majority.
+    nn_all = index["nn_all"][:, 1:m_neighbors + 1]
+    n_maj = np.sum(y[nn_all] != minority_class, axis=1)
+    danger = (n_maj >= m_neighbors / 2) & (n_maj < m_neighbors)
+    if not danger.any():
+        return X.copy(), y.copy()
+
+    X_class = X[minority_indices]
+    X_danger = X_class[danger]
+    nns = index["nn_minority"][danger, 1:k_neighbors + 1]
+
+    random_state = check_random_state(random_state)
+    samples_indices = random_state.randint(low=0, high=nns.size, size=n_samples)
+    steps = random_state.uniform(size=n_samples)[:, np.newaxis]
+    rows = np.floor_divide(samples_indices, nns.shape[1])
+    cols = np.mod(samples_indices, nns.shape[1])
+    diffs = X_class[nns[rows, cols]] - X_danger[rows]
+    X_new = (X_danger[rows] + steps * diffs).astype(X.dtype)
+    y_new = np.full(n_samples, fill_value=minority_class, dtype=y.dtype)
+
+    return np.vstack((X, X_new)), np.hstack((y, y_new))
+
+
+# ---------------------------------- Streaming statistics -----------------------------------------------------------
+#
+# Accumulators that are fed one chunk at a time (see iter_chunks()) and merge exactly, so statistics over the full
+# history cost one sequential read and partial results from different chunks or worker processes can be combined.
+
+class CovarianceAccumulator:
     """
-    with tqdm(total=2, desc=f"Compare {method} data", ncols=80, unit=" plots") as pbar:
-        plt.figure(figsize=(10, 4))
+    Running mean and co-moment matrix of a stream of row blocks.
 
-        plt.subplot(1, 2, 1)
-        plt.scatter(X[y == 0, 0], X[y == 0, 1], label="Class #0", alpha=0.5, linewidth=0.15)
-        plt.scatter(X[y == 1, 0], X[y == 1, 1], label="Class #1", alpha=0.5, linewidth=0.15, c='r')
-        plt.title('Original Set')
-        plt.legend()
-        pbar.update(1)
+    Each block is reduced to its own mean and co-moment and folded in with the
+    pairwise update of Chan, Golub and LeVeque, which stays numerically stable
+    where the textbook sum-of-products formula cancels. merge() uses the same
+    update, so accumulators filled in any order or in separate processes (they
+    pickle) combine to the result of a single pass.
 
-        plt.subplot(1, 2, 2)
-        plt.scatter(X_resampled[y_resampled == 0, 0], X_resampled[y_resampled == 0, 1],
-                    label="Class #0", alpha=0.5, linewidth=0.15)
-        plt.scatter(X_resampled[y_resampled == 1, 0], X_resampled[y_resampled == 1, 1],
-                    label="Class #1", alpha=0.5, linewidth=0.15, c='r')
-        plt.title(method)
-        plt.legend()
-        pbar.update(1)
+    Attributes
+    ----------
+    n : int
+        Rows seen.
+    mean : np.ndarray, shape (n_features,)
+        Column means.
+    comoment : np.ndarray, shape (n_features, n_features)
+        Sum over rows of (x - mean)(x - mean)^T.
+    """
 
-    plt.tight_layout()
-    plt.show()
+    def __init__(self, n_features):
+        self.n = 0
+        self.mean = np.zeros(n_features)
+        self.comoment = np.zeros((n_features, n_features))
+
+    def _combine(self, n, mean, comoment):
+        if n == 0:
+            return self
+        total = self.n + n
+        delta = mean - self.mean
+        self.comoment += comoment + np.outer(delta, delta) * (self.n * n / total)
+        self.mean += delta * (n / total)
+        self.n = total
+        return self
+
+    def update(self, X):
+        """Add the rows of `X` (n_rows, n_features)."""
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) == 0:
+            return self
+        mean = X.mean(axis=0)
+        centred = X - mean
+        return self._combine(len(X), mean, centred.T @ centred)
+
+    def merge(self, other):
+        """Fold another accumulator over the same columns into this one."""
+        return self._combine(other.n, other.mean, other.comoment)
+
+    def covariance(self, ddof=1):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.comoment / (self.n - ddof)
+
+    def correlation(self):
+        """Pearson correlation matrix; NaN for constant columns, as in DataFrame.corr()."""
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = self.comoment / np.outer(std, std)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return np.clip(corr, -1.0, 1.0)
+
+
+def _grouped_update(accumulators, keys, X, n_features):
+    """Update accumulators[key] with the rows of `X` whose entry in `keys` is key."""
+    order = np.argsort(keys, kind="stable")
+    groups, starts = np.unique(keys[order], return_index=True)
+    for group, rows in zip(groups.tolist(), np.split(order, starts[1:])):
+        accumulators.setdefault(group, CovarianceAccumulator(n_features)).update(X[rows])
+
+
+def streaming_correlations(file_path=None, columns=None, chunksize=100000, by_class=False, window=None,
+                           step=None, chunks=None):
+    """
+    Covariance accumulators over the whole dataset in one sequential read.
+
+    Parameters
+    ----------
+    file_path : str, optional
+        CSV path, URL or columnar store; defaults to DATA_URL.
+    columns : list of str, optional
+        Columns to include; all columns by default, as df.corr().
+    chunksize : int
+        Rows read at a time.
+    by_class : bool
+        Also accumulate one matrix per value of LABEL_COLUMN.
+    window : float, optional
+        Length in seconds of sliding windows over the `Time` column.
+    step : float, optional
+        Distance between window starts; defaults to `window` (non-overlapping).
+        `window` must be a multiple of `step`: rows are accumulated once per
+        step-sized bucket and each window is the merge of its buckets.
+    chunks : iterable of DataFrame, optional
+        Use these chunks instead of reading `file_path`.
+
+    Returns
+    -------
+    dict
+        "columns": the column names; "all": a CovarianceAccumulator over every row;
+        "by_class": {label: accumulator} when requested; "windows": a list of
+        (start_seconds, accumulator) when `window` is given.
+    """
+    if window is not None:
+        step = step or window
+        per_window = int(round(window / step))
+        if per_window < 1 or not np.isclose(per_window * step, window):
+            raise ValueError(f"window ({window}) must be a positive multiple of step ({step})")
+
+    result = {"columns": columns, "all": None}
+    classes, buckets = {}, {}
+    chunks = iter_chunks(file_path or DATA_URL, chunksize) if chunks is None else chunks
+    with StageProgress(desc="Streaming correlations", ncols=80, unit=" chunks") as pbar:
+        for chunk in chunks:
+            if result["columns"] is None:
+                result["columns"] = list(chunk.columns)
+            if result["all"] is None:
+                result["all"] = CovarianceAccumulator(len(result["columns"]))
+            X = chunk[result["columns"]].to_numpy(dtype=np.float64)
+            result["all"].update(X)
+            if by_class:
+                _grouped_update(classes, chunk[LABEL_COLUMN].to_numpy(), X, X.shape[1])
+            if window is not None:
+                keys = np.floor(chunk["Time"].to_numpy(dtype=np.float64) / step).astype(np.int64)
+                _grouped_update(buckets, keys, X, X.shape[1])
+            pbar.update(1, "chunk", X=X)
+
+    if by_class:
+        result["by_class"] = dict(sorted(classes.items()))
+    if window is not None:
+        result["windows"] = []
+        if buckets:
+            first, last = min(buckets), max(buckets)
+            for start in range(first, max(first, last - per_window + 1) + 1):
+                acc = CovarianceAccumulator(len(result["columns"]))
+                for bucket in range(start, start + per_window):
+                    if bucket in buckets:
+                        acc.merge(buckets[bucket])
+                result["windows"].append((start * step, acc))
+    return result
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch of several columns with a relative error bound.
+
+    Values are counted in logarithmic buckets as in DDSketch (Masson, Rim and
+    Lee, 2019): a value x > 0 falls in bucket ceil(log(x) / log(gamma)) with
+    gamma = (1 + alpha) / (1 - alpha), negative values likewise by magnitude, and
+    magnitudes below `min_value` in a zero bucket. For any quantile q the
+    estimate x' of the value x of rank floor(q * (count - 1)) satisfies
+    |x' - x| <= alpha * |x| (absolute error `min_value` near zero). Buckets are
+    dense count arrays, so an update is one np.bincount per chunk, merging is an
+    addition, and memory depends only on the range of magnitudes: about
+    log(max / min_value) / alpha buckets per column and sign.
+
+    Parameters
+    ----------
+    n_columns : int
+        Number of columns.
+    relative_accuracy : float
+        alpha above.
+    min_value : float
+        Smallest magnitude kept apart from zero.
+    """
+
+    def __init__(self, n_columns, relative_accuracy=0.01, min_value=1e-9):
+        self.n_columns = n_columns
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self._log_gamma = np.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self._key_offset = int(np.ceil(np.log(min_value) / self._log_gamma))
+        self._counts = np.zeros((2, n_columns, 0), dtype=np.int64)  # [negative, positive], column, bucket
+        self._zeros = np.zeros(n_columns, dtype=np.int64)
+
+    def _grow(self, n_bins):
+        if n_bins > self._counts.shape[2]:
+            grown = np.zeros((2, self.n_columns, max(n_bins, int(self._counts.shape[2] * 1.5))), dtype=np.int64)
+            grown[:, :, :self._counts.shape[2]] = self._counts
+            self._counts = grown
+
+    def update(self, X):
+        """Add the rows of `X` (n_rows, n_columns); NaNs are skipped."""
+        X = np.asarray(X, dtype=np.float64)
+        magnitude = np.abs(X)
+        keep = magnitude >= self.min_value  # False for NaN as well
+        self._zeros += (magnitude < self.min_value).sum(axis=0)
+        rows, cols = np.nonzero(keep)
+        if len(rows) == 0:
+            return self
+        values = X[rows, cols]
+        keys = np.ceil(np.log(np.minimum(np.abs(values), np.finfo(np.float64).max)) / self._log_gamma)
+        keys = keys.astype(np.int64) - self._key_offset
+        self._grow(int(keys.max()) + 1)
+        n_bins = self._counts.shape[2]
+        flat = ((values > 0) * self.n_columns + cols) * n_bins + keys
+        self._counts += np.bincount(flat, minlength=self._counts.size).reshape(self._counts.shape)
+        return self
+
+    def merge(self, other):
+        """Fold in a sketch of the same columns and accuracy."""
+        if (other.relative_accuracy, other.min_value) != (self.relative_accuracy, self.min_value):
+            raise ValueError("Cannot merge sketches with different accuracy settings")
+        self._grow(other._counts.shape[2])
+        self._counts[:, :, :other._counts.shape[2]] += other._counts
+        self._zeros += other._zeros
+        return self
+
+    def count(self):
+        return self._counts.sum(axis=(0, 2)) + self._zeros
+
+    def quantiles(self, qs):
+        """
+        Estimated quantiles, shape (len(qs), n_columns); NaN for empty columns.
+        """
+        qs = np.asarray(qs, dtype=np.float64)
+        n_bins = self._counts.shape[2]
+        bucket_values = 2 * np.exp((np.arange(n_bins) + self._key_offset) * self._log_gamma) / \
+            (1 + np.exp(self._log_gamma))
+        values = np.concatenate([-bucket_values[::-1], [0.0], bucket_values])
+        out = np.full((len(qs), self.n_columns), np.nan)
+        for col in range(self.n_columns):
+            counts = np.concatenate([self._counts[0, col, ::-1], [self._zeros[col]], self._counts[1, col]])
+            cumulative = np.cumsum(counts)
+            if cumulative[-1] == 0:
+                continue
+            ranks = np.floor(qs * (cumulative[-1] - 1))
+            out[:, col] = values[np.searchsorted(cumulative, ranks, side="right")]
+        return out
+
+
+class SummaryAccumulator:
+    """
+    describe()-style statistics of a stream of chunks, with null counts.
+
+    Count, mean and standard deviation use the same pairwise update as
+    CovarianceAccumulator, per column and skipping NaNs; min and max are exact;
+    percentiles come from a QuantileSketch. Accumulators merge exactly (the
+    sketch within its error bound), so chunks can be summarised in worker
+    processes and combined.
+
+    Parameters
+    ----------
+    columns : list of str
+        Column names, in the order of the arrays passed to update().
+    relative_accuracy : float
+        Relative error bound of the percentiles (see QuantileSketch).
+    """
+
+    def __init__(self, columns, relative_accuracy=0.01):
+        n = len(columns)
+        self.columns = list(columns)
+        self.rows = 0
+        self.count = np.zeros(n, dtype=np.int64)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+        self.sketch = QuantileSketch(n, relative_accuracy)
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.m2 += m2 + np.where(total > 0, delta ** 2 * self.count * count / total, 0.0)
+            self.mean += np.where(total > 0, delta * count / total, 0.0)
+        self.count = total
+
+    def update(self, X):
+        """Add the rows of `X` (n_rows, n_columns)."""
+        X = np.asarray(X, dtype=np.float64)
+        valid = ~np.isnan(X)
+        count = valid.sum(axis=0)
+        filled = np.where(valid, X, 0.0)
+        mean = filled.sum(axis=0) / np.maximum(count, 1)
+        m2 = (np.where(valid, X - mean, 0.0) ** 2).sum(axis=0)
+        self._combine(count, mean, m2)
+        self.min = np.minimum(self.min, np.where(valid, X, np.inf).min(axis=0, initial=np.inf))
+        self.max = np.maximum(self.max, np.where(valid, X, -np.inf).max(axis=0, initial=-np.inf))
+        self.sketch.update(X)
+        self.rows += len(X)
+        return self
+
+    def merge(self, other):
+        self._combine(other.count, other.mean, other.m2)
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        self.rows += other.rows
+        return self
+
+    def null_counts(self):
+        return pd.Series(self.rows - self.count, index=self.columns, name="nulls")
+
+    def describe(self, percentiles=(0.25, 0.5, 0.75)):
+        """The statistics as a DataFrame laid out like df.describe()."""
+        empty = self.count == 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std = np.sqrt(self.m2 / (self.count - 1))
+        low = np.where(empty, np.nan, self.min)
+        high = np.where(empty, np.nan, self.max)
+        # Clamping to the exact range can only move an estimate closer to the true quantile.
+        estimates = np.clip(self.sketch.quantiles(percentiles), low, high)
+        rows = [self.count.astype(np.float64), np.where(empty, np.nan, self.mean), std, low]
+        rows += list(estimates) + [high]
+        index = ["count", "mean", "std", "min"] + [f"{p * 100:g}%" for p in percentiles] + ["max"]
+        return pd.DataFrame(rows, index=index, columns=self.columns)
+
+
+def streaming_summary(file_path=None, chunksize=100000, relative_accuracy=0.01, chunks=None):
+    """
+    Summarise every numeric column in one sequential read.
+
+    Parameters
+    ----------
+    file_path : str, optional
+        CSV path, URL or columnar store; defaults to DATA_URL.
+    chunksize : int
+        Rows read at a time.
+    relative_accuracy : float
+        Relative error bound of the percentiles.
+    chunks : iterable of DataFrame, optional
+        Use these chunks instead of reading `file_path`.
+
+    Returns
+    -------
+    (SummaryAccumulator, pd.DataFrame, pd.Series)
+        The accumulator, the first rows of the data (as df.head()) and the
+        column dtypes.
+    """
+    summary, head, dtypes = None, None, None
+    chunks = iter_chunks(file_path or DATA_URL, chunksize) if chunks is None else chunks
+    with StageProgress(desc="Streaming summary", ncols=80, unit=" chunks") as pbar:
+        for chunk in chunks:
+            if summary is None:
+                head, dtypes = chunk.head(), chunk.dtypes
+                summary = SummaryAccumulator(list(chunk.select_dtypes(include="number").columns), relative_accuracy)
+            values = chunk[summary.columns].to_numpy(dtype=np.float64)
+            summary.update(values)
+            pbar.update(1, "chunk", values=values)
+    return summary, head, dtypes
+
+
+# ---------------------------------- Threshold evaluation -----------------------------------------------------------
+#
+# The scores of a test set are sorted once; the confusion counts at every distinct threshold are then cumulative sums
+# of the sorted labels, and every metric below (at one threshold or at all of them) is a vectorized expression over
+# those counts. A full sweep is O(n log n) for the sort plus O(n) for the rest.
+
+# Cost of a missed fraud and of a false alarm, used to pick the cost-optimal threshold (see evaluate_scores()).
+FRAUD_COST = 100.0
+FALSE_ALARM_COST = 1.0
+
+
+def threshold_counts(y_true, scores):
+    """
+    Confusion counts at every distinct score threshold.
+
+    Parameters
+    ----------
+    y_true : np.ndarray
+        Binary labels, 1 for fraud.
+    scores : np.ndarray
+        Scores of class 1; higher means more likely fraud.
+
+    Returns
+    -------
+    dict
+        "thresholds": +inf followed by the distinct scores in decreasing order;
+        "tp", "fp": counts of rows with score >= each threshold (0 at +inf);
+        "n_pos", "n_neg": totals.
+    """
+    y_true = np.asarray(y_true)
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-scores, kind="mergesort")
+    sorted_scores = scores[order]
+    positives = np.cumsum(y_true[order] == 1)
+    last = np.flatnonzero(np.r_[sorted_scores[1:] != sorted_scores[:-1], True])
+    tp = np.r_[0, positives[last]]
+    fp = np.r_[0, last + 1 - positives[last]]
+    return {"thresholds": np.r_[np.inf, sorted_scores[last]], "tp": tp, "fp": fp,
+            "n_pos": int(tp[-1]), "n_neg": int(fp[-1])}
+
+
+def binary_metrics(tp, fp, n_pos, n_neg):
+    """
+    Precision, recall, F1, specificity, accuracy and Cohen's kappa from confusion counts.
+
+    `tp` and `fp` may be scalars or arrays (one entry per threshold); results
+    have the same shape. Undefined ratios (e.g. precision with no positive
+    prediction) are 0, as sklearn's zero_division default.
+    """
+    tp = np.asarray(tp, dtype=np.float64)
+    fp = np.asarray(fp, dtype=np.float64)
+    fn, tn = n_pos - tp, n_neg - fp
+    n = n_pos + n_neg
+
+    def ratio(a, b):
+        return np.divide(a, b, out=np.zeros(np.broadcast(a, b).shape), where=b > 0)
+
+    precision, recall = ratio(tp, tp + fp), ratio(tp, np.full_like(tp, n_pos))
+    npv, specificity = ratio(tn, tn + fn), ratio(tn, np.full_like(tn, n_neg))
+    observed = (tp + tn) / n
+    expected = ((tp + fp) * n_pos + (tn + fn) * n_neg) / n ** 2
+    return {
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "precision": precision, "recall": recall, "f1": ratio(2 * precision * recall, precision + recall),
+        "npv": npv, "specificity": specificity, "f1_negative": ratio(2 * npv * specificity, npv + specificity),
+        "fpr": ratio(fp, np.full_like(fp, n_neg)),
+        "accuracy": observed,
+        "kappa": ratio(observed - expected, 1 - expected),
+    }
+
+
+def counts_at(counts, threshold):
+    """Index into threshold_counts() arrays of the rule `score > threshold`."""
+    return int(np.searchsorted(-counts["thresholds"][1:], -threshold, side="left"))
+
+
+def roc_auc_from_counts(counts):
+    """Area under the ROC curve, by the trapezoidal rule over all thresholds (as roc_auc_score)."""
+    if counts["n_pos"] == 0 or counts["n_neg"] == 0:
+        return float("nan")
+    tpr = counts["tp"] / counts["n_pos"]
+    fpr = counts["fp"] / counts["n_neg"]
+    return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+
+def average_precision_from_counts(counts):
+    """Area under the precision-recall curve as average precision (as average_precision_score)."""
+    if counts["n_pos"] == 0:
+        return float("nan")
+    tp, fp = counts["tp"][1:], counts["fp"][1:]
+    return float(np.sum(np.diff(counts["tp"]) / counts["n_pos"] * tp / (tp + fp)))
+
+
+def classification_report_text(metrics, digits=2):
+    """Format the per-class metrics of evaluate_scores() like sklearn's classification_report()."""
+    width = len("weighted avg")
+    support = np.array([metrics["support"][0], metrics["support"][1]])
+    rows = [(str(label), *metrics["per_class"][label], support[label]) for label in (0, 1)]
+    row_fmt = "{:>{width}s} " + " {:>9.{digits}f}" * 3 + " {:>9}\n"
+    report = ("{:>{width}s} " + " {:>9}" * 4).format("", "precision", "recall", "f1-score", "support",
+                                                      width=width) + "\n\n"
+    for row in rows:
+        report += row_fmt.format(*row, width=width, digits=digits)
+    report += "\n"
+    report += ("{:>{width}s} " + " {:>9.{digits}}" * 2 + " {:>9.{digits}f}" + " {:>9}\n").format(
+        "accuracy", "", "", metrics["accuracy"], support.sum(), width=width, digits=digits)
+    for name in ("macro avg", "weighted avg"):
+        report += row_fmt.format(name, *metrics[name], support.sum(), width=width, digits=digits)
+    return report
+
+
+def evaluate_scores(y_true, scores, threshold=0.5, predicted=None, fraud_cost=None, false_alarm_cost=None):
+    """
+    Evaluate a binary classifier at its operating point and across all thresholds from one sort.
+
+    Parameters
+    ----------
+    y_true : np.ndarray
+        True labels.
+    scores : np.ndarray
+        Predicted probability (or any score) of class 1.
+    threshold : float
+        Operating point: rows with score > threshold are predicted as fraud, as
+        predict() does for probabilities at 0.5.
+    predicted : np.ndarray, optional
+        The model's own predicted labels; when given, the operating-point counts
+        are taken from them instead of from `threshold`.
+    fraud_cost, false_alarm_cost : float, optional
+        Costs of a false negative and of a false positive; default FRAUD_COST
+        and FALSE_ALARM_COST.
+
+    Returns
+    -------
+    dict
+        "confusion_matrix", "support", "accuracy", "kappa", "per_class" ({label:
+        (precision, recall, f1)}), "macro avg", "weighted avg" at the operating
+        point; "roc_auc", "pr_auc"; "curve": the metrics of binary_metrics() at
+        every threshold of threshold_counts(); "best_f1" and "cost_optimal":
+        {"threshold", "precision", "recall", "f1", "cost"} of the rule
+        `score >= threshold` that maximizes F1 or minimizes
+        fraud_cost * FN + false_alarm_cost * FP.
+    """
+    fraud_cost = FRAUD_COST if fraud_cost is None else fraud_cost
+    false_alarm_cost = FALSE_ALARM_COST if false_alarm_cost is None else false_alarm_cost
+    y_true = np.asarray(y_true)
+    counts = threshold_counts(y_true, scores)
+    n_pos, n_neg = counts["n_pos"], counts["n_neg"]
+    curve = binary_metrics(counts["tp"], counts["fp"], n_pos, n_neg)
+    curve["thresholds"] = counts["thresholds"]
+
+    if predicted is None:
+        at = counts_at(counts, threshold)
+        tp, fp = counts["tp"][at], counts["fp"][at]
+    else:
+        cells = np.bincount(2 * (y_true == 1) + (np.asarray(predicted) == 1), minlength=4)
+        tp, fp = cells[3], cells[1]
+    point = binary_metrics(tp, fp, n_pos, n_neg)
+    per_class = {0: (float(point["npv"]), float(point["specificity"]), float(point["f1_negative"])),
+                 1: (float(point["precision"]), float(point["recall"]), float(point["f1"]))}
+    support = {0: n_neg, 1: n_pos}
+
+    def summary(index, cost):
+        return {"threshold": float(counts["thresholds"][index]), "precision": float(curve["precision"][index]),
+                "recall": float(curve["recall"][index]), "f1": float(curve["f1"][index]), "cost": float(cost)}
+
+    costs = fraud_cost * curve["fn"] + false_alarm_cost * curve["fp"]
+    best_f1, cheapest = int(np.argmax(curve["f1"])), int(np.argmin(costs))
+    return {
+        "confusion_matrix": np.array([[n_neg - fp, fp], [n_pos - tp, tp]], dtype=np.int64),
+        "support": support,
+        "accuracy": float(point["accuracy"]),
+        "kappa": float(point["kappa"]),
+        "per_class": per_class,
+        "macro avg": tuple(float(np.mean([per_class[0][i], per_class[1][i]])) for i in range(3)),
+        "weighted avg": tuple(float((per_class[0][i] * n_neg + per_class[1][i] * n_pos) / max(n_pos + n_neg, 1))
+                              for i in range(3)),
+        "roc_auc": roc_auc_from_counts(counts),
+        "pr_auc": average_precision_from_counts(counts),
+        "curve": curve,
+        "best_f1": summary(best_f1, costs[best_f1]),
+        "cost_optimal": summary(cheapest, costs[cheapest]),
+    }
+
+
+def print_operating_points(metrics):
+    """Print the PR AUC and the best-F1 and cost-optimal thresholds of evaluate_scores() results."""
+    print(f"PR AUC (average precision): {metrics['pr_auc']:.4f}")
+    for label, key in (("Best F1", "best_f1"), ("Cost-optimal", "cost_optimal")):
+        point = metrics[key]
+        print(f"{label} threshold: {point['threshold']:.4f}  Precision: {point['precision']:.3f}  "
+              f"Recall: {point['recall']:.3f}  F-Measure: {point['f1']:.3f}  Cost: {point['cost']:g}")
+
+
+# ---------------------------------- Experiment stages ---------------------------------------------------------------
+#
+# The model functions share the same prep -> split -> resample -> scale chain. Each stage is memoized by a key
+# derived from its input's key and its own parameters, so within one process every stage runs once; with
+# persist=True (or MH6804_PERSIST_STAGES=1) the results are also saved under STAGE_CACHE_DIR and reruns skip
+# finished stages entirely.
+
+STAGE_CACHE_DIR = os.path.join(CACHE_DIR, "stages")
+MAX_SMOTE_NEIGHBORS = 15  # neighbourhood size kept by the neighbour stage
+PERSIST_STAGES = os.environ.get("MH6804_PERSIST_STAGES") == "1"
+
+_STAGE_MEMO = {}
+
+
+def _stage_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def array_fingerprint(*arrays):
+    """SHA-256 over the shape, dtype and bytes of the given arrays."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.shape}{array.dtype.str}".encode())
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+def cached_stage(name, key, compute, persist=None, cache_dir=None):
+    """
+    Return the arrays computed by `compute()` for stage `name` and `key`, running it at most once.
+
+    Parameters
+    ----------
+    name : str
+        Stage name, used in the on-disk directory name.
+    key : str
+        Identifies the stage input and parameters (see _stage_key()).
+    compute : callable
+        Returns a tuple of np.ndarray.
+    persist : bool, optional
+        Also keep the result on disk. Defaults to PERSIST_STAGES.
+    cache_dir : str, optional
+        Where persisted stages live. Defaults to STAGE_CACHE_DIR.
+    """
+    memo_key = (name, key)
+    if memo_key in _STAGE_MEMO:
+        return _STAGE_MEMO[memo_key]
+
+    persist = PERSIST_STAGES if persist is None else persist
+    stage_path = os.path.join(cache_dir or STAGE_CACHE_DIR, f"{name}-{key}")
+    if persist and os.path.isdir(stage_path):
+        files = sorted(f for f in os.listdir(stage_path) if f.endswith(".npy"))
+        result = tuple(np.load(os.path.join(stage_path, f), mmap_mode="r") for f in files)
+    else:
+        result = tuple(compute())
+        if persist:
+            os.makedirs(os.path.dirname(stage_path), exist_ok=True)
+            tmp_path = tempfile.mkdtemp(prefix=".stage-", dir=os.path.dirname(stage_path))
+            for i, array in enumerate(result):
+                np.save(os.path.join(tmp_path, f"{i:02d}.npy"), array)
+            if os.path.isdir(stage_path):
+                shutil.rmtree(tmp_path)
+            else:
+                os.replace(tmp_path, stage_path)
+
+    _STAGE_MEMO[memo_key] = result
+    return result
+
+
+def clear_stage_cache():
+    """Forget the in-process stage results (persisted stages are left on disk)."""
+    _STAGE_MEMO.clear()
+
+
+def experiment_data():
+    """
+    Prep stage: X, y from data_frame(), plus the key identifying them.
+
+    The key is the content hash of the source recorded by the columnar cache, or a
+    hash of X and y when the frame did not come from the cache.
+    """
+    df = data_frame()
+    content_hash = df.attrs.get("content_hash")
+    key = _stage_key("prep", content_hash, FEATURE_COLUMNS) if content_hash else None
+
+    if key is None:
+        X, y = prep_data(df)
+        key = _stage_key("prep", array_fingerprint(X, y))
+        return cached_stage("prep", key, lambda: (X, y), persist=False) + (key,)
+
+    X, y = cached_stage("prep", key, lambda: prep_data(df), persist=False)
+    return X, y, key
+
+
+def experiment_split(stratify=False, train_size=0.8, random_state=0):
+    """
+    Split stage: train_test_split of the prep stage.
+
+    Returns
+    -------
+    tuple
+        X_train, X_test, y_train, y_test, key
+    """
+    from sklearn.model_selection import train_test_split
+
+    X, y, data_key = experiment_data()
+    key = _stage_key(data_key, "split", stratify, train_size, random_state)
+    split = cached_stage("split", key, lambda: train_test_split(
+        X, y, train_size=train_size, random_state=random_state, stratify=y if stratify else None))
+    return split + (key,)
+
+
+def experiment_time_split(train_until=None, test_until=None, train_fraction=0.8):
+    """
+    Out-of-time split stage: train on the transactions before `train_until`, test on the ones after.
+
+    Parameters
+    ----------
+    train_until : float, optional
+        Time (seconds) at which the training window ends; by default the Time
+        before which `train_fraction` of the transactions fall.
+    test_until : float, optional
+        Time at which the test window ends; the end of the data by default.
+
+    Returns
+    -------
+    tuple
+        X_train, X_test, y_train, y_test, time_train, time_test, key; both windows in Time order.
+    """
+    X, y, data_key = experiment_data()
+    key = _stage_key(data_key, "time_split", train_until, test_until, train_fraction)
+
+    def split():
+        times = data_frame()["Time"].to_numpy(dtype=np.float64)
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        end = times[min(int(train_fraction * len(times)), len(times) - 1)] if train_until is None else train_until
+        n_train = np.searchsorted(times, end)
+        n_end = len(times) if test_until is None else np.searchsorted(times, test_until)
+        train, test = order[:n_train], order[n_train:n_end]
+        return X[train], X[test], y[train], y[test], times[:n_train], times[n_train:n_end]
+
+    return cached_stage("time_split", key, split) + (key,)
+
+
+def experiment_neighbours(stratify=False):
+    """
+    Neighbour stage: the minority neighbour index of the training split (see build_neighbour_index()).
+
+    Returns
+    -------
+    tuple
+        index, key
+    """
+    X_train, _, y_train, _, split_key = experiment_split(stratify)
+    key = _stage_key(split_key, "neighbours", MAX_SMOTE_NEIGHBORS)
+    names = ("minority_class", "minority_indices", "nn_all", "nn_minority")
+    arrays = cached_stage("neighbours", key, lambda: (lambda index: tuple(np.asarray(index[n]) for n in names))(
+        build_neighbour_index(X_train, y_train, m_neighbors=MAX_SMOTE_NEIGHBORS,
+                              k_neighbors=MAX_SMOTE_NEIGHBORS)))
+    index = dict(zip(names, arrays))
+    index["minority_class"] = index["minority_class"][()]
+    return index, key
+
+
+def experiment_resample(stratify=False, random_state=0, k_neighbors=5, sampling_strategy='auto', engine='fast'):
+    """
+    Resample stage: BorderlineSMOTE(kind='borderline-1') on the training split.
+
+    engine='fast' uses fast_borderline_smote() with the shared neighbour stage, so
+    changing `k_neighbors` or `sampling_strategy` does not repeat the neighbour
+    search; engine='imblearn' calls imblearn's BorderlineSMOTE.
+
+    Returns
+    -------
+    tuple
+        X_resampled, y_resampled, key
+    """
+    from imblearn.over_sampling import BorderlineSMOTE
+
+    X_train, _, y_train, _, split_key = experiment_split(stratify)
+    key = _stage_key(split_key, "resample", "borderline-1", random_state, k_neighbors, sampling_strategy, engine)
+
+    def resample():
+        if engine == 'imblearn':
+            return BorderlineSMOTE(kind='borderline-1', random_state=random_state, k_neighbors=k_neighbors,
+                                   sampling_strategy=sampling_strategy).fit_resample(X_train, y_train)
+        index, _ = experiment_neighbours(stratify)
+        return fast_borderline_smote(X_train, y_train, k_neighbors=k_neighbors,
+                                     sampling_strategy=sampling_strategy, random_state=random_state, index=index)
+
+    resampled = cached_stage("resample", key, resample)
+    return resampled + (key,)
+
+
+def experiment_scale(stratify=False):
+    """
+    Scale stage: StandardScaler fitted on the resampled training set.
+
+    Returns
+    -------
+    tuple
+        X_resampled_scaled, X_test_scaled, scaler
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    _, X_test, _, _, _ = experiment_split(stratify)
+    X_res, _, resample_key = experiment_resample(stratify)
+    key = _stage_key(resample_key, "scale")
+
+    def scale():
+        scaler = StandardScaler()
+        X_res_scaled = scaler.fit_transform(X_res)
+        return X_res_scaled, scaler.transform(X_test), scaler.mean_, scaler.scale_, scaler.var_
+
+    X_res_scaled, X_test_scaled, mean, scale_, var = cached_stage("scale", key, scale)
+    scaler = StandardScaler()
+    scaler.mean_, scaler.scale_, scaler.var_ = np.asarray(mean), np.asarray(scale_), np.asarray(var)
+    scaler.n_features_in_ = len(mean)
+    scaler.n_samples_seen_ = len(X_res)
+    return X_res_scaled, X_test_scaled, scaler
+
+
+def show_head_info(relative_accuracy=0.01):
+    """
+    This function provides a quick snapshot of the dataset:
+    1. Streams the raw data once, chunk by chunk, through streaming_summary().
+    2. Keeps the first few rows, as df.head() would show, to show the initial structure of the data.
+    3. Prints the column types and null counts, as df.info() does.
+    4. Prints the describe() table to summarize the numerical distributions of key features.
+       The percentiles are approximate, within `relative_accuracy` of the exact value.
+
+    Using these simple steps, you can quickly understand the shape, data types, and basic
+    statistics of the dataset before moving forward with any analysis or modeling, with
+    memory that does not depend on the size of the file.
+    """
+    with StageProgress(total=4, desc="Show dataset info", ncols=80, unit=" steps") as pbar:
+        summary, head, dtypes = streaming_summary(DATA_URL, relative_accuracy=relative_accuracy)
+        pbar.update(1, "load")
+
+        head  # Not printed, but you could print it
+        pbar.update(1, "head")
+
+        nulls = summary.null_counts().reindex(dtypes.index, fill_value=0)
+        print(f"{summary.rows} entries, {len(dtypes)} columns")
+        print(pd.DataFrame({"Non-Null Count": summary.rows - nulls, "Null Count": nulls, "Dtype": dtypes}))
+        pbar.update(1, "info")
+
+        print(summary.describe())
+        pbar.update(1, "describe")
+
+
+def set_headless(plot_dir):
+    """
+    Save every figure as a PNG under `plot_dir` instead of blocking on plt.show().
+
+    Selects matplotlib's non-interactive Agg backend, before pyplot is first
+    imported when possible.
+    """
+    global PLOT_DIR
+    PLOT_DIR = plot_dir
+    os.environ["MPLBACKEND"] = "Agg"
+    if "matplotlib.pyplot" in sys.modules:
+        plt.switch_backend("Agg")
+
+
+def show_figure(name):
+    """Show the current figure, or save it as `<PLOT_DIR>/<name>.png` in headless mode."""
+    if PLOT_DIR is None:
+        plt.show()
+        return
+    os.makedirs(PLOT_DIR, exist_ok=True)
+    path = os.path.join(PLOT_DIR, f"{name}.png")
+    plt.savefig(path, bbox_inches="tight")
+    plt.close("all")
+    print(f"Saved {path}")
+
+
+# Rendering mode of plot_data() and compare_plot(): "scatter" draws every point, "density" bins the
+# majority class into a DENSITY_BINS x DENSITY_BINS image, "auto" picks density above SCATTER_MAX_POINTS.
+PLOT_MODE = "auto"
+DENSITY_BINS = 300
+SCATTER_MAX_POINTS = 100000
+OVERLAY_MAX_POINTS = 20000  # minority classes larger than this are overlaid as a second image
+
+
+def plot_extent(*point_sets):
+    """Common (xmin, xmax, ymin, ymax) of the first two columns of every array, so panels share axes."""
+    lows = np.min([p[:, :2].min(axis=0) for p in point_sets if len(p)], axis=0)
+    highs = np.max([p[:, :2].max(axis=0) for p in point_sets if len(p)], axis=0)
+    span = np.where(highs > lows, highs - lows, 1.0)
+    return lows[0], lows[0] + span[0], lows[1], lows[1] + span[1]
+
+
+def density_grids(x, y, bins=DENSITY_BINS, extent=None, n_classes=2, block_rows=1000000):
+    """
+    Count the points of every class on a `bins` x `bins` grid over the first two columns of `x`.
+
+    Points are binned block by block with a single np.bincount per block, so the
+    cost is one pass over the rows and the memory is bounded by `block_rows`
+    plus the grid, whatever the size of `x`.
+
+    Parameters
+    ----------
+    x : np.ndarray, shape (n_samples, >= 2)
+        Points; only the first two columns are used.
+    y : np.ndarray, shape (n_samples,)
+        Integer class labels in [0, n_classes).
+    bins : int
+        Number of bins along each axis.
+    extent : tuple, optional
+        (xmin, xmax, ymin, ymax) of the grid. Defaults to plot_extent(x).
+    n_classes : int
+        Number of label values.
+    block_rows : int
+        Rows binned at a time.
+
+    Returns
+    -------
+    np.ndarray, shape (n_classes, bins, bins)
+        Counts, indexed [class, row (y bin), column (x bin)] as imshow expects.
+    """
+    if extent is None:
+        extent = plot_extent(x)
+    xmin, xmax, ymin, ymax = extent
+    scale = np.array([bins / (xmax - xmin), bins / (ymax - ymin)])
+    origin = np.array([xmin, ymin])
+    counts = np.zeros(n_classes * bins * bins, dtype=np.int64)
+    for start in range(0, len(x), block_rows):
+        cells = ((x[start:start + block_rows, :2] - origin) * scale).astype(np.int64)
+        np.clip(cells, 0, bins - 1, out=cells)
+        flat = (np.asarray(y[start:start + block_rows], dtype=np.int64) * bins + cells[:, 1]) * bins + cells[:, 0]
+        counts += np.bincount(flat, minlength=counts.size)
+    return counts.reshape(n_classes, bins, bins)
+
+
+def _draw_points(ax, x, y, title=None, mode=None, extent=None, bins=DENSITY_BINS):
+    """
+    Draw the two classes of `x` on `ax` as a scatter or, for large inputs, as a density image.
+
+    In density mode Class #0 is drawn as a log-scaled grey image. Class #1 stays
+    visible on top: as red points when there are at most OVERLAY_MAX_POINTS of
+    them, otherwise as a red image whose empty cells are transparent.
+    """
+    mode = mode or PLOT_MODE
+    if mode == "auto":
+        mode = "density" if len(x) > SCATTER_MAX_POINTS else "scatter"
+    if mode not in ("scatter", "density"):
+        raise ValueError(f"Unknown plot mode {mode!r}; expected 'auto', 'scatter' or 'density'")
+    if title:
+        ax.set_title(title)
+
+    if mode == "scatter":
+        ax.scatter(x[y == 0, 0], x[y == 0, 1], label="Class #0", alpha=0.5, linewidth=0.15)
+        ax.scatter(x[y == 1, 0], x[y == 1, 1], label="Class #1", alpha=0.5, linewidth=0.15, c='r')
+        ax.legend()
+        return
+
+    from matplotlib.colors import LogNorm
+    from matplotlib.patches import Patch
+
+    extent = extent if extent is not None else plot_extent(x)
+    grids = density_grids(x, y, bins=bins, extent=extent)
+    majority = np.ma.masked_equal(grids[0], 0)
+    ax.imshow(majority, origin="lower", extent=extent, aspect="auto", cmap="Greys",
+              norm=LogNorm(vmin=1, vmax=max(majority.max(), 2)), interpolation="nearest")
+    handles = [Patch(color="0.4", label="Class #0 (density)")]
+    if grids[1].sum() <= OVERLAY_MAX_POINTS:
+        minority = x[y == 1]
+        handles.append(ax.scatter(minority[:, 0], minority[:, 1], label="Class #1", s=6, alpha=0.7,
+                                  linewidth=0, c='r'))
+    else:
+        overlay = np.ma.masked_equal(grids[1], 0)
+        ax.imshow(overlay, origin="lower", extent=extent, aspect="auto", cmap="Reds", alpha=0.6,
+                  norm=LogNorm(vmin=1, vmax=max(overlay.max(), 2)), interpolation="nearest")
+        handles.append(Patch(color="r", alpha=0.6, label="Class #1 (density)"))
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
+    ax.legend(handles=handles)
+
+
+def plot_data(x, y, mode=None):
+    """
+    Plot a 2D scatter diagram of data points categorized into two classes.
+
+    This function takes a set of data points `x` and their corresponding class labels `y`,
+    then plots the points for Class #0 in one color and Class #1 in another. Each class is
+    visually distinguished by a different color and a legend entry, making it easy to
+    interpret and compare the data distribution of the two classes.
+
+    Above SCATTER_MAX_POINTS points the majority class is drawn as a density image instead
+    (see density_grids()), so the rendering cost depends on the grid size rather than on
+    the number of rows; the fraud cases are still drawn on top.
+
+    Parameters
+    ----------
+    x : array-like, shape (n_samples, 2)
+        The input data points to be plotted. Each row of `x` should represent a single
+        data point with two coordinates, e.g., (x_coordinate, y_coordinate).
+    y : array-like, shape (n_samples,)
+        The class labels corresponding to the data points in `x`. This array should
+        contain 0s and 1s, indicating the class to which each point belongs.
+    mode : {"auto", "scatter", "density"}, optional
+        Rendering mode; defaults to PLOT_MODE.
+
+    Returns
+    -------
+    None
+        The function does not return any value. It displays a matplotlib plot with
+        the two classes overlaid and a legend distinguishing them.
+    """
+    with StageProgress(total=1, desc="Plotting data", ncols=80, unit=" steps") as pbar:
+        _draw_points(plt.gca(), x, y, mode=mode)
+        pbar.update(1, "render", x=x)
+
+    show_figure("fraud_cases")
+
+
+def plot_fraud_cases():
+    """
+    Retrieve a DataFrame of transaction data, preprocess it for modeling,
+    and generate a visual representation of fraudulent vs. non-fraudulent cases.
+
+    This function:
+    1. Calls data_frame() to load or create a DataFrame containing transaction data.
+    2. Uses prep_data() to extract features (X) and labels (y) suitable for modeling.
+    3. Uses plot_data(X, y) to produce a visual plot distinguishing fraud cases from non-fraud cases.
+    """
+    with StageProgress(total=3, desc="Plot fraud cases", ncols=80, unit=" steps") as pbar:
+        df = data_frame()
+        pbar.update(1, "load")
+
+        X, y = prep_data(df)
+        pbar.update(1, "prep")
+
+        plot_data(X, y)
+        pbar.update(1, "plot")
+
+
+def compare_plot(X, y, X_resampled, y_resampled, method, mode=None):
+    """
+    Plot original data side by side with resampled data, illustrating the
+    effect of the given resampling method.
+
+    Both panels share the same axis limits. Large inputs are rendered as density
+    images as in plot_data().
+
+    Parameters
+    ----------
+    X : np.ndarray
+        Original feature set.
+    y : np.ndarray
+        Original class labels.
+    X_resampled : np.ndarray
+        Resampled feature set.
+    y_resampled : np.ndarray
+        Resampled class labels.
+    method : str
+        Name or description of the resampling method.
+    mode : {"auto", "scatter", "density"}, optional
+        Rendering mode; defaults to PLOT_MODE.
+    """
+    with StageProgress(total=2, desc=f"Compare {method} data", ncols=80, unit=" plots") as pbar:
+        fig, (ax_original, ax_resampled) = plt.subplots(1, 2, figsize=(10, 4), sharex=True, sharey=True)
+        extent = plot_extent(X, X_resampled)
+
+        _draw_points(ax_original, X, y, title='Original Set', mode=mode, extent=extent)
+        pbar.update(1, "original", X=X)
+
+        _draw_points(ax_resampled, X_resampled, y_resampled, title=method, mode=mode, extent=extent)
+        pbar.update(1, "resampled", X_resampled=X_resampled)
+
+    plt.tight_layout()
+    show_figure(f"compare_{method}")
+
+
+def plot_compared_resample_data():
+    """
+    This function demonstrates how SMOTE (Synthetic Minority Over-sampling Technique)
+    reshapes an imbalanced dataset by creating additional minority class samples.
+
+    Steps:
+    1. Load and prepare the dataset, separating features (X) and labels (y).
+    2. Apply SMOTE to generate synthetic minority samples, balancing the classes.
+    3. Use the compare_plot function to visualize the original data and the SMOTE-resampled data
+       side by side. This helps you clearly see how SMOTE affects the distribution
+       and density of the minority class points.
+    """
+    from imblearn.over_sampling import SMOTE
+
+    with StageProgress(total=3, desc="Comparing SMOTE data", ncols=80, unit=" steps") as pbar:
+        df = data_frame()
+        X, y = prep_data(df)
+        pbar.update(1, "load")
+
+        method = SMOTE()
+        X_resampled, y_resampled = method.fit_resample(X, y)
+        pbar.update(1, "resample")
+
+        compare_plot(X, y, X_resampled, y_resampled, method='SMOTE')
+        pbar.update(1, "plot")
+
+
+def plot_class_distribution():
+    """
+    Plot the distribution of classes in the dataset and annotate the plot
+    with the exact counts of non-fraud (Class=0) and fraud (Class=1) transactions.
+
+    This function:
+    - Loads the credit card transaction data.
+    - Calculates the exact number of occurrences for each class.
+    - Plots a count chart of Class 0 and Class 1 occurrences using seaborn.
+    - Annotates the bars directly above their respective green (no fraud) and red (fraud) bars.
+    """
+    with StageProgress(total=4, desc="Plot class distribution", ncols=80, unit=" steps") as pbar:
+        sns.set_theme()
+        df = data_frame()
+        pbar.update(1, "load")
+
+        occurrences = df['Class'].value_counts()
+        no_fraud_count = occurrences.get(0, 0)
+        fraud_count = occurrences.get(1, 0)
+        pbar.update(1, "count")
+
+        g = sns.catplot(
+            x='Class',
+            kind='count',
+            data=df,
+            hue='Class',
+            palette=["g", "r"],
+            height=4
+        )
+        pbar.update(1, "catplot")
+
+        plt.title('Class Distributions \n (0: No Fraud || 1: Fraud)', fontsize=14)
+        ax = g.ax
+        bars = ax.patches
+        no_fraud_bar = bars[0]
+        fraud_bar = bars[1]
+        no_fraud_x = no_fraud_bar.get_x() + no_fraud_bar.get_width() / 2
+        no_fraud_y = no_fraud_bar.get_height()
+        fraud_x = fraud_bar.get_x() + fraud_bar.get_width() / 2
+        fraud_y = fraud_bar.get_height()
+        ax.text(no_fraud_x, no_fraud_y + 0.5, f"{no_fraud_count}",
+                ha='center', va='bottom', color='black', fontsize=12)
+        ax.text(fraud_x, fraud_y + 0.5, f"{fraud_count}",
+                ha='center', va='bottom', color='black', fontsize=12)
+        pbar.update(1, "annotate")
+
+    show_figure("class_distribution")
+
+
+def print_metrics(title, metrics):
+    """Print evaluate_scores() results in the same layout as the classifier functions."""
+    print(f"\n=== {title} Results ===")
+    print("Classification Report:")
+    print(classification_report_text(metrics))
+    print("Confusion Matrix:")
+    print(metrics["confusion_matrix"])
+    print(f"Kappa statistic: {metrics['kappa']:.4f}")
+    print("ROC AUC:", metrics["roc_auc"])
+    print_operating_points(metrics)
+
+
+def print_evaluation(title, y_test, predicted, probabilities):
+    """
+    Print the classification report, confusion matrix, Cohen's kappa, ROC AUC
+    and the PR AUC and best thresholds of a fitted model in the same layout as
+    the classifier functions.
+
+    Everything is derived from a single sort of the scores by evaluate_scores().
+
+    Parameters
+    ----------
+    title : str
+        Model name printed in the header.
+    y_test : np.ndarray
+        True labels.
+    predicted : np.ndarray
+        Predicted labels.
+    probabilities : np.ndarray
+        Predicted probability of class 1, used for the ROC AUC and the threshold sweep.
+
+    Returns
+    -------
+    float
+        The ROC AUC.
+    """
+    metrics = evaluate_scores(y_test, probabilities, predicted=predicted)
+    print_metrics(title, metrics)
+    return metrics["roc_auc"]
+
+
+def smote_resample():
+    """
+    This function demonstrates how to improve classification results on a highly
+    imbalanced dataset by using Borderline-SMOTE and Logistic Regression.
+
+    Steps:
+    1. Load and prepare the transaction data.
+    2. Split the data into training and testing sets.
+    3. Use Borderline-SMOTE to create synthetic samples of the minority class,
+       balancing the dataset.
+    4. Scale the features to improve the model’s performance and stability.
+    5. Train a Logistic Regression model using the balanced, scaled training data.
+    6. Evaluate the model using accuracy, precision, recall, F1-score, and Cohen’s Kappa.
+    7. Print a detailed report, including a confusion matrix and metrics by class,
+       to understand how the model performs on both fraudulent and legitimate transactions.
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    with StageProgress(total=6, desc="SMOTE Resample", ncols=80, unit=" steps") as pbar:
+        experiment_data()
+        pbar.update(1, "prep")
+
+        _, _, _, y_test, _ = experiment_split()
+        pbar.update(1, "split")
+
+        _, y_resampled, data_key = experiment_resample()
+        pbar.update(1, "resample", y_resampled=y_resampled)
+
+        X_resampled_scaled, X_test_scaled, scaler = experiment_scale()
+        pbar.update(1, "scale", X_resampled_scaled=X_resampled_scaled)
+
+        model = LogisticRegression(solver='liblinear', max_iter=1000, random_state=0)
+        model.fit(X_resampled_scaled, y_resampled)
+        pbar.update(1, "fit")
+
+        predicted = model.predict(X_test_scaled)
+        metrics = evaluate_scores(y_test, model.predict_proba(X_test_scaled)[:, 1], predicted=predicted)
+        _save_trained("smote_logistic_regression", model, scaler, data_key, metrics)
+        cm = metrics["confusion_matrix"]
+        accuracy = metrics["accuracy"] * 100
+        kappa = metrics["kappa"]
+
+        total_instances = len(y_test)
+        correctly_classified = cm.diagonal().sum()
+        incorrectly_classified = total_instances - correctly_classified
+
+        print(f"Correctly Classified Instances      {correctly_classified}               {accuracy:.4f} %")
+        print(f"Incorrectly Classified Instances    {incorrectly_classified}               {(100 - accuracy):.4f} %")
+        print(f"Kappa statistic                     {kappa:.4f}")
+        print(f"Total Number of Instances           {total_instances}")
+
+        print("\n=== Detailed Accuracy By Class ===")
+        for cls, (precision, recall, f1) in metrics["per_class"].items():
+            print(f"Class {cls}: Precision: {precision:.3f}  Recall: {recall:.3f}  F-Measure: {f1:.3f}")
+
+        w_precision, w_recall, w_f1 = metrics["weighted avg"]
+        print(f"Weighted Avg: Precision: {w_precision:.3f}  Recall: {w_recall:.3f}  F-Measure: {w_f1:.3f}")
+        print(f"ROC AUC                             {metrics['roc_auc']:.4f}")
+        print_operating_points(metrics)
+
+        print("\n=== Confusion Matrix ===")
+        print(cm)
+        plt.figure(figsize=(8, 6))
+        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=["Class 0", "Class 1"],
+                    yticklabels=["Class 0", "Class 1"])
+        plt.title("Confusion Matrix Heatmap")
+        plt.xlabel("Predicted Labels")
+        plt.ylabel("True Labels")
+        show_figure("smote_confusion_matrix")
+        pbar.update(1, "evaluate")
+
+
+def apply_pipeline():
+    """
+        Load transaction data, preprocess it, and apply a pipeline combining SMOTE
+        for class balancing and Logistic Regression for classification.
+
+        Steps:
+        1. Retrieve the shared training and testing split.
+        2. Take the Borderline-SMOTE oversampled training data from the resample stage.
+        3. Train a Logistic Regression model on the balanced data.
+        4. Predict on the test set and print the classification report and confusion matrix.
+
+        This function helps demonstrate how incorporating SMOTE
+        can influence the classification results, particularly for imbalanced datasets.
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    with StageProgress(total=4, desc="Apply pipeline", ncols=80, unit=" steps") as pbar:
+        _, X_test, _, y_test, _ = experiment_split()
+        pbar.update(1, "split")
+
+        # Same as Pipeline([('SMOTE', BorderlineSMOTE), ('Logistic Regression', model)]).fit(): the sampler
+        # only acts during fit, so the model is fitted on the shared resample stage and predicts on raw X_test.
+        X_resampled, y_resampled, _ = experiment_resample()
+        model = LogisticRegression(solver='liblinear')
+        pbar.update(1, "resample")
+
+        model.fit(X_resampled, y_resampled)
+        pbar.update(1, "fit")
+
+        predicted = model.predict(X_test)
+        metrics = evaluate_scores(y_test, model.predict_proba(X_test)[:, 1], predicted=predicted)
+        print('Classifcation report:\n', classification_report_text(metrics))
+        print('Confusion matrix:\n', metrics["confusion_matrix"])
+        print_operating_points(metrics)
+        pbar.update(1, "evaluate")
+
+
+def classifies_using_random_forest():
+    with StageProgress(total=6, desc="Random Forest classification", ncols=80, unit=" steps") as pbar:
+        experiment_data()
+        pbar.update(1, "prep")
+
+        _, X_test, _, y_test, _ = experiment_split(stratify=True)
+        pbar.update(1, "split")
+
+        X_res, y_res, data_key = experiment_resample(stratify=True)
+        pbar.update(1, "resample", X_resampled=X_res)
+
+        rf = build_random_forest(n_jobs=-1)
+        rf.fit(X_res, y_res)
+        pbar.update(1, "fit")
+
+        rf_pred = rf.predict(X_test)
+        pbar.update(1, "predict", X_test=X_test)
+
+        metrics = evaluate_scores(y_test, rf.predict_proba(X_test)[:, 1], predicted=rf_pred)
+        print_metrics("Random Forest", metrics)
+        _save_trained("random_forest", rf, None, data_key, metrics)
+        rf_auc = metrics["roc_auc"]
+
+        rf_importances = pd.DataFrame({'feature': FEATURE_COLUMNS, 'importance': rf.feature_importances_})
+        rf_importances_sorted = rf_importances.sort_values('importance', ascending=False)
+        print("\nImportance from Random Forest:\n", rf_importances_sorted.head(28))
+        pbar.update(1, "evaluate")
+
+    return rf_auc
+
+
+def correlations_in_data(by_class=False, window=None):
+    """
+    Plot a heatmap of the correlation matrix of all variables.
+
+    The matrix is accumulated chunk by chunk with streaming_correlations(), so the
+    full table is never held in memory.
+
+    Parameters
+    ----------
+    by_class : bool
+        Also plot the non-fraud and fraud matrices side by side.
+    window : float, optional
+        Also plot each variable's correlation with the class over sliding
+        windows of this many seconds of the `Time` column.
+    """
+    with StageProgress(total=2, desc="Correlations", ncols=80, unit=" steps") as pbar:
+        stats = streaming_correlations(DATA_URL, by_class=by_class, window=window)
+        columns = stats["columns"]
+        correlation_matrix = pd.DataFrame(stats["all"].correlation(), index=columns, columns=columns)
+        pbar.update(1, "accumulate")
+
+        plt.figure(figsize=(16, 12))
+        sns.heatmap(correlation_matrix, annot=False, cmap='coolwarm', linewidths=0.5)
+        plt.title('Correlation Matrix of All Variables', fontsize=16)
+        show_figure("correlations")
+
+        if by_class:
+            fig, axes = plt.subplots(1, len(stats["by_class"]), figsize=(24, 10))
+            for ax, (label, acc) in zip(np.atleast_1d(axes), stats["by_class"].items()):
+                sns.heatmap(pd.DataFrame(acc.correlation(), index=columns, columns=columns), ax=ax,
+                            vmin=-1, vmax=1, cmap='coolwarm', linewidths=0.5)
+                ax.set_title(f'Class {label} ({acc.n} rows)', fontsize=14)
+            show_figure("correlations_by_class")
+
+        if window is not None:
+            features = [c for c in columns if c not in (LABEL_COLUMN, "Time")]
+            label_index = columns.index(LABEL_COLUMN)
+            feature_index = [columns.index(c) for c in features]
+            rows = [acc.correlation()[label_index, feature_index] for _, acc in stats["windows"]]
+            starts = [f"{start / 3600:g}h" for start, _ in stats["windows"]]
+            plt.figure(figsize=(16, max(4, len(rows) * 0.3)))
+            sns.heatmap(pd.DataFrame(rows, index=starts, columns=features), vmin=-1, vmax=1, cmap='coolwarm')
+            plt.title(f'Correlation with {LABEL_COLUMN} per {window:g}s window', fontsize=16)
+            show_figure("correlations_windows")
+        pbar.update(1, "plot")
+
+
+def classifies_using_logic_regression():
+    with StageProgress(total=7, desc="Logistic Regression classification", ncols=80, unit=" steps") as pbar:
+        experiment_data()
+        pbar.update(1, "prep")
+
+        _, _, _, y_test, _ = experiment_split(stratify=True)
+        pbar.update(1, "split")
+
+        _, y_res, data_key = experiment_resample(stratify=True)
+        pbar.update(1, "resample", y_resampled=y_res)
+
+        X_res_scaled, X_test_scaled, scaler = experiment_scale(stratify=True)
+        pbar.update(1, "scale", X_resampled_scaled=X_res_scaled)
+
+        lr = build_logistic_regression()
+        lr.fit(X_res_scaled, y_res)
+        pbar.update(1, "fit")
+
+        lr_pred = lr.predict(X_test_scaled)
+        pbar.update(1, "predict", X_test=X_test_scaled)
+
+        metrics = evaluate_scores(y_test, lr.predict_proba(X_test_scaled)[:, 1], predicted=lr_pred)
+        print_metrics("Logistic Regression", metrics)
+        _save_trained("logistic_regression", lr, scaler, data_key, metrics)
+
+        conf_mat = metrics["confusion_matrix"]
+        plt.figure(figsize=(8, 6))
+        sns.heatmap(conf_mat, annot=True, fmt='d', cmap='Blues', xticklabels=["Class 0", "Class 1"],
+                    yticklabels=["Class 0", "Class 1"])
+        plt.title("Logistic Regression Confusion Matrix Heatmap")
+        plt.xlabel("Predicted Labels")
+        plt.ylabel("True Labels")
+        show_figure("logistic_regression_confusion_matrix")
+
+        lr_auc = metrics["roc_auc"]
+        lr_coeff = pd.DataFrame({'feature': FEATURE_COLUMNS, 'coefficient': lr.coef_[0]})
+        lr_coeff_sorted = lr_coeff.sort_values('coefficient', ascending=False)
+        print("\nTop variables from Logistic Regression:\n", lr_coeff_sorted.head(10))
+        pbar.update(1, "evaluate")
+
+    return lr_auc
+
+
+def classifies_using_streaming_logistic_regression(file_path=DATA_URL, chunksize=100000, test_size=0.2,
+                                                   n_epochs=1, random_state=0):
+    """
+    Train a logistic regression out of core, one chunk at a time.
+
+    The data is read through iter_chunks(), so memory is bounded by `chunksize`
+    rather than by the size of the file:
+
+    1. Each chunk is split into train/test rows with a seeded random mask (the
+       same mask is reproduced on every pass).
+    2. The StandardScaler statistics are updated with partial_fit() on the training
+       rows of the chunk, which are then scaled and fed to an SGD logistic
+       regression with partial_fit(). Rows are weighted by the inverse of the
+       class frequencies seen so far, in place of class_weight='balanced'.
+    3. A final pass scores the held-out rows; only their labels and scores are kept.
+
+    No resampling is done: BorderlineSMOTE needs the whole minority neighbourhood
+    in memory, which is exactly what this mode avoids.
+
+    Returns
+    -------
+    float
+        The ROC AUC on the held-out rows, printed in the same format as
+        classifies_using_logic_regression().
+    """
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    model = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=random_state)
+    classes = np.array([0, 1])
+    class_counts = np.zeros(2, dtype=np.int64)
+
+    def split_chunks():
+        rng = np.random.default_rng(random_state)
+        for chunk in iter_chunks(file_path, chunksize):
+            X = chunk[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+            y = chunk[LABEL_COLUMN].to_numpy(dtype=np.int64)
+            yield X, y, rng.random(len(y)) < test_size
+
+    with StageProgress(total=n_epochs + 1, desc="Streaming Logistic Regression", ncols=80, unit=" passes") as pbar:
+        for epoch in range(n_epochs):
+            for X, y, is_test in split_chunks():
+                X_train, y_train = X[~is_test], y[~is_test]
+                if len(y_train) == 0:
+                    continue
+                if epoch == 0:
+                    scaler.partial_fit(X_train)
+                    class_counts += np.bincount(y_train, minlength=2)
+                weights = class_counts.sum() / (2.0 * np.maximum(class_counts, 1))
+                model.partial_fit(scaler.transform(X_train), y_train, classes=classes,
+                                  sample_weight=weights[y_train])
+            pbar.update(1, "fit")
+
+        y_test, scores = [], []
+        for X, y, is_test in split_chunks():
+            y_test.append(y[is_test])
+            scores.append(model.predict_proba(scaler.transform(X[is_test]))[:, 1])
+        y_test = np.concatenate(y_test)
+        scores = np.concatenate(scores)
+        pbar.update(1, "predict")
+
+    predicted = (scores > 0.5).astype(y_test.dtype)
+    return print_evaluation("Streaming Logistic Regression", y_test, predicted, scores)
+
+
+# ---------------------------------- Parallel model comparison ------------------------------------------------------
+
+def build_logistic_regression(**params):
+    """
+    The logistic regression used by classifies_using_logic_regression() (liblinear is single-threaded).
+
+    Keyword arguments override its parameters, e.g. a configuration found by hyperparameter_search().
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    return LogisticRegression(**{"solver": 'liblinear', "class_weight": 'balanced', "random_state": 0, **params})
+
+
+def build_random_forest(n_jobs=None, **params):
+    """
+    The random forest used by classifies_using_random_forest(); `n_jobs` threads build the trees.
+
+    Keyword arguments override its parameters, e.g. a configuration found by hyperparameter_search().
+    """
+    from sklearn.ensemble import RandomForestClassifier
+
+    return RandomForestClassifier(**{"class_weight": 'balanced_subsample', "random_state": 0, "n_estimators": 10,
+                                     "n_jobs": n_jobs, **params})
+
+
+# Model name -> (builder, whether it is trained on StandardScaler output).
+MODEL_CANDIDATES = {
+    "Logistic Regression": (build_logistic_regression, True),
+    "Random Forest": (build_random_forest, False),
+}
+
+
+def build_candidate(name, n_jobs=None, **params):
+    """Build MODEL_CANDIDATES[name]; `n_jobs` goes only to the builders that take it."""
+    import inspect
+
+    builder, _ = MODEL_CANDIDATES[name]
+    if "n_jobs" in inspect.signature(builder).parameters:
+        params["n_jobs"] = n_jobs
+    return builder(**params)
+
+
+def share_arrays(arrays):
+    """
+    Copy arrays into shared memory blocks that worker processes can map without copying.
+
+    Parameters
+    ----------
+    arrays : dict
+        Name -> np.ndarray.
+
+    Returns
+    -------
+    tuple
+        (specs, blocks): `specs` is a picklable name -> (block name, shape, dtype)
+        dict for attach_shared_arrays(); `blocks` are the SharedMemory objects,
+        which the caller must close() and unlink() when the workers are done.
+    """
+    specs, blocks = {}, []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        specs[name] = (block.name, array.shape, array.dtype.str)
+        blocks.append(block)
+    return specs, blocks
+
+
+def attach_shared_arrays(specs):
+    """
+    Map the blocks described by share_arrays() specs as read-only arrays.
+
+    Returns
+    -------
+    tuple
+        (arrays, blocks). Drop every reference to `arrays` before closing `blocks`.
+    """
+    arrays, blocks = {}, []
+    for name, (block_name, shape, dtype) in specs.items():
+        # Pool workers share the parent's resource tracker, so registering the block again is harmless
+        # and the parent's unlink() remains the only cleanup.
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+        blocks.append(block)
+    return arrays, blocks
+
+
+def release_shared_arrays(blocks, unlink=False):
+    for block in blocks:
+        block.close()
+        if unlink:
+            block.unlink()
+
+
+def feature_ranking(model, feature_names):
+    """Coefficients (linear models) or impurity importances (forests), sorted in descending order."""
+    if hasattr(model, "coef_"):
+        ranking = pd.DataFrame({'feature': feature_names, 'coefficient': model.coef_[0]})
+        return ranking.sort_values('coefficient', ascending=False)
+    ranking = pd.DataFrame({'feature': feature_names, 'importance': model.feature_importances_})
+    return ranking.sort_values('importance', ascending=False)
+
+
+def _evaluate_candidate(name, arrays, n_jobs):
+    _, scaled = MODEL_CANDIDATES[name]
+    X_fit = arrays["X_res_scaled"] if scaled else arrays["X_res"]
+    X_eval = arrays["X_test_scaled"] if scaled else arrays["X_test"]
+    y_test = arrays["y_test"]
+
+    start = time.perf_counter()
+    model = build_candidate(name, n_jobs)
+    model.fit(X_fit, arrays["y_res"])
+    fit_seconds = time.perf_counter() - start
+
+    predicted = model.predict(X_eval)
+    scores = model.predict_proba(X_eval)[:, 1]
+    metrics = evaluate_scores(y_test, scores, predicted=predicted)
+    metrics.pop("curve")
+    return {
+        "name": name,
+        "auc": metrics["roc_auc"],
+        "report": classification_report_text(metrics),
+        "confusion_matrix": metrics["confusion_matrix"],
+        "metrics": metrics,
+        "ranking": feature_ranking(model, FEATURE_COLUMNS),
+        "scores": scores,
+        "fit_seconds": fit_seconds,
+    }
+
+
+def _fit_candidate(name, specs, n_jobs):
+    """Worker: fit and evaluate one candidate on the shared training arrays."""
+    arrays, blocks = attach_shared_arrays(specs)
+    try:
+        return _evaluate_candidate(name, arrays, n_jobs)
+    finally:
+        del arrays
+        release_shared_arrays(blocks)
+
+
+def compare_models_parallel(names=None, max_workers=None):
+    """
+    Fit every model candidate in its own worker process and collect the results.
+
+    The stratified split, the resampled training set and its scaled copy come from
+    the shared experiment stages and are placed once in shared memory; workers map
+    them without copying. Forests use the cores left over by the other workers, so
+    comparing N models costs about as much as the slowest one.
+
+    Parameters
+    ----------
+    names : list of str, optional
+        Keys of MODEL_CANDIDATES to compare; all of them by default.
+    max_workers : int, optional
+        Worker processes; one per candidate by default.
+
+    Returns
+    -------
+    list of dict
+        Per candidate: name, auc, report, confusion_matrix, metrics (evaluate_scores()
+        without the curve), ranking, scores (test probabilities), fit_seconds,
+        in the order of `names`.
+    """
+    names = list(MODEL_CANDIDATES) if names is None else list(names)
+    max_workers = max_workers or min(len(names), os.cpu_count() or 1)
+    n_jobs = max(1, (os.cpu_count() or 1) // max_workers)
+
+    _, X_test, _, y_test, _ = experiment_split(stratify=True)
+    X_res, y_res, _ = experiment_resample(stratify=True)
+    X_res_scaled, X_test_scaled, _ = experiment_scale(stratify=True)
+    specs, blocks = share_arrays({"X_res": X_res, "y_res": y_res, "X_test": X_test, "y_test": y_test,
+                                  "X_res_scaled": X_res_scaled, "X_test_scaled": X_test_scaled})
+    results = {}
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(_fit_candidate, name, specs, n_jobs): name for name in names}
+            with tqdm(total=len(names), desc="Compare Models (parallel)", ncols=80, unit=" models") as pbar:
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+                    pbar.update(1)
+    finally:
+        release_shared_arrays(blocks, unlink=True)
+    return [results[name] for name in names]
+
+
+def compare_models_results(parallel=False, max_workers=None):
+    """
+    Print the ROC AUC of every model.
+
+    By default each classifier function runs in turn, with its plots. With
+    parallel=True the candidates are trained concurrently by
+    compare_models_parallel() and only their reports are printed, with
+    bootstrap intervals of the AUCs (see bootstrap_metrics()).
+    """
+    if parallel:
+        print("\n=== Model Comparison ===")
+        results = compare_models_parallel(max_workers=max_workers)
+        for result in results:
+            print(f"\n=== {result['name']} Results ===")
+            print("Classification Report:")
+            print(result["report"])
+            print("Confusion Matrix:")
+            print(result["confusion_matrix"])
+            print("ROC AUC:", result["auc"])
+            print_operating_points(result["metrics"])
+            print(f"\nFeature ranking from {result['name']}:\n", result["ranking"].head(10))
+        _, _, _, y_test, _ = experiment_split(stratify=True)
+        intervals = bootstrap_metrics(y_test, {result["name"]: result["scores"] for result in results})["intervals"]
+        for result in results:
+            auc = intervals[(intervals["model"] == result["name"]) & (intervals["metric"] == "roc_auc")].iloc[0]
+            print(f"{result['name']} AUC: {result['auc']}  "
+                  f"(95% bootstrap CI {auc['ci_low']:.4f}-{auc['ci_high']:.4f}, fit {result['fit_seconds']:.1f}s)")
+        return
+
+    with StageProgress(total=2, desc="Compare Models", ncols=80, unit=" steps") as pbar:
+        print("\n=== Model Comparison ===")
+        print("Logistic Regression AUC:", classifies_using_logic_regression())
+        pbar.update(1, "logistic_regression")
+
+        print("Random Forest AUC:", classifies_using_random_forest())
+        pbar.update(1, "random_forest")
+
+
+# ---------------------------------- Bootstrap confidence intervals -------------------------------------------------
+#
+# A bootstrap replicate draws n test rows with replacement; every metric here depends only on how many times each
+# row was drawn. Rows that no model can tell apart (same label, and for every model the same position relative to
+# the fraud scores and the threshold) are interchangeable, so the replicate reduces to one multinomial draw of
+# counts over those groups: one per fraud plus at most a few per gap between fraud scores. With ~100 frauds that is
+# a few hundred groups instead of the full test set, and the AUCs of all replicates become one matrix product.
+# Every model is scored on the same replicates, which gives the paired differences.
+
+BOOTSTRAP_METRICS = ("roc_auc", "recall", "precision")
+
+
+def _bootstrap_groups(y_true, scores, threshold):
+    """
+    Group the test rows for bootstrap_metrics().
+
+    Returns
+    -------
+    tuple
+        sizes (rows per group; the positives first, one group each), and per
+        model: the weight (1, 0.5 or 0) of each negative group in the AUC of each
+        positive, the negative groups scored above the threshold, and the
+        positives scored above it.
+    """
+    positive = np.asarray(y_true) == 1
+    codes, below, negative_flagged, positive_flagged = [], [], [], []
+    for model_scores in scores:
+        model_scores = np.asarray(model_scores, dtype=np.float64)
+        bounds = np.unique(np.r_[model_scores[positive], threshold])
+        # Even codes: strictly between two bounds; odd codes: equal to a bound.
+        position = np.searchsorted(bounds, model_scores[~positive])
+        equal = bounds[np.minimum(position, len(bounds) - 1)] == model_scores[~positive]
+        codes.append(2 * position + equal)
+        positive_flagged.append(model_scores[positive] > threshold)
+    negative_groups, inverse = np.unique(np.stack(codes, axis=1), axis=0, return_inverse=True)
+    sizes = np.r_[np.ones(positive.sum(), dtype=np.int64), np.bincount(inverse.ravel())]
+
+    for m, model_scores in enumerate(scores):
+        bounds = np.unique(np.r_[np.asarray(model_scores, dtype=np.float64)[positive], threshold])
+        positive_codes = 2 * np.searchsorted(bounds, np.asarray(model_scores, dtype=np.float64)[positive]) + 1
+        group_codes = negative_groups[:, m]
+        below.append((group_codes[:, None] < positive_codes[None, :]) +
+                      0.5 * (group_codes[:, None] == positive_codes[None, :]))
+        threshold_code = 2 * np.searchsorted(bounds, threshold) + 1
+        negative_flagged.append(group_codes > threshold_code)
+    return sizes, below, negative_flagged, positive_flagged
+
+
+def bootstrap_metrics(y_true, scores, n_boot=10000, threshold=0.5, confidence=0.95, random_state=0,
+                      block_size=2000):
+    """
+    Bootstrap confidence intervals of ROC AUC, recall and precision, and paired differences between models.
+
+    Parameters
+    ----------
+    y_true : np.ndarray
+        Test labels.
+    scores : dict
+        Model name -> test scores of class 1, all for the same rows.
+    n_boot : int
+        Bootstrap replicates; every model is scored on the same ones.
+    threshold : float
+        Rows scored above it are flagged, as in the classifier functions.
+    confidence : float
+        Level of the percentile intervals.
+    block_size : int
+        Replicates drawn at a time (bounds the memory).
+
+    Returns
+    -------
+    dict
+        intervals: DataFrame of model, metric, estimate, ci_low, ci_high, std;
+        comparisons: DataFrame of model_a, model_b, metric, difference (a - b),
+        ci_low, ci_high, p_value (two-sided, from the share of replicates
+        on either side of 0); replicates: (model, metric) -> np.ndarray; seconds.
+    """
+    started = time.perf_counter()
+    names = list(scores)
+    sizes, below, negative_flagged, positive_flagged = _bootstrap_groups(y_true, [scores[n] for n in names],
+                                                                         threshold)
+    n_pos = len(positive_flagged[0])
+    rng = np.random.default_rng(random_state)
+
+    def metrics_of(counts):
+        positives, negatives = counts[:, :n_pos].astype(np.float64), counts[:, n_pos:].astype(np.float64)
+        total_positive, total_negative = positives.sum(axis=1), negatives.sum(axis=1)
+        result = {}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for m, name in enumerate(names):
+                true_positive = positives[:, positive_flagged[m]].sum(axis=1)
+                false_positive = negatives[:, negative_flagged[m]].sum(axis=1)
+                result[name, "roc_auc"] = np.einsum("bp,bp->b", negatives @ below[m], positives) / (
+                    total_positive * total_negative)
+                result[name, "recall"] = true_positive / total_positive
+                result[name, "precision"] = true_positive / (true_positive + false_positive)
+        return result
+
+    estimates = {key: values[0] for key, values in metrics_of(sizes[None, :]).items()}
+    blocks = []
+    for begin in range(0, n_boot, block_size):
+        counts = rng.multinomial(sizes.sum(), sizes / sizes.sum(), size=min(block_size, n_boot - begin))
+        blocks.append(metrics_of(counts))
+    replicates = {key: np.concatenate([block[key] for block in blocks]) for key in estimates}
+
+    alpha = (1 - confidence) / 2 * 100
+    intervals = []
+    for (name, metric), values in replicates.items():
+        low, high = np.nanpercentile(values, [alpha, 100 - alpha])
+        intervals.append({"model": name, "metric": metric, "estimate": estimates[name, metric],
+                          "ci_low": low, "ci_high": high, "std": np.nanstd(values)})
+    comparisons = []
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            for metric in BOOTSTRAP_METRICS:
+                difference = replicates[a, metric] - replicates[b, metric]
+                difference = difference[~np.isnan(difference)]
+                low, high = np.percentile(difference, [alpha, 100 - alpha])
+                p_value = min(1.0, 2 * min(np.mean(difference <= 0), np.mean(difference >= 0)))
+                comparisons.append({"model_a": a, "model_b": b, "metric": metric,
+                                    "difference": estimates[a, metric] - estimates[b, metric],
+                                    "ci_low": low, "ci_high": high, "p_value": p_value})
+    return {"intervals": pd.DataFrame(intervals), "comparisons": pd.DataFrame(comparisons),
+            "replicates": replicates, "seconds": time.perf_counter() - started}
+
+
+def print_bootstrap_comparison(n_boot=10000, max_workers=None, confidence=0.95):
+    """Train every model candidate (see compare_models_parallel()) and print bootstrap intervals of their metrics."""
+    _, _, _, y_test, _ = experiment_split(stratify=True)
+    results = compare_models_parallel(max_workers=max_workers)
+    bootstrap = bootstrap_metrics(y_test, {result["name"]: result["scores"] for result in results}, n_boot=n_boot,
+                                  confidence=confidence)
+    level = f"{confidence:.0%}"
+    print(f"\n=== Bootstrap {level} intervals ({n_boot} replicates, {bootstrap['seconds']:.2f}s) ===")
+    print(bootstrap["intervals"].to_string(index=False, float_format="%.4f"))
+    print(f"\n=== Paired differences ({level} intervals) ===")
+    print(bootstrap["comparisons"].to_string(index=False, float_format="%.4f"))
+    return bootstrap
+
+
+# ---------------------------------- Cross-validation ---------------------------------------------------------------
+
+CV_METRICS = ("roc_auc", "pr_auc", "precision", "recall", "f1", "kappa")
+
+
+def _fold_metrics(metrics):
+    precision, recall, f1 = metrics["per_class"][1]
+    return {"roc_auc": metrics["roc_auc"], "pr_auc": metrics["pr_auc"], "precision": precision,
+            "recall": recall, "f1": f1, "kappa": metrics["kappa"]}
+
+
+def _evaluate_fold(fold, arrays, names, n_jobs, random_state):
+    """
+    Resample, scale, fit and score every candidate on one fold.
+
+    Only the training rows of the fold are resampled and used to fit the
+    scaler, so no synthetic sample or scaling statistic leaks into the
+    held-out rows.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    in_test = arrays["folds"] == fold
+    X_train, y_train = arrays["X"][~in_test], arrays["y"][~in_test]
+    X_test, y_test = arrays["X"][in_test], arrays["y"][in_test]
+
+    start = time.perf_counter()
+    X_res, y_res = fast_borderline_smote(X_train, y_train, random_state=random_state)
+    scaler = StandardScaler()
+    X_res_scaled = scaler.fit_transform(X_res)
+    X_test_scaled = scaler.transform(X_test)
+    resample_seconds = time.perf_counter() - start
+
+    results = []
+    for name in names:
+        _, scaled = MODEL_CANDIDATES[name]
+        start = time.perf_counter()
+        model = build_candidate(name, n_jobs)
+        model.fit(X_res_scaled if scaled else X_res, y_res)
+        scores = model.predict_proba(X_test_scaled if scaled else X_test)[:, 1]
+        metrics = evaluate_scores(y_test, scores, predicted=(scores > 0.5).astype(y_test.dtype))
+        results.append({"name": name, "fold": fold, "metrics": _fold_metrics(metrics),
+                        "fit_seconds": time.perf_counter() - start, "resample_seconds": resample_seconds,
+                        "test_index": np.flatnonzero(in_test), "scores": scores})
+    return results
+
+
+def _cross_validate_fold(fold, specs, names, n_jobs, random_state):
+    """Worker: evaluate one fold on the shared X, y and fold assignment."""
+    arrays, blocks = attach_shared_arrays(specs)
+    try:
+        return _evaluate_fold(fold, arrays, names, n_jobs, random_state)
+    finally:
+        del arrays
+        release_shared_arrays(blocks)
+
+
+def cross_validate_models(names=None, n_splits=5, random_state=0, max_workers=None):
+    """
+    Stratified k-fold cross-validation of the model candidates, one fold per worker process.
+
+    X, y and the fold assignment are placed in shared memory once. Each worker
+    runs the Borderline-SMOTE -> StandardScaler -> classifier chain of the model
+    functions on its fold's training rows only and scores the held-out rows, for
+    every candidate, so the resampling is done once per fold. With at least
+    `n_splits` cores this takes about as long as one train/test split.
+
+    Parameters
+    ----------
+    names : list of str, optional
+        Keys of MODEL_CANDIDATES; all of them by default.
+    n_splits : int
+        Number of folds.
+    random_state : int
+        Seed of the fold shuffle and of the resampler.
+    max_workers : int, optional
+        Worker processes; one per fold, up to the number of cores, by default.
+        With 1 the folds run in this process.
+
+    Returns
+    -------
+    dict
+        "folds": a DataFrame with one row per (model, fold) and the CV_METRICS,
+        fit_seconds and resample_seconds columns; "summary": per model the mean
+        and std over folds of each metric, plus the ROC AUC and PR AUC of the
+        pooled out-of-fold scores.
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    names = list(MODEL_CANDIDATES) if names is None else list(names)
+    max_workers = max_workers or min(n_splits, os.cpu_count() or 1)
+    n_jobs = max(1, (os.cpu_count() or 1) // max_workers)
+
+    X, y, _ = experiment_data()
+    folds = np.empty(len(y), dtype=np.int16)
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    for fold, (_, test_index) in enumerate(splitter.split(np.zeros(len(y)), y)):
+        folds[test_index] = fold
+
+    results = []
+    with StageProgress(total=n_splits, desc=f"{n_splits}-fold CV", ncols=80, unit=" folds") as pbar:
+        if max_workers == 1:
+            arrays = {"X": X, "y": y, "folds": folds}
+            for fold in range(n_splits):
+                results += _evaluate_fold(fold, arrays, names, n_jobs, random_state)
+                pbar.update(1, f"fold_{fold}")
+        else:
+            specs, blocks = share_arrays({"X": X, "y": y, "folds": folds})
+            try:
+                with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                    futures = [pool.submit(_cross_validate_fold, fold, specs, names, n_jobs, random_state)
+                               for fold in range(n_splits)]
+                    for future in as_completed(futures):
+                        results += future.result()
+                        pbar.update(1, "fold")
+            finally:
+                release_shared_arrays(blocks, unlink=True)
+
+    per_fold = pd.DataFrame([{"model": r["name"], "fold": r["fold"], **r["metrics"],
+                              "fit_seconds": r["fit_seconds"], "resample_seconds": r["resample_seconds"]}
+                             for r in results]).sort_values(["model", "fold"], ignore_index=True)
+    summary = per_fold.groupby("model")[list(CV_METRICS)].agg(["mean", "std"])
+    for name in names:
+        pooled = np.empty(len(y))
+        for r in results:
+            if r["name"] == name:
+                pooled[r["test_index"]] = r["scores"]
+        metrics = evaluate_scores(y, pooled)
+        summary.loc[name, ("pooled_roc_auc", "")] = metrics["roc_auc"]
+        summary.loc[name, ("pooled_pr_auc", "")] = metrics["pr_auc"]
+    return {"folds": per_fold, "summary": summary}
+
+
+def print_cross_validation(n_splits=5, max_workers=None, names=None):
+    """Run cross_validate_models() and print the per-fold and aggregated metrics."""
+    cv = cross_validate_models(names=names, n_splits=n_splits, max_workers=max_workers)
+    with pd.option_context("display.width", 160, "display.max_columns", 40, "display.precision", 4):
+        print(f"\n=== {n_splits}-fold Cross-Validation (per fold) ===")
+        print(cv["folds"])
+        print(f"\n=== {n_splits}-fold Cross-Validation (mean, std) ===")
+        print(cv["summary"])
+    return cv
+
+
+# ---------------------------------- Hyperparameter search ----------------------------------------------------------
+#
+# Successive halving (Jamieson and Talwalkar, 2016): every configuration is first trained on a small subsample of the
+# resampled training rows, and only the best 1/eta of each model's configurations are promoted to the next rung,
+# which has eta times the rows. Forests are trained with warm_start and carried from rung to rung, so a promoted
+# forest only grows its new trees. Scores come from a validation split of the training rows; the test split is used
+# once, for the winner.
+
+SEARCH_SPACES = {
+    "Logistic Regression": {
+        "C": [0.001, 0.01, 0.1, 1.0, 10.0, 100.0],
+        "penalty": ["l1", "l2"],
+        "class_weight": ["balanced", None],
+    },
+    "Random Forest": {
+        "max_depth": [None, 8, 16],
+        "min_samples_leaf": [1, 5, 20],
+        "max_features": ["sqrt", 0.5],
+        "class_weight": ["balanced_subsample", None],
+    },
+}
+
+
+def search_configurations(space, n_configs=None, random_state=0):
+    """The grid of `space` (name -> values) as a list of dicts, or a random sample of `n_configs` of them."""
+    import itertools
+
+    grid = [dict(zip(space, values)) for values in itertools.product(*space.values())]
+    if n_configs is not None and n_configs < len(grid):
+        picks = np.random.default_rng(random_state).choice(len(grid), size=n_configs, replace=False)
+        grid = [grid[i] for i in sorted(picks)]
+    return grid
+
+
+def _run_trial(name, params, n_rows, n_estimators, model, arrays, n_jobs, metric):
+    """
+    Fit one configuration on the first `n_rows` (shuffled) training rows and score it on the validation rows.
+
+    Forests (n_estimators given) are created with warm_start; a forest from the
+    previous rung (`model`) keeps its trees and only fits the new ones.
+    """
+    _, scaled = MODEL_CANDIDATES[name]
+    X_fit = arrays["X_fit_scaled"] if scaled else arrays["X_fit"]
+    X_val = arrays["X_val_scaled"] if scaled else arrays["X_val"]
+
+    start = time.perf_counter()
+    if n_estimators is None:
+        model = build_candidate(name, n_jobs, **params)
+    elif model is None:
+        model = build_candidate(name, n_jobs, warm_start=True, **{**params, "n_estimators": n_estimators})
+    else:
+        model.set_params(n_estimators=n_estimators, n_jobs=n_jobs)
+    model.fit(X_fit[:n_rows], arrays["y_fit"][:n_rows])
+    score = evaluate_scores(arrays["y_val"], model.predict_proba(X_val)[:, 1])[metric]
+    return {"score": score, "seconds": time.perf_counter() - start, "model": model}
+
+
+def _search_trial(name, params, n_rows, n_estimators, model, specs, n_jobs, metric):
+    """Worker: run one trial on the shared training and validation arrays."""
+    arrays, blocks = attach_shared_arrays(specs)
+    try:
+        return _run_trial(name, params, n_rows, n_estimators, model, arrays, n_jobs, metric)
+    finally:
+        del arrays
+        release_shared_arrays(blocks)
+
+
+def hyperparameter_search(names=None, budget_seconds=600, eta=3, min_rows=5000, max_trees=100, n_configs=None,
+                          metric="pr_auc", validation_size=0.25, max_workers=None, random_state=0):
+    """
+    Search the SEARCH_SPACES of the model candidates by successive halving, within a time budget.
+
+    Parameters
+    ----------
+    names : list of str, optional
+        Keys of MODEL_CANDIDATES to tune; all of them by default.
+    budget_seconds : float
+        Wall-clock budget of the search. A rung is not started when its trials,
+        projected from the previous rung's times, would overrun it; trials still
+        waiting when it runs out are cancelled. The best configuration of the
+        highest rung reached then wins.
+    eta : int
+        Halving rate: each rung keeps the best 1/eta configurations and gives them
+        eta times the rows (and, for forests, eta times the trees).
+    min_rows : int
+        Training rows of the first rung, at least.
+    max_trees : int
+        Trees of a forest on the last rung.
+    n_configs : int, optional
+        Configurations sampled per model; the full grid by default.
+    metric : str
+        evaluate_scores() key to maximize on the validation rows.
+    validation_size : float
+        Fraction of the training split held out for validation (before resampling).
+    max_workers : int, optional
+        Trial worker processes; one per core by default. With 1 trials run in this process.
+    random_state : int
+        Seed of the validation split, the row shuffle and the configuration sample.
+
+    Returns
+    -------
+    dict
+        "best": per model {"params", "validation_score", "model", "scaler",
+        "test_metrics"}: the winning configuration, its model from the last rung
+        it ran and its evaluation on the test split; "trials": a DataFrame of
+        every trial run; "timed_out": whether the budget cut the search short;
+        "seconds": the time taken.
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    started = time.perf_counter()
+    names = list(MODEL_CANDIDATES) if names is None else list(names)
+    max_workers = max_workers or os.cpu_count() or 1
+    n_jobs = max(1, (os.cpu_count() or 1) // max_workers)
+
+    X_train, X_test, y_train, y_test, _ = experiment_split(stratify=True)
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=validation_size,
+                                                  random_state=random_state, stratify=y_train)
+    X_fit, y_fit = fast_borderline_smote(X_fit, y_fit, random_state=random_state)
+    shuffle = np.random.default_rng(random_state).permutation(len(y_fit))
+    X_fit, y_fit = X_fit[shuffle], y_fit[shuffle]
+    scaler = StandardScaler().fit(X_fit)
+    arrays = {"X_fit": X_fit, "y_fit": y_fit, "X_val": X_val, "y_val": y_val,
+              "X_fit_scaled": scaler.transform(X_fit), "X_val_scaled": scaler.transform(X_val)}
+
+    survivors = {name: [{"params": params, "model": None}
+                        for params in search_configurations(SEARCH_SPACES[name], n_configs, random_state)]
+                 for name in names}
+    # Models with n_estimators (forests) grow with the rungs instead of being refitted.
+    grows = {name: "n_estimators" in MODEL_CANDIDATES[name][0]().get_params() for name in names}
+    n_rungs = 1 + int(np.floor(np.log(max(len(c) for c in survivors.values())) / np.log(eta)))
+    n_rungs = max(1, min(n_rungs, 1 + int(np.floor(np.log(max(len(y_fit) / min_rows, 1)) / np.log(eta)))))
+
+    trials, timed_out, pool, specs, blocks = [], False, None, None, []
+    if max_workers > 1:
+        specs, blocks = share_arrays(arrays)
+        pool = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        for rung in range(n_rungs):
+            n_rows = int(len(y_fit) * float(eta) ** (rung - n_rungs + 1))
+            n_trees = max(1, int(round(max_trees * float(eta) ** (rung - n_rungs + 1))))
+            tasks = [(name, candidate) for name, candidates in survivors.items() for candidate in candidates]
+            if rung > 0:
+                projected = [c["seconds"] * eta * (eta if grows[name] else 1) for name, c in tasks]
+                if time.perf_counter() - started + max(max(projected), sum(projected) / max_workers) > budget_seconds:
+                    timed_out = True
+                    break
+
+            with StageProgress(total=len(tasks), desc=f"Search rung {rung} ({n_rows} rows)", ncols=80,
+                               unit=" trials") as pbar:
+                def finished(name, candidate, result):
+                    candidate.update(result, rung=rung)
+                    trials.append({"model": name, "rung": rung, "rows": n_rows,
+                                   "n_estimators": n_trees if grows[name] else None,
+                                   **{f"param_{k}": v for k, v in candidate["params"].items()},
+                                   metric: result["score"], "seconds": result["seconds"]})
+                    pbar.update(1, "trial")
+
+                if pool is None:
+                    for name, candidate in tasks:
+                        if time.perf_counter() - started > budget_seconds:
+                            timed_out = True
+                            break
+                        finished(name, candidate, _run_trial(name, candidate["params"], n_rows,
+                                                             n_trees if grows[name] else None,
+                                                             candidate["model"], arrays, n_jobs, metric))
+                else:
+                    futures = {pool.submit(_search_trial, name, candidate["params"], n_rows,
+                                           n_trees if grows[name] else None, candidate["model"], specs, n_jobs,
+                                           metric): (name, candidate)
+                               for name, candidate in tasks}
+                    pending = set(futures)
+                    while pending:
+                        remaining = budget_seconds - (time.perf_counter() - started)
+                        done, pending = wait(pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+                        for future in done:
+                            finished(*futures[future], future.result())
+                        if not done and remaining <= 0:
+                            timed_out = True
+                            for future in pending:
+                                future.cancel()
+                            break
+
+            for name, candidates in survivors.items():
+                ranked = sorted((c for c in candidates if c.get("rung") == rung), key=lambda c: -c["score"])
+                if ranked:  # otherwise keep the previous rung's ranking
+                    survivors[name] = ranked[:max(1, int(np.ceil(len(ranked) / eta)))]
+            if timed_out:
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=not timed_out, cancel_futures=True)
+        release_shared_arrays(blocks, unlink=True)
+
+    best = {}
+    for name, candidates in survivors.items():
+        winner = candidates[0]
+        if winner["model"] is None:
+            continue
+        _, scaled = MODEL_CANDIDATES[name]
+        X_eval = scaler.transform(X_test) if scaled else X_test
+        model = winner["model"]
+        metrics = evaluate_scores(y_test, model.predict_proba(X_eval)[:, 1], predicted=model.predict(X_eval))
+        metrics.pop("curve")
+        params = {**winner["params"], **({"n_estimators": model.n_estimators} if grows[name] else {})}
+        best[name] = {"params": params, "validation_score": winner["score"], "model": model,
+                      "scaler": scaler if scaled else None, "test_metrics": metrics}
+    return {"best": best, "trials": pd.DataFrame(trials), "timed_out": timed_out,
+            "seconds": time.perf_counter() - started}
+
+
+def print_hyperparameter_search(**kwargs):
+    """Run hyperparameter_search() and print the trials and each model's winner."""
+    search = hyperparameter_search(**kwargs)
+    with pd.option_context("display.width", 160, "display.max_columns", 40, "display.max_rows", 200):
+        print("\n=== Hyperparameter Search Trials ===")
+        print(search["trials"])
+    if search["timed_out"]:
+        print(f"\nBudget reached after {search['seconds']:.0f}s; best of the highest rung reached.")
+    for name, result in search["best"].items():
+        print_metrics(f"{name} (best: {result['params']})", result["test_metrics"])
+    return search
+
+
+# ---------------------------------- Permutation importance ---------------------------------------------------------
+#
+# The drop in test ROC AUC (or PR AUC) when one feature's values are shuffled, averaged over repeats. Unlike impurity
+# importances it is measured on held-out data and does not favour high-cardinality features. Permutations are scored
+# in batches: for a logistic regression only the shuffled feature's term of the logit changes, so a permutation
+# costs O(n) instead of a full predict; other models score several permuted copies of X in one predict_proba()
+# call. The (feature, repeat) pairs are spread over worker processes, X and y sitting once in shared memory.
+
+PERMUTATION_BATCH_BYTES = 1 << 28  # permuted copies of X scored per predict_proba() call, in bytes
+
+
+def batched_roc_auc(y_true, scores):
+    """
+    ROC AUC of each row of `scores` (shape (k, n)), with ties counted as half, as roc_auc_score.
+
+    Only the negatives are sorted (one np.sort over all rows); each positive is
+    then placed among them by binary search, which is cheap with few frauds.
+    """
+    positive = np.asarray(y_true) == 1
+    negatives = np.sort(scores[:, ~positive], axis=1)
+    positives = scores[:, positive]
+    wins = np.array([np.searchsorted(row, pos, side="left").sum() + np.searchsorted(row, pos, side="right").sum()
+                     for row, pos in zip(negatives, positives)]) / 2
+    return wins / (positives.shape[1] * negatives.shape[1])
+
+
+def _unpermuted_scores(model, X):
+    """Scores of X on the same scale as _permuted_scores(): the logit on the fast path, probabilities otherwise."""
+    if isinstance(model, CompiledLogisticRegression):
+        # The metrics depend only on the order of the scores, so the logit will do.
+        return X @ model.weights + model.intercept
+    return model.predict_proba(X)[:, 1]
+
+
+def _permuted_scores(model, X, pairs, random_state):
+    """Scores of X with feature j shuffled by the permutation of (j, repeat), one row per pair."""
+    n_rows = len(X)
+    permutations = [np.random.default_rng([random_state, j, repeat]).permutation(n_rows) for j, repeat in pairs]
+    if isinstance(model, CompiledLogisticRegression):
+        logit = _unpermuted_scores(model, X)
+        return np.stack([logit + model.weights[j] * (X[permutation, j] - X[:, j])
+                         for (j, _), permutation in zip(pairs, permutations)])
+
+    scores = np.empty((len(pairs), n_rows))
+    per_batch = max(1, PERMUTATION_BATCH_BYTES // max(X.nbytes, 1))
+    for begin in range(0, len(pairs), per_batch):
+        batch = np.repeat(X[None], min(per_batch, len(pairs) - begin), axis=0)
+        for k, ((j, _), permutation) in enumerate(zip(pairs[begin:begin + per_batch],
+                                                      permutations[begin:begin + per_batch])):
+            batch[k, :, j] = X[permutation, j]
+        scores[begin:begin + len(batch)] = model.predict_proba(batch.reshape(-1, X.shape[1]))[:, 1].reshape(
+            len(batch), n_rows)
+    return scores
+
+
+def _score_metrics(y, scores, metric):
+    """`metric` of every row of scores against y."""
+    if metric == "roc_auc":
+        return batched_roc_auc(y, scores)
+    return np.array([average_precision_from_counts(threshold_counts(y, row)) for row in scores])
+
+
+def _permutation_metrics(model, arrays, pairs, metric, random_state):
+    return _score_metrics(arrays["y"], _permuted_scores(model, arrays["X"], pairs, random_state), metric)
+
+
+def _permutation_task(model, specs, pairs, metric, random_state):
+    """Worker: score a share of the (feature, repeat) permutations on the shared X, y."""
+    arrays, blocks = attach_shared_arrays(specs)
+    try:
+        return _permutation_metrics(model, arrays, pairs, metric, random_state)
+    finally:
+        del arrays
+        release_shared_arrays(blocks)
+
+
+def permutation_importance(model, X, y, feature_names=None, n_repeats=10, metric="roc_auc", confidence=0.95,
+                           max_workers=None, random_state=0):
+    """
+    Permutation importance of every feature, with confidence intervals over the repeats.
+
+    Parameters
+    ----------
+    model : CompiledLogisticRegression or estimator
+        Scores raw rows of X with predict_proba(); a compiled logistic
+        regression (see compile_model()) takes the fast path.
+    X, y : np.ndarray
+        Held-out rows and labels.
+    feature_names : list of str, optional
+        FEATURE_COLUMNS by default.
+    n_repeats : int
+        Permutations per feature. Permutation (j, r) is seeded by
+        (random_state, j, r), so results do not depend on `max_workers`.
+    metric : {"roc_auc", "pr_auc"}
+    confidence : float
+        Level of the t-interval around the mean importance.
+    max_workers : int, optional
+        Worker processes; one per core by default, in-process when 1.
+
+    Returns
+    -------
+    pd.DataFrame
+        feature, importance (mean metric drop), std, ci_low, ci_high, sorted
+        by decreasing importance; the unpermuted score is in ``attrs['baseline']``.
+    """
+    from scipy.stats import t
+
+    feature_names = list(FEATURE_COLUMNS if feature_names is None else feature_names)
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    # Scored the same way as the permutations, so the drops compare like with like.
+    baseline = float(_score_metrics(y, _unpermuted_scores(model, X)[None], metric)[0])
+    pairs = [(j, repeat) for j in range(X.shape[1]) for repeat in range(n_repeats)]
+    max_workers = min(max_workers or os.cpu_count() or 1, len(pairs))
+
+    with StageProgress(total=max_workers, desc="Permutation importance", ncols=80, unit=" tasks") as pbar:
+        if max_workers == 1:
+            values = _permutation_metrics(model, {"X": X, "y": y}, pairs, metric, random_state)
+            pbar.update(1, "permute")
+        else:
+            shares = np.array_split(np.arange(len(pairs)), max_workers)
+            specs, blocks = share_arrays({"X": X, "y": np.asarray(y)})
+            try:
+                with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                    futures = [pool.submit(_permutation_task, model, specs, [pairs[i] for i in share], metric,
+                                           random_state) for share in shares]
+                    for future in as_completed(futures):
+                        pbar.update(1, "permute")
+                    values = np.concatenate([future.result() for future in futures])
+            finally:
+                release_shared_arrays(blocks, unlink=True)
+
+    drops = baseline - values.reshape(X.shape[1], n_repeats)
+    mean, std = drops.mean(axis=1), drops.std(axis=1, ddof=1) if n_repeats > 1 else np.zeros(X.shape[1])
+    half_width = t.ppf((1 + confidence) / 2, max(n_repeats - 1, 1)) * std / np.sqrt(n_repeats)
+    importance = pd.DataFrame({"feature": feature_names, "importance": mean, "std": std,
+                               "ci_low": mean - half_width, "ci_high": mean + half_width})
+    importance = importance.sort_values("importance", ascending=False, ignore_index=True)
+    importance.attrs["baseline"] = baseline
+    return importance
+
+
+def print_permutation_importance(n_repeats=10, metric="roc_auc", max_workers=None, top=28):
+    """
+    Fit both models on the resampled training split; print and plot their permutation importances on the test split.
+    """
+    _, X_test, _, y_test, _ = experiment_split(stratify=True)
+    X_res, y_res, _ = experiment_resample(stratify=True)
+    X_res_scaled, _, scaler = experiment_scale(stratify=True)
+    models = {"Logistic Regression": compile_model(build_logistic_regression().fit(X_res_scaled, y_res), scaler),
+              "Random Forest": build_random_forest(n_jobs=1).fit(X_res, y_res)}
+
+    fig, axes = plt.subplots(1, len(models), figsize=(14, 8))
+    for ax, (name, model) in zip(axes, models.items()):
+        start = time.perf_counter()
+        importance = permutation_importance(model, X_test, y_test, n_repeats=n_repeats, metric=metric,
+                                            max_workers=max_workers)
+        print(f"\n=== {name} permutation importance ({metric} drop, {n_repeats} repeats, "
+              f"{time.perf_counter() - start:.1f}s; baseline {importance.attrs['baseline']:.4f}) ===")
+        print(importance.head(top).to_string(index=False))
+        shown = importance.head(top).iloc[::-1]
+        ax.barh(shown["feature"], shown["importance"],
+                xerr=[shown["importance"] - shown["ci_low"], shown["ci_high"] - shown["importance"]])
+        ax.set_title(name)
+        ax.set_xlabel(f"Drop in {metric}")
+    fig.tight_layout()
+    show_figure("permutation_importance")
+
+
+# ---------------------------------- Compiled inference -------------------------------------------------------------
+#
+# Fitted models exported to flat NumPy arrays for scoring outside sklearn: no input validation, no per-estimator
+# dispatch. Each compiled model has a vectorized predict_proba() for batches and a predict_proba_one() for a single
+# transaction, and round-trips through arrays() / from_arrays() so it can be saved as plain .npy files.
+
+class CompiledLogisticRegression:
+    """
+    A binary logistic regression with the StandardScaler folded into its weights.
+
+    With scaler mean m and scale s, w . ((x - m) / s) + b = (w / s) . x + (b - m . (w / s)),
+    so scoring a raw row is one dot product and an expit. Probabilities match
+    scaler.transform() + predict_proba() to rounding error (about 1e-15).
+    """
+
+    kind = "logistic_regression"
+
+    def __init__(self, weights, intercept):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    @classmethod
+    def compile(cls, model, scaler=None):
+        weights = np.asarray(model.coef_[0], dtype=np.float64)
+        intercept = float(model.intercept_[0])
+        if scaler is not None:
+            if getattr(scaler, "scale_", None) is not None:
+                weights = weights / scaler.scale_
+            if getattr(scaler, "mean_", None) is not None:
+                intercept -= float(np.dot(scaler.mean_, weights))
+        return cls(weights, intercept)
+
+    def arrays(self):
+        return {"weights": self.weights, "intercept": np.array([self.intercept])}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["weights"], arrays["intercept"][0])
+
+    def predict_proba(self, X):
+        """Probabilities of classes 0 and 1 for the rows of `X`, shape (n_rows, 2)."""
+        from scipy.special import expit
+
+        p = expit(np.asarray(X, dtype=np.float64) @ self.weights + self.intercept)
+        return np.stack([1 - p, p], axis=1)
+
+    def predict_proba_one(self, x):
+        """Probability of class 1 for one row."""
+        from scipy.special import expit
+
+        return float(expit(np.dot(self.weights, x) + self.intercept))
+
+
+class CompiledForest:
+    """
+    A random forest packed into flat node arrays.
+
+    The nodes of all trees are concatenated, each tree renumbered breadth-first
+    so that the right child of node i is left[i] + 1: one step down a tree is
+    ``node = left[node] + (x[feature[node]] > threshold[node])``. `roots` holds
+    the index of each tree's root; leaves point at themselves with an infinite
+    threshold. Inputs are cast to float32 and compared with the float64
+    thresholds, and the per-tree leaf probabilities are summed in tree order and
+    divided by the number of trees, exactly as RandomForestClassifier.predict_proba
+    (with n_jobs=1) does, so the probabilities are identical for finite inputs.
+    """
+
+    kind = "random_forest"
+
+    def __init__(self, feature, threshold, left, value, roots, scaler_mean=None, scaler_scale=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int64)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int64)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int64)
+        self.is_leaf = self.left == np.arange(len(self.left))
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self._nodes = None
+
+    @staticmethod
+    def _pack_tree(tree, offset):
+        order, i = [0], 0
+        while i < len(order):
+            node = order[i]
+            i += 1
+            if tree.children_left[node] != -1:
+                order += [tree.children_left[node], tree.children_right[node]]
+        order = np.array(order)
+        position = np.empty(tree.node_count, dtype=np.int64)
+        position[order] = np.arange(tree.node_count)
+        leaf = tree.children_left[order] == -1
+        left = np.where(leaf, np.arange(tree.node_count), position[np.maximum(tree.children_left[order], 0)])
+        return (np.where(leaf, 0, tree.feature[order]), np.where(leaf, np.inf, tree.threshold[order]),
+                left + offset, tree.value[order, 0, :])
+
+    @classmethod
+    def compile(cls, model, scaler=None):
+        packed, roots, offset = [], [], 0
+        for estimator in model.estimators_:
+            roots.append(offset)
+            packed.append(cls._pack_tree(estimator.tree_, offset))
+            offset += estimator.tree_.node_count
+        feature, threshold, left, value = (np.concatenate(column) for column in zip(*packed))
+        mean = getattr(scaler, "mean_", None) if scaler is not None else None
+        scale = getattr(scaler, "scale_", None) if scaler is not None else None
+        return cls(feature, threshold, left, value, roots, mean, scale)
+
+    def arrays(self):
+        arrays = {"feature": self.feature, "threshold": self.threshold, "left": self.left, "value": self.value,
+                  "roots": self.roots}
+        if self.scaler_mean is not None:
+            arrays["scaler_mean"] = self.scaler_mean
+        if self.scaler_scale is not None:
+            arrays["scaler_scale"] = self.scaler_scale
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays["feature"], arrays["threshold"], arrays["left"], arrays["value"], arrays["roots"],
+                   arrays.get("scaler_mean"), arrays.get("scaler_scale"))
+
+    def _prepare(self, X):
+        scaled = self.scaler_mean is not None or self.scaler_scale is not None
+        X = np.asarray(X, dtype=np.float64 if scaled else np.float32)
+        if self.scaler_mean is not None:
+            X = X - self.scaler_mean
+        if self.scaler_scale is not None:
+            X = X / self.scaler_scale
+        return np.ascontiguousarray(X, dtype=np.float32)
+
+    def leaves(self, X):
+        """
+        Leaf index reached by every row in every tree, shape (n_rows, n_trees).
+
+        All (row, tree) pairs advance one level per iteration, and pairs that
+        reached a leaf are dropped, so the loop runs once per level of the
+        deepest path rather than once per tree and level.
+        """
+        X = self._prepare(X)
+        n_rows, n_features = X.shape
+        values = X.ravel()
+        node = np.tile(self.roots, n_rows)
+        row_start = np.repeat(np.arange(n_rows) * n_features, len(self.roots))
+        active = np.flatnonzero(~self.is_leaf[node])
+        while active.size:
+            current = node[active]
+            current = self.left[current] + (values.take(row_start[active] + self.feature[current]) >
+                                            self.threshold[current])
+            node[active] = current
+            active = active[~self.is_leaf[current]]
+        return node.reshape(n_rows, len(self.roots))
+
+    def predict_proba(self, X):
+        """Probabilities of classes 0 and 1 for the rows of `X`, shape (n_rows, 2)."""
+        leaves = self.leaves(X)
+        total = np.zeros((len(leaves), self.value.shape[1]))
+        for t in range(leaves.shape[1]):
+            total += self.value[leaves[:, t]]
+        total /= leaves.shape[1]
+        return total
+
+    def predict_proba_one(self, x):
+        """Probability of class 1 for one row, by walking the trees in plain Python."""
+        if self._nodes is None:
+            # Python lists, built on first use: indexing them is much cheaper than indexing arrays.
+            self._nodes = (self.feature.tolist(), self.threshold.tolist(), self.left.tolist(),
+                           self.value[:, 1].tolist(), self.is_leaf.tolist(), self.roots.tolist())
+        feature, threshold, left, value_1, is_leaf, roots = self._nodes
+        x = self._prepare(np.asarray(x).reshape(1, -1))[0].tolist()
+        total_1 = 0.0
+        for node in roots:
+            while not is_leaf[node]:
+                node = left[node] + (x[feature[node]] > threshold[node])
+            total_1 += value_1[node]
+        return total_1 / len(roots)
+
+
+COMPILED_MODELS = {cls.kind: cls for cls in (CompiledLogisticRegression, CompiledForest)}
+
+
+def compile_model(model, scaler=None):
+    """
+    Export a fitted LogisticRegression or RandomForestClassifier (binary) to its compiled form.
+
+    Parameters
+    ----------
+    model : LogisticRegression or RandomForestClassifier
+        The fitted model.
+    scaler : StandardScaler, optional
+        The scaler the model was trained behind; the compiled model then takes raw rows.
+
+    Returns
+    -------
+    CompiledLogisticRegression or CompiledForest
+    """
+    if hasattr(model, "estimators_") and hasattr(model.estimators_[0], "tree_"):
+        return CompiledForest.compile(model, scaler)
+    if hasattr(model, "coef_"):
+        return CompiledLogisticRegression.compile(model, scaler)
+    raise TypeError(f"Cannot compile {type(model).__name__}; expected a LogisticRegression or a random forest")
+
+
+# ---------------------------------- Model store --------------------------------------------------------------------
+#
+# A saved model is a directory MODEL_STORE_DIR/<name>/v<NNNN> holding the compiled model's arrays as .npy files, a
+# manifest.json (kind, feature list, training-data key, parameters, metrics, array shapes) and a pickle of the
+# sklearn model and scaler. load_model() memory-maps the arrays read-only, so scoring processes start without
+# retraining or unpickling, and every process on the host shares one copy of the model pages.
+
+def _model_versions(name, store_dir):
+    model_dir = os.path.join(store_dir, name)
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted(int(entry[1:]) for entry in os.listdir(model_dir)
+                  if entry.startswith("v") and entry[1:].isdigit()
+                  and os.path.exists(os.path.join(model_dir, entry, MANIFEST_FILE)))
+
+
+def list_models(store_dir=None):
+    """Name -> list of saved versions, oldest first."""
+    store_dir = store_dir or MODEL_STORE_DIR
+    if not os.path.isdir(store_dir):
+        return {}
+    return {name: _model_versions(name, store_dir) for name in sorted(os.listdir(store_dir))
+            if _model_versions(name, store_dir)}
+
+
+def save_model(name, model, scaler=None, data_key=None, feature_columns=None, params=None, metrics=None,
+               store_dir=None):
+    """
+    Save a fitted model as the next version of `name`.
+
+    The version is written to a temporary directory and renamed into place, so
+    readers never see a partial artifact.
+
+    Parameters
+    ----------
+    name : str
+        Model name, e.g. "random_forest".
+    model : LogisticRegression or RandomForestClassifier
+        The fitted model; it is stored compiled (see compile_model()) and pickled.
+    scaler : StandardScaler, optional
+        The scaler the model was trained behind.
+    data_key : str, optional
+        Key of the training data (e.g. from experiment_data()), recorded for lineage.
+    feature_columns : list of str, optional
+        Input columns, in order; FEATURE_COLUMNS by default.
+    params, metrics : dict, optional
+        Recorded in the manifest as is (must be JSON-serializable).
+    store_dir : str, optional
+        Defaults to MODEL_STORE_DIR.
+
+    Returns
+    -------
+    str
+        The path of the new version.
+    """
+    import pickle
+
+    import sklearn
+
+    store_dir = store_dir or MODEL_STORE_DIR
+    model_dir = os.path.join(store_dir, name)
+    os.makedirs(model_dir, exist_ok=True)
+    compiled = compile_model(model, scaler)
+
+    tmp_path = tempfile.mkdtemp(prefix=".version-", dir=model_dir)
+    os.chmod(tmp_path, 0o755)  # mkdtemp creates it private; scorers may run as other users
+    arrays = {}
+    for array_name, values in compiled.arrays().items():
+        values = np.ascontiguousarray(values)
+        np.save(os.path.join(tmp_path, f"{array_name}.npy"), values)
+        arrays[array_name] = {"file": f"{array_name}.npy", "dtype": values.dtype.str, "shape": list(values.shape)}
+    with open(os.path.join(tmp_path, "estimator.pkl"), "wb") as f:
+        pickle.dump({"model": model, "scaler": scaler}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    manifest = {
+        "name": name,
+        "kind": compiled.kind,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "feature_columns": list(FEATURE_COLUMNS if feature_columns is None else feature_columns),
+        "data_key": data_key,
+        "params": params if params is not None else {k: v for k, v in model.get_params().items()
+                                                      if isinstance(v, (int, float, str, bool, type(None)))},
+        "metrics": metrics or {},
+        "sklearn_version": sklearn.__version__,
+        "arrays": arrays,
+    }
+    while True:
+        version = (_model_versions(name, store_dir) or [0])[-1] + 1
+        manifest["version"] = version
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        version_path = os.path.join(model_dir, f"v{version:04d}")
+        try:
+            os.rename(tmp_path, version_path)  # fails if another process took this version number
+            return version_path
+        except OSError:
+            if not os.path.isdir(version_path):
+                raise
+
+
+def _version_path(name, version, store_dir):
+    store_dir = store_dir or MODEL_STORE_DIR
+    versions = _model_versions(name, store_dir)
+    if not versions:
+        raise FileNotFoundError(f"No saved versions of model {name!r} under {store_dir}")
+    version = versions[-1] if version is None else int(version)
+    if version not in versions:
+        raise FileNotFoundError(f"Model {name!r} has no version {version}; saved versions: {versions}")
+    return os.path.join(store_dir, name, f"v{version:04d}")
+
+
+def read_manifest(name, version=None, store_dir=None):
+    with open(os.path.join(_version_path(name, version, store_dir), MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def load_model(name, version=None, store_dir=None, mmap=True):
+    """
+    Load a saved model in compiled form.
 
+    Parameters
+    ----------
+    name : str
+        Model name.
+    version : int, optional
+        Version to load; the latest by default.
+    store_dir : str, optional
+        Defaults to MODEL_STORE_DIR.
+    mmap : bool
+        Memory-map the arrays read-only (default) instead of reading them into
+        private memory.
 
-def plot_compared_resample_data():
+    Returns
+    -------
+    CompiledLogisticRegression or CompiledForest
+        With the version's manifest as its `manifest` attribute.
     """
-    This function demonstrates how SMOTE (Synthetic Minority Over-sampling Technique)
-    reshapes an imbalanced dataset by creating additional minority class samples.
+    path = _version_path(name, version, store_dir)
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    arrays = {array_name: np.load(os.path.join(path, spec["file"]), mmap_mode="r" if mmap else None)
+              for array_name, spec in manifest["arrays"].items()}
+    compiled = COMPILED_MODELS[manifest["kind"]].from_arrays(arrays)
+    compiled.manifest = manifest
+    return compiled
+
+
+def load_estimator(name, version=None, store_dir=None):
+    """The pickled sklearn (model, scaler) of a saved version, e.g. to refit or inspect it."""
+    import pickle
+
+    with open(os.path.join(_version_path(name, version, store_dir), "estimator.pkl"), "rb") as f:
+        saved = pickle.load(f)
+    return saved["model"], saved["scaler"]
+
+
+def _save_trained(name, model, scaler, data_key, metrics):
+    """Save a model trained by a stage function when SAVE_MODELS is on."""
+    if not SAVE_MODELS:
+        return
+    summary = {key: metrics[key] for key in ("roc_auc", "pr_auc", "kappa", "accuracy")}
+    print(f"Saved model {save_model(name, model, scaler, data_key=data_key, metrics=summary)}")
+
+
+# ---------------------------------- Scoring service ----------------------------------------------------------------
+#
+# A local asyncio server scoring transactions with a saved model (see load_model()). The protocol is JSON lines over
+# TCP: a request {"id": ..., "features": [...FEATURE_COLUMNS values...]} gets {"id": ..., "probability": p,
+# "fraud": p > threshold}; {"stats": true} gets the latency and throughput counters. Concurrent requests are
+# queued and scored together, one vectorized predict_proba() call per micro-batch.
+
+class LatencyStats:
+    """Request latencies over a sliding window, plus request and batch counters."""
+
+    def __init__(self, window=100000):
+        import collections
+
+        self.latencies = collections.deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+
+    def record_batch(self, latencies):
+        self.latencies.extend(latencies)
+        self.requests += len(latencies)
+        self.batches += 1
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = np.fromiter(self.latencies, dtype=np.float64, count=len(self.latencies))
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1e3 if len(latencies) else (None, None)
+        return {"requests": self.requests, "batches": self.batches,
+                "mean_batch_size": self.requests / self.batches if self.batches else None,
+                "throughput_rps": self.requests / elapsed if elapsed else None,
+                "p50_ms": p50, "p99_ms": p99, "uptime_seconds": elapsed}
+
+
+class MicroBatcher:
+    """
+    Queue of scoring requests drained in micro-batches.
 
-    Steps:
-    1. Load and prepare the dataset, separating features (X) and labels (y).
-    2. Apply SMOTE to generate synthetic minority samples, balancing the classes.
-    3. Use the compare_plot function to visualize the original data and the SMOTE-resampled data
-       side by side. This helps you clearly see how SMOTE affects the distribution
-       and density of the minority class points.
+    A batch is closed when it holds `max_batch_size` requests or `max_wait`
+    seconds after its first request arrived, whichever comes first, and is scored
+    with a single model.predict_proba() call.
     """
-    with tqdm(total=3, desc="Comparing SMOTE data", ncols=80, unit=" steps") as pbar:
-        df = data_frame()
-        X, y = prep_data(df)
-        pbar.update(1)
 
-        method = SMOTE()
-        X_resampled, y_resampled = method.fit_resample(X, y)
-        pbar.update(1)
+    def __init__(self, model, max_batch_size=64, max_wait=0.002, stats=None):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = stats or LatencyStats()
+        self._queue = None
+
+    async def score(self, features):
+        """Probability of fraud for one row of features."""
+        import asyncio
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((features, future, time.perf_counter()))
+        return await future
+
+    async def run(self):
+        import asyncio
+
+        self._queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            rows = [item[0] for item in batch]
+            try:
+                probabilities = self.model.predict_proba(np.array(rows, dtype=np.float64))[:, 1].tolist()
+            except Exception:
+                # Score the rows one at a time, so a row that still fails only fails its own request.
+                probabilities = []
+                for row in rows:
+                    try:
+                        probabilities.append(float(self.model.predict_proba(np.array([row], dtype=np.float64))[0, 1]))
+                    except Exception as error:
+                        probabilities.append(error)
+            done = time.perf_counter()
+            for (_, future, _), probability in zip(batch, probabilities):
+                if future.done():
+                    continue
+                if isinstance(probability, Exception):
+                    future.set_exception(probability)
+                else:
+                    future.set_result(probability)
+            self.stats.record_batch([done - started for _, _, started in batch])
+
+
+async def serve_scoring(model, host="127.0.0.1", port=8765, max_batch_size=64, max_wait_ms=2.0, threshold=0.5,
+                        duration=None, stats=None, ready=None):
+    """
+    Serve `model` (anything with predict_proba(), e.g. load_model()) until cancelled or for `duration` seconds.
 
-        compare_plot(X, y, X_resampled, y_resampled, method='SMOTE')
-        pbar.update(1)
+    Counters accumulate in `stats` (a LatencyStats) when given, so they survive
+    cancellation. `ready`, an asyncio.Event, is set once the socket is listening.
+    """
+    import asyncio
 
+    n_features = len(getattr(model, "manifest", {}).get("feature_columns", FEATURE_COLUMNS))
+    batcher = MicroBatcher(model, max_batch_size=max_batch_size, max_wait=max_wait_ms / 1e3, stats=stats)
+    invalid_input = f"expected 'features' with {n_features} finite numbers"
 
-def plot_class_distribution():
+    async def respond(writer, request):
+        features = request.get("features")
+        try:
+            # Only valid rows reach the batch; a malformed one must not fail the requests batched with it.
+            features = [float(value) for value in features] if isinstance(features, list) else None
+        except (TypeError, ValueError):
+            features = None
+        if features is None or len(features) != n_features or not np.isfinite(features).all():
+            reply = {"id": request.get("id"), "error": invalid_input}
+        else:
+            try:
+                probability = await batcher.score(features)
+                reply = {"id": request.get("id"), "probability": probability, "fraud": probability > threshold}
+            except Exception as error:
+                reply = {"id": request.get("id"), "error": str(error)}
+        writer.write(json.dumps(reply).encode() + b"\n")
+
+    async def handle(reader, writer):
+        pending = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    writer.write(b'{"error": "invalid JSON"}\n')
+                    continue
+                if not isinstance(request, dict):
+                    # Valid JSON but not a request object (e.g. a list): answer it, keep the connection.
+                    writer.write(json.dumps({"id": None, "error": invalid_input}).encode() + b"\n")
+                    continue
+                if request.get("stats"):
+                    writer.write(json.dumps(batcher.stats.snapshot()).encode() + b"\n")
+                    continue
+                task = asyncio.create_task(respond(writer, request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                if writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain()
+            await asyncio.gather(*pending)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    batch_task = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Scoring on {host}:{port} (batches of up to {max_batch_size}, {max_wait_ms:g} ms)")
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            if duration is None:
+                await server.serve_forever()
+            else:
+                await asyncio.sleep(duration)
+    finally:
+        batch_task.cancel()
+    return batcher.stats.snapshot()
+
+
+def run_scoring_server(name="logistic_regression", version=None, host="127.0.0.1", port=8765, max_batch_size=64,
+                       max_wait_ms=2.0, threshold=0.5, duration=None):
+    """Load a saved model and serve it with serve_scoring(); prints the counters on exit."""
+    import asyncio
+
+    model = load_model(name, version)
+    print(f"Loaded {name} v{model.manifest['version']} ({model.manifest['kind']})")
+    stats = LatencyStats()
+    try:
+        asyncio.run(serve_scoring(model, host, port, max_batch_size, max_wait_ms, threshold, duration, stats))
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(stats.snapshot(), indent=2))
+
+
+async def _load_connection(host, port, rows, next_request, latencies, rate_interval):
+    import asyncio
+
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while (i := next_request()) is not None:
+            if rate_interval:
+                await asyncio.sleep(max(0.0, rate_interval(i)))
+            started = time.perf_counter()
+            writer.write(json.dumps({"id": i, "features": rows[i % len(rows)]}).encode() + b"\n")
+            reply = json.loads(await reader.readline())
+            if "error" in reply:
+                raise RuntimeError(f"Scoring request {i} failed: {reply['error']}")
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+async def generate_load(host, port, rows, n_requests=10000, concurrency=16, rate=None):
     """
-    Plot the distribution of classes in the dataset and annotate the plot
-    with the exact counts of non-fraud (Class=0) and fraud (Class=1) transactions.
+    Replay `rows` against a scoring server and measure the client-side latency.
 
-    This function:
-    - Loads the credit card transaction data.
-    - Calculates the exact number of occurrences for each class.
-    - Plots a count chart of Class 0 and Class 1 occurrences using seaborn.
-    - Annotates the bars directly above their respective green (no fraud) and red (fraud) bars.
-    """
-    with tqdm(total=4, desc="Plot class distribution", ncols=80, unit=" steps") as pbar:
-        sns.set_theme()
-        df = data_frame()
-        pbar.update(1)
+    Each of `concurrency` connections sends one request at a time (closed
+    loop). With `rate` (requests per second) the requests are additionally
+    paced to that total rate, spread over the connections.
 
-        occurrences = df['Class'].value_counts()
-        no_fraud_count = occurrences.get(0, 0)
-        fraud_count = occurrences.get(1, 0)
-        pbar.update(1)
+    Returns
+    -------
+    dict
+        Client throughput and p50/p99 latency, plus the server's own counters.
+    """
+    import asyncio
 
-        g = sns.catplot(
-            x='Class',
-            kind='count',
-            data=df,
-            hue='Class',
-            palette=["g", "r"],
-            height=4
-        )
-        pbar.update(1)
+    rows = [list(map(float, row)) for row in rows]
+    requests = iter(range(n_requests))
+    latencies = []
+    started = time.perf_counter()
+    # Request i is due i / rate seconds after the start; returns how long until then.
+    rate_interval = (lambda i: started + i / rate - time.perf_counter()) if rate else None
 
-        plt.title('Class Distributions \n (0: No Fraud || 1: Fraud)', fontsize=14)
-        ax = g.ax
-        bars = ax.patches
-        no_fraud_bar = bars[0]
-        fraud_bar = bars[1]
-        no_fraud_x = no_fraud_bar.get_x() + no_fraud_bar.get_width() / 2
-        no_fraud_y = no_fraud_bar.get_height()
-        fraud_x = fraud_bar.get_x() + fraud_bar.get_width() / 2
-        fraud_y = fraud_bar.get_height()
-        ax.text(no_fraud_x, no_fraud_y + 0.5, f"{no_fraud_count}",
-                ha='center', va='bottom', color='black', fontsize=12)
-        ax.text(fraud_x, fraud_y + 0.5, f"{fraud_count}",
-                ha='center', va='bottom', color='black', fontsize=12)
-        pbar.update(1)
+    await asyncio.gather(*(_load_connection(host, port, rows, lambda: next(requests, None), latencies, rate_interval)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
 
-    plt.show()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"stats": true}\n')
+    server_stats = json.loads(await reader.readline())
+    writer.close()
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e3
+    return {"concurrency": concurrency, "requests": len(latencies), "throughput_rps": len(latencies) / elapsed,
+            "p50_ms": p50, "p99_ms": p99, "server": server_stats}
 
 
-def smote_resample():
+def run_load_generator(host="127.0.0.1", port=8765, n_requests=10000, concurrency=(1, 8, 32), rate=None):
     """
-    This function demonstrates how to improve classification results on a highly
-    imbalanced dataset by using Borderline-SMOTE and Logistic Regression.
+    Replay the test split's transactions against a running scoring server, at each concurrency level.
 
-    Steps:
-    1. Load and prepare the transaction data.
-    2. Split the data into training and testing sets.
-    3. Use Borderline-SMOTE to create synthetic samples of the minority class,
-       balancing the dataset.
-    4. Scale the features to improve the model’s performance and stability.
-    5. Train a Logistic Regression model using the balanced, scaled training data.
-    6. Evaluate the model using accuracy, precision, recall, F1-score, and Cohen’s Kappa.
-    7. Print a detailed report, including a confusion matrix and metrics by class,
-       to understand how the model performs on both fraudulent and legitimate transactions.
+    Prints one line per level so the throughput/latency trade-off of the
+    server's batch settings can be read off directly.
     """
-    with tqdm(total=7, desc="SMOTE Resample", ncols=80, unit=" steps") as pbar:
-        df = data_frame()
-        pbar.update(1)
-
-        X, y = prep_data(df)
-        pbar.update(1)
+    import asyncio
+
+    _, X_test, _, _, _ = experiment_split(stratify=True)
+    results = []
+    print(f"{'concurrency':>11} {'requests/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'server batch':>12}")
+    for level in concurrency:
+        result = asyncio.run(generate_load(host, port, X_test, n_requests, level, rate))
+        results.append(result)
+        print(f"{level:>11} {result['throughput_rps']:>11.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['server']['mean_batch_size'] or 0:>12.1f}")
+    return results
+
+
+# ---------------------------------- Bulk scoring -------------------------------------------------------------------
+#
+# score_file() scores a transaction file of any size with a saved model. The main process only moves bytes: it cuts
+# a local CSV into blocks of whole lines (or a columnar store into row ranges) and writes the results in input
+# order; parsing, scoring and CSV formatting happen in the worker processes. At most `max_in_flight` chunks are
+# queued or being scored, so memory stays at about chunksize * max_in_flight rows whatever the file size.
+
+_BULK_SCORER = {}
+
+
+def _init_bulk_scorer(name, version, store_dir, threshold, feature_columns, keep_columns):
+    """Pool initializer: load the model once per worker process."""
+    manifest = read_manifest(name, version, store_dir)
+    if manifest["kind"] == "random_forest":
+        # sklearn's tree traversal beats CompiledForest on large batches; the compiled form is for single rows.
+        model, scaler = load_estimator(name, version, store_dir)
+        model.n_jobs = 1
+
+        def predict(X):
+            return model.predict_proba(X if scaler is None else scaler.transform(X))[:, 1]
+    else:
+        compiled = load_model(name, version, store_dir)
+
+        def predict(X):
+            return compiled.predict_proba(X)[:, 1]
+    _BULK_SCORER.update(predict=predict, threshold=threshold, feature_columns=feature_columns,
+                        keep_columns=keep_columns)
+
+
+def _score_chunk(task):
+    """Parse, score and format one chunk; returns the CSV lines (without header) as bytes."""
+    import io
+
+    kind, payload = task
+    columns = _BULK_SCORER["feature_columns"] + _BULK_SCORER["keep_columns"]
+    if kind == "csv":
+        header, block = payload
+        df = pd.read_csv(io.BytesIO(header + block), usecols=columns,
+                         dtype=dict.fromkeys(_BULK_SCORER["feature_columns"], np.float64))
+    elif kind == "store":
+        store_path, start, stop = payload
+        df = read_columnar_store(store_path)[columns].iloc[start:stop]
+    else:
+        df = payload
+    probabilities = _BULK_SCORER["predict"](df[_BULK_SCORER["feature_columns"]].to_numpy(dtype=np.float64))
+    out = df[_BULK_SCORER["keep_columns"]].copy()
+    out["probability"] = probabilities
+    out["fraud"] = (probabilities > _BULK_SCORER["threshold"]).astype(np.int8)
+    return out.to_csv(index=False, header=False).encode()
+
+
+def _csv_blocks(file_path, chunksize):
+    """Yield (header, block) pairs of about `chunksize` whole lines of a local CSV."""
+    with open(file_path, "rb") as f:
+        header = f.readline()
+        sample = f.read(1 << 20)
+        line_bytes = len(sample) / max(sample.count(b"\n"), 1)
+        f.seek(len(header))
+        block_bytes = max(int(chunksize * line_bytes), 1)
+        while block := f.read(block_bytes):
+            yield header, block + f.readline()
+
+
+def _bulk_tasks(file_path, chunksize, columns):
+    """Tasks for _score_chunk() and the input's column names."""
+    store_path = file_path if is_columnar_store(file_path) else _cached_store_path(file_path, CACHE_DIR)
+    if store_path is not None:
+        n_rows = read_store_schema(store_path)["n_rows"]
+        names = [col["name"] for col in read_store_schema(store_path)["columns"]]
+        return names, (("store", (store_path, start, min(start + chunksize, n_rows)))
+                       for start in range(0, n_rows, chunksize))
+    if not _is_url(file_path):
+        with open(file_path) as f:
+            names = f.readline().strip().replace('"', "").split(",")
+        return names, (("csv", block) for block in _csv_blocks(file_path, chunksize))
+    names = list(pd.read_csv(file_path, nrows=0).columns)
+    return names, (("frame", chunk[[c for c in columns if c in names]])
+                   for chunk in iter_chunks(file_path, chunksize, cache_dir=None))
+
+
+def score_file(input_path, output_path, name="logistic_regression", version=None, chunksize=100000,
+               max_workers=None, max_in_flight=None, threshold=0.5, keep_columns=("Time",), store_dir=None):
+    """
+    Score every transaction of `input_path` with a saved model and stream the results to `output_path`.
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.8, random_state=0)
-        pbar.update(1)
+    Parameters
+    ----------
+    input_path : str
+        CSV file (or URL) or columnar store with the model's feature columns.
+    output_path : str
+        CSV written with the `keep_columns` found in the input, then
+        probability and fraud (0/1), one line per input row in input order. It is
+        written under a temporary name and renamed when complete.
+    name, version, store_dir
+        The saved model, as for load_model().
+    chunksize : int
+        Rows per task.
+    max_workers : int, optional
+        Worker processes; one per core by default.
+    max_in_flight : int, optional
+        Chunks submitted but not yet written; 2 * max_workers by default.
+    threshold : float
+        Probability above which a row is flagged.
 
-        method = BorderlineSMOTE(kind='borderline-1', random_state=0)
-        X_resampled, y_resampled = method.fit_resample(X_train, y_train)
-        pbar.update(1)
+    Returns
+    -------
+    dict
+        rows, seconds and rows_per_second.
+    """
+    import collections
+
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * max_workers
+    feature_columns = read_manifest(name, version, store_dir)["feature_columns"]
+    names, tasks = _bulk_tasks(input_path, chunksize, feature_columns + list(keep_columns))
+    missing = [c for c in feature_columns if c not in names]
+    if missing:
+        raise ValueError(f"{input_path} lacks the model's feature columns {missing}")
+    keep_columns = [c for c in keep_columns if c in names]
+
+    tmp_path = output_path + ".tmp"
+    started = time.perf_counter()
+    n_rows = 0
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_bulk_scorer,
+                             initargs=(name, version, store_dir, threshold, feature_columns, keep_columns)) as pool, \
+            open(tmp_path, "wb") as out, StageProgress(desc="Bulk scoring", ncols=80, unit=" rows") as pbar:
+        out.write((",".join(keep_columns + ["probability", "fraud"]) + "\n").encode())
+        pending = collections.deque()
+
+        def write_oldest():
+            lines = pending.popleft().result()
+            out.write(lines)
+            rows = lines.count(b"\n")
+            pbar.update(rows, "chunk")
+            return rows
+
+        for task in tasks:
+            if len(pending) >= max_in_flight:
+                n_rows += write_oldest()
+            pending.append(pool.submit(_score_chunk, task))
+        while pending:
+            n_rows += write_oldest()
+    os.replace(tmp_path, output_path)
+    seconds = time.perf_counter() - started
+    return {"rows": n_rows, "seconds": seconds, "rows_per_second": n_rows / seconds if seconds else None}
+
+
+# ---------------------------------- Time-ordered replay ------------------------------------------------------------
+#
+# replay_transactions() feeds transactions to a model one at a time in Time order, back to back or on their original
+# schedule sped up N times, and measures what a live scorer would see. An event's latency runs from its scheduled
+# arrival to its score, so a scorer that falls behind shows the queueing delay, not just the scoring time. The
+# model is trained on an earlier time window than the one replayed (see experiment_time_split()).
+
+LATENCY_BUCKETS = 10.0 ** np.arange(-6, 1.01, 0.25)  # histogram upper bounds in seconds: 1 µs to 10 s
+
+
+def fit_time_window(name, X_train, y_train, random_state=0):
+    """
+    Resample, scale and fit MODEL_CANDIDATES[name] on a training window as the other stages do.
 
-        scaler = StandardScaler()
-        X_resampled_scaled = scaler.fit_transform(X_resampled)
-        X_test_scaled = scaler.transform(X_test)
-        pbar.update(1)
+    Returns
+    -------
+    CompiledLogisticRegression or CompiledForest
+        The fitted pipeline in compiled form, for fast one-row scoring.
+    """
+    from sklearn.preprocessing import StandardScaler
 
-        model = LogisticRegression(solver='liblinear', max_iter=1000, random_state=0)
-        model.fit(X_resampled_scaled, y_resampled)
-        pbar.update(1)
+    builder, scaled = MODEL_CANDIDATES[name]
+    X_res, y_res = fast_borderline_smote(X_train, y_train, random_state=random_state)
+    scaler = StandardScaler().fit(X_res) if scaled else None
+    model = builder().fit(X_res if scaler is None else scaler.transform(X_res), y_res)
+    return compile_model(model, scaler)
 
-        predicted = model.predict(X_test_scaled)
-        report = classification_report(y_test, predicted, output_dict=True)
-        cm = confusion_matrix(y_test, predicted)
-        accuracy = (cm.diagonal().sum() / cm.sum()) * 100
-        kappa = cohen_kappa_score(y_test, predicted)
 
-        total_instances = len(y_test)
-        correctly_classified = cm.diagonal().sum()
-        incorrectly_classified = total_instances - correctly_classified
+def replay_transactions(model, X, times, y=None, speedup=None, max_events=None):
+    """
+    Score transactions one at a time, in Time order, as they would arrive live.
 
-        print(f"Correctly Classified Instances      {correctly_classified}               {accuracy:.4f} %")
-        print(f"Incorrectly Classified Instances    {incorrectly_classified}               {(100 - accuracy):.4f} %")
-        print(f"Kappa statistic                     {kappa:.4f}")
-        print(f"Total Number of Instances           {total_instances}")
+    Parameters
+    ----------
+    model : CompiledLogisticRegression or CompiledForest or estimator
+        Scored with predict_proba_one(), or predict_proba() on one row.
+    X, times : np.ndarray
+        Rows and their Time, in Time order.
+    y : np.ndarray, optional
+        Labels, for the out-of-time metrics.
+    speedup : float, optional
+        Replay the original arrival schedule this many times faster. By default
+        events are sent back to back, which measures the scorer's capacity.
+    max_events : int, optional
+        Replay only the first events.
 
-        print("\n=== Detailed Accuracy By Class ===")
-        for cls in report:
-            if cls in ['0', '1']:
-                precision = report[cls]['precision']
-                recall = report[cls]['recall']
-                f1 = report[cls]['f1-score']
-                print(f"Class {cls}: Precision: {precision:.3f}  Recall: {recall:.3f}  F-Measure: {f1:.3f}")
-
-        w_precision = report['weighted avg']['precision']
-        w_recall = report['weighted avg']['recall']
-        w_f1 = report['weighted avg']['f1-score']
-        print(f"Weighted Avg: Precision: {w_precision:.3f}  Recall: {w_recall:.3f}  F-Measure: {w_f1:.3f}")
+    Returns
+    -------
+    dict
+        events, seconds, events_per_second, latency (percentiles in ms),
+        histogram (DataFrame of upper_ms, count), max_lag (the most seconds an
+        event waited for the scorer), peak_arrival_rate (events in the busiest
+        second of the schedule at this speed), scores, and metrics
+        (evaluate_scores(), when `y` holds both classes).
+    """
+    score_one = getattr(model, "predict_proba_one", None) or (
+        lambda x: model.predict_proba(x.reshape(1, -1))[0, 1])
+    n = len(X) if max_events is None else min(len(X), max_events)
+    offsets = (np.asarray(times[:n], dtype=np.float64) - times[0]) / (speedup or 1.0)
+    scheduled = offsets.tolist() if speedup else None
+    scores, arrivals, lags, finished = np.empty(n), np.empty(n), np.empty(n), np.empty(n)
+
+    with StageProgress(total=n, desc="Replaying transactions", ncols=80, unit=" events", mininterval=1) as pbar:
+        start = time.perf_counter()
+        for i in range(n):
+            if scheduled is None:
+                arrival = time.perf_counter()
+            else:
+                arrival = start + scheduled[i]
+                while (wait := arrival - time.perf_counter()) > 0:
+                    if wait > 1e-3:
+                        time.sleep(wait - 5e-4)  # sleep through long gaps, spin through the last half millisecond
+                lags[i] = time.perf_counter() - arrival
+            scores[i] = score_one(X[i])
+            finished[i] = time.perf_counter()
+            arrivals[i] = arrival
+            if i % 10000 == 9999:
+                pbar.update(10000, "replay")
+        pbar.update(n % 10000, "replay")
+
+    latencies = finished - arrivals
+    seconds = finished[-1] - start
+    counts, _ = np.histogram(latencies, bins=np.concatenate([[0.0], LATENCY_BUCKETS, [np.inf]]))
+    percentiles = (50, 90, 99, 99.9)
+    result = {
+        "events": n,
+        "seconds": seconds,
+        "events_per_second": n / seconds,
+        "latency": {**{f"p{p:g}_ms": value
+                       for p, value in zip(percentiles, np.percentile(latencies, percentiles) * 1e3)},
+                    "max_ms": latencies.max() * 1e3},
+        "histogram": pd.DataFrame({"upper_ms": np.append(LATENCY_BUCKETS, np.inf) * 1e3, "count": counts}),
+        "max_lag": float(lags.max()) if speedup else 0.0,
+        "peak_arrival_rate": int(np.bincount(offsets.astype(np.int64)).max()),
+        "scores": scores,
+        "metrics": None,
+    }
+    if y is not None and len(np.unique(y[:n])) == 2:
+        result["metrics"] = evaluate_scores(y[:n], scores)
+    return result
 
-        print("\n=== Confusion Matrix ===")
-        print(cm)
-        plt.figure(figsize=(8, 6))
-        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=["Class 0", "Class 1"],
-                    yticklabels=["Class 0", "Class 1"])
-        plt.title("Confusion Matrix Heatmap")
-        plt.xlabel("Predicted Labels")
-        plt.ylabel("True Labels")
-        plt.show()
-        pbar.update(1)
 
+def print_replay(name="Logistic Regression", saved=None, train_until=None, test_until=None, speedup=None,
+                 max_events=None):
+    """
+    Train on an early time window, replay the later one and print the out-of-time metrics and the latencies.
 
-def apply_pipeline():
+    `saved` replays a model from the model store instead of training one; such a
+    model may have seen the test window during training.
     """
-        Load transaction data, preprocess it, and apply a pipeline combining SMOTE
-        for class balancing and Logistic Regression for classification.
+    X_train, X_test, y_train, y_test, time_train, time_test, _ = experiment_time_split(train_until, test_until)
+    if len(X_test) == 0:
+        raise ValueError("The test window is empty")
+    print(f"Train window: Time {time_train[0]:.0f}-{time_train[-1]:.0f}s ({len(X_train)} transactions); "
+          f"test window: Time {time_test[0]:.0f}-{time_test[-1]:.0f}s ({len(X_test)} transactions)")
+    if saved:
+        model = load_model(saved)
+        name = f"{saved} v{model.manifest['version']}"
+    else:
+        model = fit_time_window(name, X_train, y_train)
+
+    result = replay_transactions(model, X_test, time_test, y_test, speedup, max_events)
+    if result["metrics"] is not None:
+        print_metrics(f"{name} (out-of-time)", result["metrics"])
+    pace = f"{speedup:g}x real time" if speedup else "back to back"
+    print(f"\n=== Replay of {result['events']} events, {pace} ===")
+    print(f"Sustained: {result['events_per_second']:.0f} events/s over {result['seconds']:.2f}s")
+    if speedup:
+        print(f"Busiest second of the schedule: {result['peak_arrival_rate']} events")
+        print(f"Worst lag behind schedule: {result['max_lag'] * 1e3:.2f} ms")
+    else:
+        print(f"Busiest second of the data: {result['peak_arrival_rate']} events "
+              f"(capacity headroom {result['events_per_second'] / result['peak_arrival_rate']:.0f}x)")
+    print("Latency: " + ", ".join(f"{key[:-3]} {value:.3f} ms" for key, value in result["latency"].items()))
+    histogram = result["histogram"]
+    histogram = histogram[histogram["count"] > 0]
+    widest = histogram["count"].max()
+    for upper_ms, count in zip(histogram["upper_ms"], histogram["count"]):
+        print(f"  <= {upper_ms:>10.4g} ms {count:>9} {'#' * max(1, round(40 * count / widest))}")
+    return result
+
+
+# ---------------------------------- Online learning ----------------------------------------------------------------
+#
+# online_learning() keeps an SGD logistic regression current on a stream of labelled transactions: every mini-batch
+# is scored first (as it would be live), then learned from with partial_fit(). A DriftMonitor compares the recent
+# feature and score distributions with the ones the model was trained on, and only when the features diverge is the
+# model retrained from scratch, resampling included, on the most recent labelled rows. The score is reported but does
+# not trigger a retrain: partial_fit() moves it by itself, drift or not.
+
+class DriftMonitor:
+    """
+    Running per-column distributions compared with a training baseline.
 
-        Steps:
-        1. Retrieve the dataset and split into training and testing sets.
-        2. Apply Borderline-SMOTE to oversample the minority class in the training data.
-        3. Train a Logistic Regression model on the balanced data.
-        4. Predict on the test set and print the classification report and confusion matrix.
+    The current distributions are histograms over the baseline's quantile
+    bins, exponentially decayed with a half-life of `half_life` rows, so the
+    monitor follows the recent stream in constant memory. check() reports
+    each column's population stability index (PSI) and the shift of its mean
+    in baseline standard deviations.
+    """
 
-        This function helps demonstrate how incorporating SMOTE
-        can influence the classification results, particularly for imbalanced datasets.
+    def __init__(self, baseline, columns, bins=10, half_life=20000):
+        baseline = np.asarray(baseline, dtype=np.float64)
+        quantiles = np.quantile(baseline, np.linspace(0, 1, bins + 1)[1:-1], axis=0)
+        self.columns = list(columns)
+        self.edges = [np.unique(edges) for edges in quantiles.T]
+        self.expected = [self._counts(j, baseline[:, j]) / len(baseline) for j in range(len(self.columns))]
+        self.mean = baseline.mean(axis=0)
+        self.std = np.where(baseline.std(axis=0) > 0, baseline.std(axis=0), 1.0)
+        self.half_life = half_life
+        self.counts = [np.zeros_like(expected) for expected in self.expected]
+        self.sums = np.zeros(len(self.columns))
+        self.weight = 0.0
+
+    def _counts(self, j, values):
+        bins = np.searchsorted(self.edges[j], values, side="right")
+        return np.bincount(bins, minlength=len(self.edges[j]) + 1).astype(np.float64)
+
+    def update(self, rows):
+        decay = 0.5 ** (len(rows) / self.half_life)
+        for j in range(len(self.columns)):
+            self.counts[j] = self.counts[j] * decay + self._counts(j, rows[:, j])
+        self.sums = self.sums * decay + rows.sum(axis=0)
+        self.weight = self.weight * decay + len(rows)
+
+    def check(self, psi_threshold=0.2, shift_threshold=0.25):
+        """
+        Returns
+        -------
+        dict
+            psi and mean_shift (pd.Series by column) and drifted, the columns
+            over either threshold.
+        """
+        psi = np.empty(len(self.columns))
+        for j, (counts, expected) in enumerate(zip(self.counts, self.expected)):
+            actual = np.maximum(counts / self.weight, 1e-4)
+            expected = np.maximum(expected, 1e-4)
+            psi[j] = np.sum((actual - expected) * np.log(actual / expected))
+        shift = np.abs(self.sums / self.weight - self.mean) / self.std
+        drifted = [column for column, p, s in zip(self.columns, psi, shift)
+                   if p > psi_threshold or s > shift_threshold]
+        return {"psi": pd.Series(psi, index=self.columns), "mean_shift": pd.Series(shift, index=self.columns),
+                "drifted": drifted}
+
+
+def _fit_online_model(X, y, random_state=0, baseline_rows=None):
     """
-    with tqdm(total=4, desc="Apply pipeline", ncols=80, unit=" steps") as pbar:
-        df = data_frame()
-        X, y = prep_data(df)
-        X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.8, random_state=0)
-        pbar.update(1)
+    Full retrain: Borderline-SMOTE, StandardScaler and an SGD logistic regression fitted from scratch.
 
-        resampling = BorderlineSMOTE(kind='borderline-1', random_state=0)
-        model = LogisticRegression(solver='liblinear')
-        transformer_pipeline = Pipeline([('SMOTE', resampling), ('Logistic Regression', model)])
-        pbar.update(1)
+    Returns
+    -------
+    tuple
+        scaler, model, baseline (the last `baseline_rows` rows of X, all by
+        default, with the model's scores as a last column, for DriftMonitor)
+    """
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.preprocessing import StandardScaler
 
-        transformer_pipeline.fit(X_train, y_train)
-        pbar.update(1)
+    X_res, y_res = fast_borderline_smote(X, y, random_state=random_state)
+    scaler = StandardScaler().fit(X_res)
+    model = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=random_state)
+    model.fit(scaler.transform(X_res), y_res)
+    X = X[-baseline_rows:] if baseline_rows else X
+    return scaler, model, np.column_stack([X, model.predict_proba(scaler.transform(X))[:, 1]])
 
-        predicted = transformer_pipeline.predict(X_test)
-        print('Classifcation report:\n', classification_report(y_test, predicted))
-        conf_mat = confusion_matrix(y_true=y_test, y_pred=predicted)
-        print('Confusion matrix:\n', conf_mat)
-        pbar.update(1)
 
+def online_learning(X_train, y_train, X_stream, y_stream, batch_size=1000, half_life=20000, psi_threshold=0.2,
+                    shift_threshold=0.25, min_rows=5000, retrain_rows=100000, max_class_weight=10.0,
+                    random_state=0):
+    """
+    Score and learn from a labelled stream in mini-batches, retraining only on drift.
 
-def classifies_using_random_forest():
-    with tqdm(total=5, desc="Random Forest classification", ncols=80, unit=" steps") as pbar:
-        df = data_frame()
-        pbar.update(1)
+    Parameters
+    ----------
+    X_train, y_train : np.ndarray
+        Initial training window.
+    X_stream, y_stream : np.ndarray
+        The stream, in arrival order. Each batch is scored before its labels
+        are used, so the scores are honest (prequential) predictions.
+    batch_size : int
+        Rows per partial_fit() update.
+    half_life : int
+        Rows over which the monitor's statistics halve in weight.
+    psi_threshold, shift_threshold : float
+        Drift thresholds for the PSI and the mean shift (in baseline standard
+        deviations) of any feature. The score's are logged, not acted on.
+    min_rows : int
+        Rows to see after a (re)train before drift is checked.
+    retrain_rows : int
+        A retrain uses the most recent this many labelled rows. The monitor's new
+        baseline is the last `half_life` of them, so a retrain after a shift
+        compares later batches with the new regime rather than a mix of both.
+    max_class_weight : float
+        Cap on the balanced class weights of the partial_fit() updates; uncapped,
+        a fraud row weighs hundreds of times a legitimate one and every batch
+        with one swings the model.
 
-        X, y = prep_data(df)
-        pbar.update(1)
+    Returns
+    -------
+    dict
+        log (DataFrame, one row per batch, "drifted" listing the features that
+        crossed a threshold), scores, metrics (evaluate_scores() of the whole
+        stream), retrains, update_seconds and retrain_seconds.
+    """
+    import collections
+
+    columns = FEATURE_COLUMNS + ["score"]
+    start = time.perf_counter()
+    scaler, model, baseline = _fit_online_model(X_train, y_train, random_state)
+    retrain_seconds = time.perf_counter() - start
+    monitor = DriftMonitor(baseline, columns, half_life=half_life)
+    class_counts = np.bincount(y_train, minlength=2).astype(np.int64)
+    recent = collections.deque([(X_train[-retrain_rows:], y_train[-retrain_rows:])])
+    recent_rows = len(recent[0][1])
+
+    scores = np.empty(len(y_stream))
+    log = []
+    update_seconds = 0.0
+    since_retrain = 0
+    retrains = 0
+    with StageProgress(total=len(y_stream), desc="Online learning", ncols=80, unit=" rows") as pbar:
+        for begin in range(0, len(y_stream), batch_size):
+            X, y = X_stream[begin:begin + batch_size], y_stream[begin:begin + batch_size]
+            started = time.perf_counter()
+            X_scaled = scaler.transform(X)
+            scores[begin:begin + len(y)] = batch_scores = model.predict_proba(X_scaled)[:, 1]
+            monitor.update(np.column_stack([X, batch_scores]))
+            class_counts += np.bincount(y, minlength=2)
+            weights = np.minimum(class_counts.sum() / (2.0 * np.maximum(class_counts, 1)), max_class_weight)
+            model.partial_fit(X_scaled, y, sample_weight=weights[y])
+            update_seconds += time.perf_counter() - started
+
+            recent.append((X, y))
+            recent_rows += len(y)
+            while recent_rows - len(recent[0][1]) >= retrain_rows:
+                recent_rows -= len(recent.popleft()[1])
+            since_retrain += len(y)
+
+            report = monitor.check(psi_threshold, shift_threshold) if since_retrain >= min_rows else None
+            drifted = [column for column in report["drifted"] if column != "score"] if report else []
+            retrained = bool(drifted)
+            if retrained:
+                started = time.perf_counter()
+                scaler, model, baseline = _fit_online_model(np.concatenate([x for x, _ in recent]),
+                                                            np.concatenate([labels for _, labels in recent]),
+                                                            random_state, baseline_rows=half_life)
+                monitor = DriftMonitor(baseline, columns, half_life=half_life)
+                retrain_seconds += time.perf_counter() - started
+                since_retrain = 0
+                retrains += 1
+            features = report and {key: report[key][FEATURE_COLUMNS] for key in ("psi", "mean_shift")}
+            log.append({"rows": begin + len(y),
+                        "max_psi": features["psi"].max() if report else np.nan,
+                        "max_psi_column": features["psi"].idxmax() if report else None,
+                        "max_mean_shift": features["mean_shift"].max() if report else np.nan,
+                        "score_psi": report["psi"]["score"] if report else np.nan,
+                        "score_mean_shift": report["mean_shift"]["score"] if report else np.nan,
+                        "drifted": ",".join(drifted),
+                        "retrained": retrained})
+            pbar.update(len(y), "batch")
+
+    return {"log": pd.DataFrame(log), "scores": scores, "metrics": evaluate_scores(y_stream, scores),
+            "retrains": retrains, "update_seconds": update_seconds, "retrain_seconds": retrain_seconds}
+
+
+def print_online_learning(train_until=None, **kwargs):
+    """
+    Train on the early time window of the data, then stream the later window through online_learning().
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.8, random_state=0, stratify=y)
-        pbar.update(1)
+    Keyword arguments are passed to online_learning().
+    """
+    X_train, X_test, y_train, y_test, _, time_test, _ = experiment_time_split(train_until)
+    result = online_learning(X_train, y_train, X_test, y_test, **kwargs)
+    print_metrics("Online Logistic Regression (prequential)", result["metrics"])
+
+    log = result["log"]
+    print(f"\n=== Drift checks over {len(log)} batches ===")
+    print(f"Largest PSI: {log['max_psi'].max():.4f}; largest mean shift: {log['max_mean_shift'].max():.4f} std")
+    print(f"Score (not a retrain trigger): largest PSI {log['score_psi'].max():.4f}, "
+          f"largest mean shift {log['score_mean_shift'].max():.4f} std")
+    for row in log[log["retrained"]].itertuples():
+        print(f"Retrained after row {row.rows} (Time {time_test[row.rows - 1]:.0f}s): drift in {row.drifted}")
+    print(f"Retrains: {result['retrains']}; online updates took {result['update_seconds']:.2f}s, "
+          f"full (re)trains {result['retrain_seconds']:.2f}s")
+    return result
+
+
+# ---------------------------------- Majority-class compression -----------------------------------------------------
+#
+# The majority class is replaced by far fewer weighted rows before Borderline-SMOTE and the fit, so both run on a
+# fraction of the data. MiniBatchKMeans first cuts the class into strata; each stratum is then summarized either by
+# k-means centroids weighted by their cluster sizes, or by a proportional random sample weighted by stratum size over
+# rows drawn, which keeps the density of the class. compression_tradeoff() measures what that costs in test AUC
+# against the training time saved.
+
+COMPRESSION_METHODS = ("kmeans", "stratified")
+COMPRESSION_STRATA = 256
+
+
+def compress_majority(X, y, ratio, method="stratified", n_strata=COMPRESSION_STRATA, random_state=0):
+    """
+    Replace the majority class by about `ratio` of its rows, weighted to stand for all of them.
 
-        resampler = BorderlineSMOTE(kind='borderline-1', random_state=0)
-        X_res, y_res = resampler.fit_resample(X_train, y_train)
-        pbar.update(1)
+    Parameters
+    ----------
+    X, y : np.ndarray
+        Training data.
+    ratio : float
+        Rows kept per majority row; 1 or more keeps the data as is.
+    method : {"kmeans", "stratified"}
+        Both split the class into `n_strata` MiniBatchKMeans clusters and keep
+        ratio of every stratum (at least one row). "kmeans" keeps k-means
+        centroids of the stratum, weighted by their cluster sizes; clustering
+        stratum by stratum costs about n_strata times less than one k-means with
+        as many centroids. "stratified" keeps a random sample of the stratum,
+        weighted by stratum size / rows drawn.
 
-        rf = RandomForestClassifier(class_weight='balanced_subsample', random_state=0, n_estimators=10)
-        rf.fit(X_res, y_res)
-        rf_pred = rf.predict(X_test)
-        print("\n=== Random Forest Results ===")
-        print("Classification Report:")
-        print(classification_report(y_test, rf_pred))
-        print("Confusion Matrix:")
-        print(confusion_matrix(y_test, rf_pred))
-        rf_auc = roc_auc_score(y_test, rf.predict_proba(X_test)[:, 1])
-        print("ROC AUC:", rf_auc)
-        feature_names = [f"Feature_{i}" for i in range(X.shape[1])]
-
-        rf_importances = pd.DataFrame({'feature': feature_names, 'importance': rf.feature_importances_})
-        rf_importances_sorted = rf_importances.sort_values('importance', ascending=False)
-        print("\nImportance from Random Forest:\n", rf_importances_sorted.head(28))
-        pbar.update(1)
+    Returns
+    -------
+    tuple
+        X_compressed, y_compressed, sample_weight: the kept majority rows, then
+        the minority rows unchanged with weight 1. The weights sum to len(y).
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    if ratio >= 1:
+        return X, y, np.ones(len(y))
+    if method not in COMPRESSION_METHODS:
+        raise ValueError(f"Unknown compression method {method!r}; expected one of {COMPRESSION_METHODS}")
+    majority = np.bincount(y).argmax()
+    is_majority = y == majority
+    X_majority = X[is_majority]
+    n_strata = min(n_strata, max(1, int(round(ratio * len(X_majority)))))
+
+    strata = MiniBatchKMeans(n_clusters=n_strata, batch_size=4096, n_init=1, init="random",
+                             random_state=random_state).fit(X_majority).labels_
+    sizes = np.bincount(strata, minlength=n_strata)
+    draws = np.maximum(np.round(sizes * ratio).astype(np.int64), sizes > 0)
+    # Shuffled within each stratum, so the first draws[s] rows of stratum s are a random sample of it.
+    order = np.lexsort((np.random.default_rng(random_state).random(len(strata)), strata))
+    bounds = np.r_[0, np.cumsum(sizes)]
+
+    if method == "kmeans":
+        centers, weights = [], []
+        for stratum in np.flatnonzero(sizes):
+            rows = X_majority[order[bounds[stratum]:bounds[stratum + 1]]]
+            if draws[stratum] >= len(rows):
+                centers.append(rows)
+                weights.append(np.ones(len(rows)))
+                continue
+            kmeans = KMeans(n_clusters=draws[stratum], n_init=1, init="random", max_iter=20,
+                            random_state=random_state).fit(rows)
+            counts = np.bincount(kmeans.labels_, minlength=draws[stratum])
+            centers.append(kmeans.cluster_centers_[counts > 0])
+            weights.append(counts[counts > 0])
+        X_kept = np.vstack(centers).astype(X.dtype)
+        weights = np.concatenate(weights).astype(np.float64)
+    else:
+        rank = np.arange(len(order)) - np.repeat(bounds[:-1], sizes)
+        kept = order[rank < np.repeat(draws, sizes)]
+        X_kept = X_majority[kept]
+        weights = (sizes / np.maximum(draws, 1))[strata[kept]]
 
-    return rf_auc
+    X_compressed = np.vstack([X_kept, X[~is_majority]])
+    y_compressed = np.r_[np.full(len(X_kept), majority, dtype=y.dtype), y[~is_majority]]
+    return X_compressed, y_compressed, np.r_[weights, np.ones((~is_majority).sum())]
 
 
-def correlations_in_data():
-    """
-    Plot a heatmap of the correlation matrix of all variables.
+def resample_compressed(X, y, sample_weight, random_state=0):
     """
-    with tqdm(total=2, desc="Correlations", ncols=80, unit=" steps") as pbar:
-        df = data_frame()
-        pbar.update(1)
-        correlation_matrix = df.corr()
+    Borderline-SMOTE on a compressed training set, with weights for the result.
 
-        plt.figure(figsize=(16, 12))
-        sns.heatmap(correlation_matrix, annot=False, cmap='coolwarm', linewidths=0.5)
-        plt.title('Correlation Matrix of All Variables', fontsize=16)
-        plt.show()
-        pbar.update(1)
+    The minority rows, real and synthetic, share the majority's total weight
+    equally, so the classes weigh the same as after resampling the full
+    training set. Without resampling when the majority is already the smaller class.
 
+    Returns
+    -------
+    tuple
+        X_resampled, y_resampled, sample_weight
+    """
+    minority = np.bincount(y).argmin()
+    if (y != minority).sum() > (y == minority).sum():
+        X, y = fast_borderline_smote(X, y, random_state=random_state)
+    weights = np.r_[sample_weight, np.ones(len(y) - len(sample_weight))]
+    is_minority = y == minority
+    weights[is_minority] = weights[~is_minority].sum() / is_minority.sum()
+    return X, y, weights
 
-def classifies_using_logic_regression():
-    with tqdm(total=6, desc="Logistic Regression classification", ncols=80, unit=" steps") as pbar:
-        df = data_frame()
-        pbar.update(1)
 
-        X, y = prep_data(df)
-        pbar.update(1)
+def compression_tradeoff(ratios=(1.0, 0.3, 0.1, 0.03, 0.01), methods=COMPRESSION_METHODS, names=None,
+                         random_state=0):
+    """
+    Train every model candidate on compressed training sets and score it on the test split.
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.8, random_state=0, stratify=y)
-        pbar.update(1)
+    Ratio 1 is the reference: the full training set resampled as in
+    experiment_resample() and fitted without weights. Compressed sets are fitted
+    with their sample weights, and with class_weight=None since the weights
+    already balance the classes. Resampling is timed from scratch, not read from
+    the stage cache.
 
-        resampler = BorderlineSMOTE(kind='borderline-1', random_state=0)
-        X_res, y_res = resampler.fit_resample(X_train, y_train)
-        pbar.update(1)
+    Returns
+    -------
+    pd.DataFrame
+        One row per model, method and ratio: train_rows (after resampling),
+        compress_seconds, resample_seconds, fit_seconds, total_seconds, speedup
+        (reference total_seconds / total_seconds), roc_auc, pr_auc, recall, precision.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    names = list(MODEL_CANDIDATES) if names is None else list(names)
+    X_train, X_test, y_train, y_test, _ = experiment_split(stratify=True)
+    settings = [("none", 1.0)] * any(ratio >= 1 for ratio in ratios) + [
+        (method, ratio) for method in methods for ratio in ratios if ratio < 1]
+
+    rows = []
+    with StageProgress(total=len(settings), desc="Compression trade-off", ncols=80, unit=" settings") as pbar:
+        for method, ratio in settings:
+            start = time.perf_counter()
+            if method == "none":
+                X_fit, y_fit, weights = X_train, y_train, None
+            else:
+                X_fit, y_fit, weights = compress_majority(X_train, y_train, ratio, method, random_state=random_state)
+            compress_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if weights is None:
+                X_res, y_res = fast_borderline_smote(X_fit, y_fit, random_state=random_state)
+            else:
+                X_res, y_res, weights = resample_compressed(X_fit, y_fit, weights, random_state)
+            resample_seconds = time.perf_counter() - start
+
+            for name in names:
+                _, scaled = MODEL_CANDIDATES[name]
+                start = time.perf_counter()
+                X_eval = X_test
+                X_model = X_res
+                if scaled:
+                    scaler = StandardScaler().fit(X_res, sample_weight=weights)
+                    X_model, X_eval = scaler.transform(X_res), scaler.transform(X_test)
+                model = build_candidate(name, -1) if weights is None else build_candidate(name, -1, class_weight=None)
+                model.fit(X_model, y_res, sample_weight=weights)
+                fit_seconds = time.perf_counter() - start
+
+                metrics = evaluate_scores(y_test, model.predict_proba(X_eval)[:, 1])
+                precision, recall, _ = metrics["per_class"][1]
+                rows.append({"model": name, "method": method, "ratio": ratio, "train_rows": len(y_res),
+                             "compress_seconds": compress_seconds, "resample_seconds": resample_seconds,
+                             "fit_seconds": fit_seconds,
+                             "total_seconds": compress_seconds + resample_seconds + fit_seconds,
+                             "roc_auc": metrics["roc_auc"], "pr_auc": metrics["pr_auc"],
+                             "recall": recall, "precision": precision})
+            pbar.update(1, f"{method}_{ratio:g}", X_resampled=X_res)
+
+    results = pd.DataFrame(rows)
+    reference = results[results["method"] == "none"].set_index("model")["total_seconds"]
+    results["speedup"] = results["model"].map(reference) / results["total_seconds"]
+    return results
+
+
+def plot_compression_tradeoff(**kwargs):
+    """Print compression_tradeoff() and plot test ROC AUC and PR AUC against training time, per model."""
+    results = compression_tradeoff(**kwargs)
+    print("\n=== Majority-class compression trade-off ===")
+    print(results.to_string(index=False, float_format="%.4f"))
+
+    names = list(results["model"].unique())
+    fig, axes = plt.subplots(2, len(names), figsize=(7 * len(names), 10), squeeze=False)
+    for column, name in enumerate(names):
+        model_results = results[results["model"] == name]
+        reference = model_results[model_results["method"] == "none"]
+        for row, metric in enumerate(("roc_auc", "pr_auc")):
+            ax = axes[row, column]
+            for method in COMPRESSION_METHODS:
+                curve = pd.concat([reference, model_results[model_results["method"] == method]])
+                if len(curve) > len(reference):
+                    ax.plot(curve["total_seconds"], curve[metric], marker="o", label=method)
+                    for seconds, value, ratio in zip(curve["total_seconds"], curve[metric], curve["ratio"]):
+                        ax.annotate(f"{ratio:g}", (seconds, value), textcoords="offset points", xytext=(4, 4))
+            ax.set_xscale("log")
+            ax.ticklabel_format(axis="y", useOffset=False)
+            ax.set_xlabel("Training time, s (compress + resample + fit)")
+            ax.set_ylabel(f"Test {metric}")
+            ax.set_title(f"{name}: {metric} vs. training time")
+            ax.legend()
+    fig.tight_layout()
+    show_figure("compression_tradeoff")
+    return results
+
+
+# ---------------------------------- Benchmarks ---------------------------------------------------------------------
+
+BENCHMARK_STAGES = ("load_csv", "load_typed", "load_columnar", "prep", "resample_fast", "resample_imblearn",
+                    "scale", "lr_fit", "rf_fit", "lr_predict", "lr_predict_proba", "rf_predict",
+                    "rf_predict_proba", "metrics", "lr_predict_compiled", "rf_predict_compiled",
+                    "lr_predict_one", "rf_predict_one")
+SINGLE_ROW_CALLS = 1000  # rows scored one call at a time by the *_predict_one stages
+
+
+def measure(func, *args, **kwargs):
+    """
+    Run `func` twice and measure it: once untraced for the timings, once under
+    tracemalloc for the memory peak (tracing slows every allocation, so the two
+    are never taken from the same run).
+
+    Returns
+    -------
+    tuple
+        (result, stats) with the result and wall and CPU seconds of the untraced run,
+        the peak memory traced by tracemalloc in the second run (numpy buffers
+        included) and the process peak RSS.
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = func(*args, **kwargs)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, {"seconds": wall, "cpu_seconds": cpu, "peak_bytes": peak, "peak_rss_bytes": _peak_rss_bytes()}
+
+
+def _benchmark_size(work_dir, n_rows, dtypes, stages, csv_max_rows, seed):
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    records = []
+
+    def run(stage, dtype, rows, func, *args, **kwargs):
+        if stage not in stages:
+            return None
+        result, stats = measure(func, *args, **kwargs)
+        stats.update(stage=stage, rows=rows, dtype=dtype,
+                     rows_per_sec=rows / stats["seconds"] if stats["seconds"] else None)
+        records.append(stats)
+        return result
+
+    store_path = os.path.join(work_dir, f"synthetic-{n_rows}")
+    if not is_columnar_store(store_path):
+        generate_synthetic_data(store_path, n_rows, fmt="columnar", seed=seed)
+    if n_rows <= csv_max_rows and {"load_csv", "load_typed"} & set(stages):
+        csv_path = os.path.join(work_dir, f"synthetic-{n_rows}.csv")
+        if not os.path.exists(csv_path):
+            generate_synthetic_data(csv_path, n_rows, seed=seed)
+        run("load_csv", "float64", n_rows, load_data, csv_path, cache_dir=None)
+        run("load_typed", "float32", n_rows, load_data_typed, csv_path, n_rows=n_rows)
+
+    df = run("load_columnar", "float64", n_rows, read_columnar_store, store_path)
+    if df is None:
+        df = read_columnar_store(store_path)
+    X, y = run("prep", "float64", n_rows, prep_data, df) or prep_data(df)
+
+    for dtype in dtypes:
+        X_train, X_test, y_train, y_test = train_test_split(X.astype(dtype), y, train_size=0.8,
+                                                            random_state=0, stratify=y)
+        n_train, n_test = len(y_train), len(y_test)
+        X_res, y_res = run("resample_fast", dtype, n_train, fast_borderline_smote, X_train, y_train) or (None, None)
+        imblearn_res = run("resample_imblearn", dtype, n_train, lambda: __import__(
+            "imblearn.over_sampling", fromlist=["BorderlineSMOTE"]).BorderlineSMOTE(
+            kind='borderline-1', random_state=0).fit_resample(X_train, y_train))
+        if X_res is None:
+            X_res, y_res = imblearn_res or fast_borderline_smote(X_train, y_train)
 
         scaler = StandardScaler()
-        X_res_scaled = scaler.fit_transform(X_res)
+        X_res_scaled = run("scale", dtype, len(y_res), scaler.fit_transform, X_res)
+        if X_res_scaled is None:
+            X_res_scaled = scaler.fit_transform(X_res)
         X_test_scaled = scaler.transform(X_test)
-        lr = LogisticRegression(solver='liblinear', class_weight='balanced', random_state=0)
-        lr.fit(X_res_scaled, y_res)
-        pbar.update(1)
 
-        lr_pred = lr.predict(X_test_scaled)
-        print("=== Logistic Regression Results ===")
-        print("Classification Report:")
-        print(classification_report(y_test, lr_pred))
-        print("Confusion Matrix:")
-        print(confusion_matrix(y_test, lr_pred))
+        lr = build_logistic_regression()
+        if run("lr_fit", dtype, len(y_res), lr.fit, X_res_scaled, y_res) is not None:
+            predicted = run("lr_predict", dtype, n_test, lr.predict, X_test_scaled)
+            scores = run("lr_predict_proba", dtype, n_test, lr.predict_proba, X_test_scaled)
+            if predicted is not None and scores is not None:
+                run("metrics", dtype, n_test, evaluate_scores, y_test, scores[:, 1], predicted=predicted)
+            compiled = compile_model(lr, scaler)
+            run("lr_predict_compiled", dtype, n_test, compiled.predict_proba, X_test)
+            run("lr_predict_one", dtype, SINGLE_ROW_CALLS,
+                lambda: [compiled.predict_proba_one(x) for x in X_test[:SINGLE_ROW_CALLS]])
+
+        rf = build_random_forest(n_jobs=-1)
+        if run("rf_fit", dtype, len(y_res), rf.fit, X_res, y_res) is not None:
+            run("rf_predict", dtype, n_test, rf.predict, X_test)
+            run("rf_predict_proba", dtype, n_test, rf.predict_proba, X_test)
+            compiled = compile_model(rf)
+            run("rf_predict_compiled", dtype, n_test, compiled.predict_proba, X_test)
+            run("rf_predict_one", dtype, SINGLE_ROW_CALLS,
+                lambda: [compiled.predict_proba_one(x) for x in X_test[:SINGLE_ROW_CALLS]])
+    return records
+
+
+def compare_benchmarks(results, baseline, threshold=1.2):
+    """
+    Print every stage whose time changed by more than `threshold`x against a baseline results file.
 
-        conf_mat = confusion_matrix(y_test, lr_pred)
-        plt.figure(figsize=(8, 6))
-        sns.heatmap(conf_mat, annot=True, fmt='d', cmap='Blues', xticklabels=["Class 0", "Class 1"],
-                    yticklabels=["Class 0", "Class 1"])
-        plt.title("Logistic Regression Confusion Matrix Heatmap")
-        plt.xlabel("Predicted Labels")
-        plt.ylabel("True Labels")
-        plt.show()
+    Returns
+    -------
+    list of dict
+        The regressions (slower by more than `threshold`x).
+    """
+    with open(baseline) as f:
+        reference = {(r["stage"], r["rows"], r["dtype"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for record in results["results"]:
+        before = reference.get((record["stage"], record["rows"], record["dtype"]))
+        if before is None or not before["seconds"]:
+            continue
+        ratio = record["seconds"] / before["seconds"]
+        if ratio > threshold or ratio < 1 / threshold:
+            label = "SLOWER" if ratio > threshold else "faster"
+            print(f"{label:6s} {record['stage']:18s} {record['rows']:>11d} {record['dtype']:8s} "
+                  f"{before['seconds']:9.3f}s -> {record['seconds']:9.3f}s ({ratio:.2f}x)")
+        if ratio > threshold:
+            regressions.append(dict(record, baseline_seconds=before["seconds"], ratio=ratio))
+    print(f"{len(regressions)} regression(s) beyond {threshold:.2f}x against {baseline}")
+    return regressions
+
+
+def run_benchmarks(sizes=(100000, 1000000), dtypes=("float64", "float32"), stages=None,
+                   output="benchmark_results.json", baseline=None, work_dir=None, csv_max_rows=1000000, seed=0):
+    """
+    Time every pipeline stage on synthetic data of several sizes and feature dtypes.
 
-        lr_auc = roc_auc_score(y_test, lr.predict_proba(X_test_scaled)[:, 1])
-        print("ROC AUC:", lr_auc)
-        feature_names = [f"Feature_{i}" for i in range(X.shape[1])]
-        lr_coeff = pd.DataFrame({'feature': feature_names, 'coefficient': lr.coef_[0]})
-        lr_coeff_sorted = lr_coeff.sort_values('coefficient', ascending=False)
-        print("\nTop variables from Logistic Regression:\n", lr_coeff_sorted.head(10))
-        pbar.update(1)
+    For each size a synthetic columnar store (and, up to `csv_max_rows`, a CSV)
+    is generated once under `work_dir`; then loading, prep_data(), both
+    Borderline-SMOTE engines, StandardScaler, LR/RF fit, predict/predict_proba
+    and the metric calls are measured for wall time, CPU time, rows/s and peak
+    traced memory.
 
-    return lr_auc
+    The results, with the library versions and core count, are written as JSON
+    to `output`. Throughput that falls as the size grows marks a stage that
+    scales worse than linearly; `baseline` compares against an earlier results file.
 
+    Parameters
+    ----------
+    sizes : sequence of int
+        Row counts of the synthetic datasets.
+    dtypes : sequence of str
+        Feature dtypes to run the model stages with.
+    stages : sequence of str, optional
+        Subset of BENCHMARK_STAGES; all by default.
+    output : str
+        Results file.
+    baseline : str, optional
+        Earlier results file to compare against.
+    work_dir : str, optional
+        Where the synthetic data is kept; defaults to CACHE_DIR/bench.
+    csv_max_rows : int
+        Largest size for which the CSV loaders are benchmarked.
+    seed : int
+        Seed of the synthetic data.
 
-def compare_models_results():
-    with tqdm(total=2, desc="Compare Models", ncols=80, unit=" steps") as pbar:
-        print("\n=== Model Comparison ===")
-        print("Logistic Regression AUC:", classifies_using_logic_regression())
-        pbar.update(1)
+    Returns
+    -------
+    dict
+        The results written to `output`.
+    """
+    import sklearn
+
+    stages = tuple(BENCHMARK_STAGES if stages is None else stages)
+    unknown = set(stages) - set(BENCHMARK_STAGES)
+    if unknown:
+        raise ValueError(f"Unknown benchmark stages {sorted(unknown)}; expected some of {BENCHMARK_STAGES}")
+    work_dir = work_dir or os.path.join(CACHE_DIR, "bench")
+    os.makedirs(work_dir, exist_ok=True)
+
+    records = []
+    for n_rows in sizes:
+        records.extend(_benchmark_size(work_dir, n_rows, dtypes, stages, csv_max_rows, seed))
+
+    results = {
+        "meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "numpy": np.__version__, "pandas": pd.__version__, "sklearn": sklearn.__version__,
+                 "platform": platform.platform(), "cpu_count": os.cpu_count(), "seed": seed},
+        "results": records,
+    }
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
 
-        print("Random Forest AUC:", classifies_using_random_forest())
-        pbar.update(1)
+    print(f"\n{'stage':18s} {'rows':>11s} {'dtype':8s} {'seconds':>9s} {'rows/s':>12s} {'peak MiB':>9s}")
+    for r in records:
+        print(f"{r['stage']:18s} {r['rows']:>11d} {r['dtype']:8s} {r['seconds']:9.3f} "
+              f"{r['rows_per_sec'] or 0:12.0f} {r['peak_bytes'] / 2**20:9.1f}")
+    print(f"Results written to {output}")
+
+    if baseline:
+        compare_benchmarks(results, baseline)
+    return results
 
 
 def main():
+    install_required_packages()
     print("Running main function...")
     """
         We suggest an approach that uses two different supervised learning methods—Logistic Regression and Random Forest—to
@@ -598,9 +4989,9 @@ def main():
 
          Conclusion:
          In terms of determining which variables contribute most to fraud, the models provide complementary insights.
-         Logistic Regression’s coefficients suggest that certain variables (e.g., Feature_2) strongly increase the odds of a
+         Logistic Regression’s coefficients suggest that certain variables (e.g., V4) strongly increase the odds of a
          transaction being classified as fraud. Meanwhile, the Random Forest’s feature importance's highlight different
-         predictors (e.g., Feature_12) as key contributors. By combining these two approaches, we can gain both interpretability
+         predictors (e.g., V14) as key contributors. By combining these two approaches, we can gain both interpretability
          (from Logistic Regression) and robust feature ranking (from Random Forest) to understand which factors most heavily
          influence the likelihood of a transaction being fraudulent.
     """
@@ -675,5 +5066,229 @@ def main():
     print("Main function done.")
 
 
+# ---------------------------------- Command line -------------------------------------------------------------------
+
+# Subcommand -> (stage function, help), in the order main() runs them.
+STAGES = {
+    "info": (show_head_info, "print head, info() and describe() of the dataset"),
+    "plot-fraud": (plot_fraud_cases, "scatter plot of fraud vs. non-fraud cases"),
+    "plot-smote": (plot_compared_resample_data, "original vs. SMOTE-resampled data"),
+    "plot-classes": (plot_class_distribution, "class distribution bar chart"),
+    "correlations": (correlations_in_data, "correlation matrix heatmap"),
+    "smote-resample": (smote_resample, "Borderline-SMOTE + logistic regression report"),
+    "pipeline": (apply_pipeline, "Borderline-SMOTE + logistic regression pipeline report"),
+    "logistic-regression": (classifies_using_logic_regression, "logistic regression classifier"),
+    "random-forest": (classifies_using_random_forest, "random forest classifier"),
+    "compare": (compare_models_results, "compare the ROC AUC of all models"),
+    "stream-lr": (classifies_using_streaming_logistic_regression, "out-of-core streaming logistic regression"),
+}
+
+
+def cli(argv=None):
+    """
+    Command line entry point.
+
+    Without a subcommand this runs main() as before. With one it runs that stage
+    only, headless: no dependency check, plots saved under --plot-dir instead of
+    shown, and only the libraries the stage needs are imported.
+    """
+    import argparse
+
+    global DATA_URL, PLOT_MODE, FRAUD_COST, FALSE_ALARM_COST, SAVE_MODELS
+    parser = argparse.ArgumentParser(description="Fraud detection in Python using machine learning.")
+    parser.add_argument("--data", default=None, help="CSV path or URL to use instead of DATA_URL")
+    parser.add_argument("--metrics", default=None,
+                        help="record per-step time and memory to this file (.jsonl, or .prom for Prometheus)")
+    parser.add_argument("--fraud-cost", type=float, default=None,
+                        help=f"cost of a missed fraud for the cost-optimal threshold (default: {FRAUD_COST:g})")
+    parser.add_argument("--false-alarm-cost", type=float, default=None,
+                        help=f"cost of a false alarm for the cost-optimal threshold (default: {FALSE_ALARM_COST:g})")
+    parser.add_argument("--save-models", action="store_true",
+                        help="save every trained model as a new version under MODEL_STORE_DIR")
+    parser.add_argument("--plot-mode", choices=("auto", "scatter", "density"), default=None,
+                        help="draw point plots as scatters or density images (default: auto)")
+    subparsers = parser.add_subparsers(dest="stage", metavar="stage")
+    for name, (_, stage_help) in STAGES.items():
+        sub = subparsers.add_parser(name, help=stage_help)
+        sub.add_argument("--plot-dir", default="plots", help="directory for the figures (default: plots)")
+        if name == "compare":
+            sub.add_argument("--parallel", action="store_true", help="train the models in worker processes")
+        if name == "stream-lr":
+            sub.add_argument("--chunksize", type=int, default=100000)
+        if name == "correlations":
+            sub.add_argument("--by-class", action="store_true", help="also plot per-class matrices")
+            sub.add_argument("--window", type=float, default=None,
+                             help="also plot correlations with Class per window of this many seconds")
+
+    generate = subparsers.add_parser("generate", help="write a synthetic dataset with the creditcard.csv schema")
+    generate.add_argument("output", help="CSV file, or directory for --format columnar")
+    generate.add_argument("--rows", type=int, default=1000000)
+    generate.add_argument("--fraud-rate", type=float, default=0.00172)
+    generate.add_argument("--format", choices=("csv", "columnar"), default="csv")
+    generate.add_argument("--chunk-rows", type=int, default=1000000)
+    generate.add_argument("--seed", type=int, default=0)
+
+    cv = subparsers.add_parser("cv", help="stratified k-fold cross-validation of every model, folds in parallel")
+    cv.add_argument("--folds", type=int, default=5)
+    cv.add_argument("--workers", type=int, default=None, help="worker processes (default: one per fold)")
+    cv.add_argument("--models", nargs="+", choices=list(MODEL_CANDIDATES), default=None)
+
+    models = subparsers.add_parser("models", help="list the saved model versions")
+    models.add_argument("--store", default=None, help="model store directory (default: MODEL_STORE_DIR)")
+
+    serve = subparsers.add_parser("serve", help="serve a saved model over JSON lines on localhost")
+    serve.add_argument("--model", default="logistic_regression", help="saved model name (see the models stage)")
+    serve.add_argument("--version", type=int, default=None)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--max-batch", type=int, default=64, help="largest micro-batch (default: 64)")
+    serve.add_argument("--max-wait-ms", type=float, default=2.0, help="longest wait to fill a batch (default: 2)")
+    serve.add_argument("--threshold", type=float, default=0.5)
+
+    loadgen = subparsers.add_parser("loadgen", help="replay test transactions against a running scoring server")
+    loadgen.add_argument("--host", default="127.0.0.1")
+    loadgen.add_argument("--port", type=int, default=8765)
+    loadgen.add_argument("--requests", type=int, default=10000, help="requests per concurrency level")
+    loadgen.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    loadgen.add_argument("--rate", type=float, default=None, help="pace requests to this many per second")
+
+    score = subparsers.add_parser("score", help="score a transaction file of any size with a saved model")
+    score.add_argument("input", help="CSV file or columnar store")
+    score.add_argument("output", help="CSV file for the scores")
+    score.add_argument("--model", default="logistic_regression", help="saved model name (see the models stage)")
+    score.add_argument("--version", type=int, default=None)
+    score.add_argument("--chunksize", type=int, default=100000)
+    score.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    score.add_argument("--in-flight", type=int, default=None, help="chunks queued at once (default: 2 * workers)")
+    score.add_argument("--threshold", type=float, default=0.5)
+    score.add_argument("--keep", nargs="*", default=["Time"], help="input columns copied to the output")
+
+    replay = subparsers.add_parser("replay", help="replay the transactions in Time order, out of time")
+    replay.add_argument("--model", choices=list(MODEL_CANDIDATES), default="Logistic Regression",
+                        help="model trained on the training window")
+    replay.add_argument("--saved", default=None, help="replay this saved model instead of training one")
+    replay.add_argument("--train-until", type=float, default=None,
+                        help="Time (s) ending the training window (default: 80%% of the transactions)")
+    replay.add_argument("--test-until", type=float, default=None, help="Time (s) ending the test window")
+    replay.add_argument("--speedup", type=float, default=None,
+                        help="replay the arrival schedule N times faster (default: back to back)")
+    replay.add_argument("--events", type=int, default=None, help="replay only the first N events")
+
+    online = subparsers.add_parser("online", help="online partial_fit updates with drift-triggered retrains")
+    online.add_argument("--train-until", type=float, default=None,
+                        help="Time (s) ending the initial training window (default: 80%% of the transactions)")
+    online.add_argument("--batch-size", type=int, default=1000)
+    online.add_argument("--half-life", type=int, default=20000, help="rows over which drift statistics decay")
+    online.add_argument("--psi-threshold", type=float, default=0.2)
+    online.add_argument("--shift-threshold", type=float, default=0.25, help="mean shift in standard deviations")
+
+    bootstrap = subparsers.add_parser("bootstrap", help="bootstrap intervals and paired differences of the models")
+    bootstrap.add_argument("--replicates", type=int, default=10000)
+    bootstrap.add_argument("--confidence", type=float, default=0.95)
+    bootstrap.add_argument("--workers", type=int, default=None)
+
+    compress = subparsers.add_parser("compress", help="training time vs. AUC when compressing the majority class")
+    compress.add_argument("--plot-dir", default="plots", help="directory for the figures (default: plots)")
+    compress.add_argument("--ratios", type=float, nargs="+", default=[1.0, 0.3, 0.1, 0.03, 0.01],
+                          help="majority rows kept per row (1 = no compression, the reference)")
+    compress.add_argument("--methods", nargs="+", choices=COMPRESSION_METHODS, default=list(COMPRESSION_METHODS))
+    compress.add_argument("--models", nargs="+", choices=list(MODEL_CANDIDATES), default=None)
+
+    importance = subparsers.add_parser("importance", help="permutation importance of both models on the test split")
+    importance.add_argument("--plot-dir", default="plots", help="directory for the figures (default: plots)")
+    importance.add_argument("--repeats", type=int, default=10)
+    importance.add_argument("--metric", default="roc_auc", choices=("roc_auc", "pr_auc"))
+    importance.add_argument("--workers", type=int, default=None)
+
+    search = subparsers.add_parser("search", help="successive-halving hyperparameter search within a time budget")
+    search.add_argument("--budget", type=float, default=600, help="wall-clock budget in seconds (default: 600)")
+    search.add_argument("--models", nargs="+", choices=list(MODEL_CANDIDATES), default=None)
+    search.add_argument("--eta", type=int, default=3)
+    search.add_argument("--configs", type=int, default=None, help="configurations sampled per model (default: all)")
+    search.add_argument("--metric", default="pr_auc", choices=("pr_auc", "roc_auc", "kappa"))
+    search.add_argument("--workers", type=int, default=None)
+
+    bench = subparsers.add_parser("bench", help="benchmark every stage on synthetic data")
+    bench.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    bench.add_argument("--dtypes", nargs="+", default=["float64", "float32"])
+    bench.add_argument("--stages", nargs="+", choices=BENCHMARK_STAGES, default=None)
+    bench.add_argument("--output", default="benchmark_results.json")
+    bench.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    if args.data:
+        DATA_URL = args.data
+    if args.save_models:
+        SAVE_MODELS = True
+    if args.fraud_cost is not None:
+        FRAUD_COST = args.fraud_cost
+    if args.false_alarm_cost is not None:
+        FALSE_ALARM_COST = args.false_alarm_cost
+    if args.plot_mode:
+        PLOT_MODE = args.plot_mode
+    if args.metrics:
+        enable_instrumentation(args.metrics)
+
+    if args.stage is None:
+        main()
+        return
+    if args.stage == "generate":
+        generate_synthetic_data(args.output, args.rows, fraud_rate=args.fraud_rate, fmt=args.format,
+                                chunk_rows=args.chunk_rows, seed=args.seed)
+        return
+    if args.stage == "cv":
+        print_cross_validation(n_splits=args.folds, max_workers=args.workers, names=args.models)
+        return
+    if args.stage == "models":
+        for name, versions in list_models(args.store).items():
+            manifest = read_manifest(name, store_dir=args.store)
+            print(f"{name}: versions {versions}; latest {manifest['kind']} from {manifest['created']}, "
+                  f"data {manifest['data_key']}, metrics {manifest['metrics']}")
+        return
+    if args.stage == "serve":
+        run_scoring_server(args.model, args.version, args.host, args.port, args.max_batch, args.max_wait_ms,
+                           args.threshold)
+        return
+    if args.stage == "loadgen":
+        run_load_generator(args.host, args.port, args.requests, args.concurrency, args.rate)
+        return
+    if args.stage == "score":
+        result = score_file(args.input, args.output, args.model, args.version, args.chunksize, args.workers,
+                            args.in_flight, args.threshold, args.keep)
+        print(f"Scored {result['rows']} rows in {result['seconds']:.1f}s ({result['rows_per_second']:.0f} rows/s)")
+        return
+    if args.stage == "replay":
+        print_replay(args.model, args.saved, args.train_until, args.test_until, args.speedup, args.events)
+        return
+    if args.stage == "online":
+        print_online_learning(args.train_until, batch_size=args.batch_size, half_life=args.half_life,
+                              psi_threshold=args.psi_threshold, shift_threshold=args.shift_threshold)
+        return
+    if args.stage == "bootstrap":
+        print_bootstrap_comparison(args.replicates, args.workers, args.confidence)
+        return
+    if args.stage == "search":
+        print_hyperparameter_search(names=args.models, budget_seconds=args.budget, eta=args.eta,
+                                    n_configs=args.configs, metric=args.metric, max_workers=args.workers)
+        return
+    if args.stage == "bench":
+        run_benchmarks(args.sizes, args.dtypes, stages=args.stages, output=args.output, baseline=args.baseline)
+        return
+
+    set_headless(args.plot_dir)
+    if args.stage == "compress":
+        plot_compression_tradeoff(ratios=args.ratios, methods=args.methods, names=args.models)
+    elif args.stage == "importance":
+        print_permutation_importance(args.repeats, args.metric, args.workers)
+    elif args.stage == "compare":
+        compare_models_results(parallel=args.parallel)
+    elif args.stage == "stream-lr":
+        classifies_using_streaming_logistic_regression(DATA_URL, chunksize=args.chunksize)
+    elif args.stage == "correlations":
+        correlations_in_data(by_class=args.by_class, window=args.window)
+    else:
+        STAGES[args.stage][0]()
+
+
 if __name__ == "__main__":
-    main()
+    cli()